@@ -0,0 +1,99 @@
+"""Стоимость маршрутизации нажатия кнопки в зависимости от числа кнопок.
+
+Диспетчер с N обработчиками кнопок, поровну в двух роутерах (как бот:
+обработчики в dp и admin_router), плюс обработчик свободного текста в
+состоянии FSM и общий запасной в конце. Апдейты — нажатия случайных
+кнопок и немного свободного текста, прогоняются через dp.feed_update без
+сети; обработчики ничего не делают, так что измеряется сам выбор
+обработчика и обвязка aiogram.
+
+«До» — фильтры F.text == "..." (aiogram проверяет их по порядку), «после» —
+фильтры Button и ButtonRouterMiddleware (один поиск в словаре).
+
+Запуск из корня проекта:
+    python benchmarks/bench_buttons.py [--buttons 10 50 200] [--updates 2000]
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from aiogram import Bot, Dispatcher, F, Router
+from aiogram.fsm.state import State, StatesGroup
+from aiogram.types import Update
+
+from middlewares.button_router import ButtonRouterMiddleware
+from services.buttons import Button
+
+TOKEN = "123456:BENCH-token"
+FREE_TEXT_SHARE = 0.1
+
+
+class Form(StatesGroup):
+    enter_text = State()
+
+
+async def noop(message):
+    return True
+
+
+def build(buttons: int, indexed: bool) -> Dispatcher:
+    dp = Dispatcher()
+    admin = Router(name="admin")
+    for i in range(buttons):
+        router = dp if i < buttons // 2 else admin
+        text = f"Кнопка {i}"
+        router.message.register(noop, Button(text) if indexed else F.text == text)
+    dp.message.register(noop, Form.enter_text)
+    admin.message.register(noop)  # Свободный текст
+    dp.include_router(admin)
+    if indexed:
+        dp.message.outer_middleware(ButtonRouterMiddleware(dp))
+    return dp
+
+
+def make_updates(buttons: int, count: int):
+    rng = random.Random(1)
+    updates = []
+    for update_id in range(count):
+        text = "свободный текст" if rng.random() < FREE_TEXT_SHARE else f"Кнопка {rng.randrange(buttons)}"
+        updates.append(Update.model_validate({"update_id": update_id, "message": {
+            "message_id": update_id, "date": 0, "text": text,
+            "chat": {"id": 1000 + update_id % 100, "type": "private"},
+            "from": {"id": 1000 + update_id % 100, "is_bot": False, "first_name": "u"},
+        }}))
+    return updates
+
+
+async def measure(bot: Bot, buttons: int, updates) -> float:
+    results = []
+    for indexed in (False, True):
+        dp = build(buttons, indexed)
+        for update in updates[:100]:  # Прогрев (и построение индекса)
+            await dp.feed_update(bot, update)
+        started = time.perf_counter()
+        for update in updates:
+            await dp.feed_update(bot, update)
+        results.append((time.perf_counter() - started) / len(updates) * 1e6)
+    return results
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--buttons", type=int, nargs="+", default=[10, 50, 200])
+    parser.add_argument("--updates", type=int, default=2000)
+    args = parser.parse_args()
+
+    bot = Bot(TOKEN)
+    print(f"{args.updates} updates, {FREE_TEXT_SHARE:.0%} free text")
+    for buttons in args.buttons:
+        legacy, indexed = await measure(bot, buttons, make_updates(buttons, args.updates))
+        print(f"{buttons:5d} buttons   F.text {legacy:7.1f} µs/update   Button index {indexed:6.1f} µs/update")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,182 @@
+"""Латентность обработчиков под конкурентной нагрузкой: синхронный SQLAlchemy против AsyncEngine.
+
+Апдейты поступают с постоянной частотой. Четыре из пяти — «DB»-обработчики:
+регистрация пользователя, как в UserRegistryMiddleware (upsert_user и commit),
+чтение его объявлений (get_user_ads) и имитация вызова Bot API. Каждый пятый —
+«light»-обработчик из другого чата без запросов к БД.
+
+Обе стороны выполняют одни и те же SQL-запросы, включая счётчики
+stats_counters для новых пользователей, и используют пул с размерами из
+настроек бота (DB_POOL_SIZE/DB_MAX_OVERFLOW): по умолчанию aiosqlite получил бы
+NullPool и открывал соединение и поток на каждую выдачу. Синхронный вариант
+блокирует event loop и задерживает в том числе light-апдейты; асинхронный на
+SQLite платит за переход в поток aiosqlite на каждый запрос, а пока новый
+пользователь держит блокировку записи, остальные ждут в busy handler SQLite,
+занимая соединения пула. Поэтому хвост DB-апдейтов у него длиннее, и он
+заметно зависит от DB_POOL_SIZE.
+
+Запуск из корня проекта:
+    python benchmarks/bench_db_latency.py [--users 20000] [--updates 3000] [--rate 400]
+"""
+import argparse
+import asyncio
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from datetime import datetime
+
+from sqlalchemy import create_engine, event, select
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+from config.settings import settings
+from database.crud import USERS_TOTAL, get_user_ads, upsert_user, users_new_key
+from database.session import set_sqlite_pragmas
+from database.models import Ad, Base, StatsCounter, User
+
+API_CALL = 0.005  # Имитация сетевого вызова Bot API, сек
+
+
+POOL = {"pool_size": settings.DB_POOL_SIZE, "max_overflow": settings.DB_MAX_OVERFLOW}
+
+
+def sync_upsert_user(db, telegram_id):
+    """Те же запросы, что database.crud.upsert_user и bump_counters"""
+    user_id = db.scalar(select(User.id).where(User.telegram_id == telegram_id))
+    if user_id is not None:
+        return user_id
+    created_at = datetime.utcnow()
+    user_id = db.scalar(
+        insert(User).values(telegram_id=telegram_id, username=None, full_name=None, created_at=created_at)
+        .on_conflict_do_nothing(index_elements=[User.telegram_id]).returning(User.id)
+    )
+    if user_id is None:
+        return db.scalar(select(User.id).where(User.telegram_id == telegram_id))
+    stmt = insert(StatsCounter).values([{"key": USERS_TOTAL, "value": 1}, {"key": users_new_key(created_at), "value": 1}])
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=[StatsCounter.key], set_={"value": StatsCounter.value + stmt.excluded.value}
+    ))
+    return user_id
+
+
+def sync_get_user_ads(db, user_id):
+    return list(db.scalars(select(Ad).where(Ad.user_id == user_id).order_by(Ad.created_at.desc())))
+
+
+def seed(path: str, users: int):
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(engine)
+    with sessionmaker(bind=engine)() as db:
+        db.add_all(User(telegram_id=i) for i in range(users))
+        db.add_all(Ad(user_id=i % users, channel="bench", text="x" * 200) for i in range(users // 2))
+        db.commit()
+    engine.dispose()
+
+
+async def light_handler(telegram_id):
+    await asyncio.sleep(API_CALL)
+
+
+async def run_sync(path: str, telegram_ids, rate: float):
+    engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False},
+                           poolclass=QueuePool, **POOL)
+    event.listen(engine, "connect", set_sqlite_pragmas)
+    Session = sessionmaker(bind=engine, autoflush=False, expire_on_commit=False)
+
+    async def handler(telegram_id):
+        with Session() as db:
+            user_id = sync_upsert_user(db, telegram_id)
+            db.commit()
+            sync_get_user_ads(db, user_id)
+        await asyncio.sleep(API_CALL)
+
+    latencies = await drive(handler, telegram_ids, rate)
+    engine.dispose()
+    return latencies
+
+
+async def run_async(path: str, telegram_ids, rate: float):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{path}", poolclass=AsyncAdaptedQueuePool, **POOL)
+    event.listen(engine.sync_engine, "connect", set_sqlite_pragmas)
+    Session = async_sessionmaker(engine, autoflush=False, expire_on_commit=False)
+
+    async def handler(telegram_id):
+        async with Session() as db:
+            user_id, _ = await upsert_user(db, telegram_id)
+            await db.commit()
+            await get_user_ads(db, user_id)
+        await asyncio.sleep(API_CALL)
+
+    latencies = await drive(handler, telegram_ids, rate)
+    await engine.dispose()
+    return latencies
+
+
+async def drive(handler, telegram_ids, rate: float):
+    """Подаёт апдейты с частотой rate и меряет время от поступления до ответа"""
+    latencies = {"db": [], "light": []}
+    tasks = []
+    started = time.perf_counter()
+
+    async def timed(kind, target, telegram_id, arrived):
+        await target(telegram_id)
+        latencies[kind].append(time.perf_counter() - arrived)
+
+    for i, telegram_id in enumerate(telegram_ids):
+        arrived = started + i / rate
+        delay = arrived - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        kind, target = ("light", light_handler) if i % 5 == 4 else ("db", handler)
+        tasks.append(asyncio.create_task(timed(kind, target, telegram_id, arrived)))
+
+    await asyncio.gather(*tasks)
+    return latencies
+
+
+def report(name: str, latencies, wall: float):
+    total = sum(len(values) for values in latencies.values())
+    for kind, values in latencies.items():
+        values = sorted(values)
+        p = lambda q: values[min(len(values) - 1, int(len(values) * q))] * 1000
+        print(
+            f"{name:<6} {kind:<6} p50={p(0.50):8.1f} ms  p99={p(0.99):8.1f} ms  "
+            f"mean={statistics.mean(values) * 1000:8.1f} ms"
+        )
+    print(f"{name:<6} throughput={total / wall:.0f} upd/s")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=20000)
+    parser.add_argument("--updates", type=int, default=3000)
+    parser.add_argument("--rate", type=float, default=150, help="Апдейтов в секунду")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        seed(path, args.users)
+        # ~5% апдейтов от новых пользователей
+        telegram_ids = [i * 7919 % int(args.users * 1.05) for i in range(args.updates)]
+        print(f"users={args.users} updates={args.updates} rate={args.rate}/s "
+              f"pool={POOL['pool_size']}+{POOL['max_overflow']}")
+
+        for name, runner in (("sync", run_sync), ("async", run_async)):
+            # У каждого прогона своя копия базы: новые пользователи вставляются в обоих
+            run_path = os.path.join(tmp, f"{name}.db")
+            shutil.copy(path, run_path)
+            started = time.perf_counter()
+            latencies = asyncio.run(runner(run_path, telegram_ids, args.rate))
+            report(name, latencies, time.perf_counter() - started)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""Стоимость FSM на апдейт в сценарии подачи объявления.
+
+Каждый «пользователь» проходит шаги flow так, как их выполняют обработчики:
+get_state (фильтр StateFilter) → update_data → set_state, в конце
+clear. Сравниваются:
+  memory       — MemoryStorage (состояние теряется при рестарте);
+  db-through   — DatabaseStorage с flush после каждого вызова (запись на
+                 каждое изменение, как у хранилища без буфера);
+  db-coalesced — DatabaseStorage с flush в конце апдейта (FsmFlushMiddleware);
+  redis        — RedisStorage, если задан --redis-url и установлен пакет redis.
+
+Запуск из корня проекта (БД — отдельный временный файл SQLite):
+    python benchmarks/bench_fsm_storage.py [--users 500] [--redis-url redis://localhost:6379/15]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+_db_dir = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{_db_dir}/bench.db"
+
+from aiogram.fsm.storage.base import StorageKey
+from aiogram.fsm.storage.memory import MemoryStorage
+
+from database.session import engine, init_db
+from services.fsm_storage import DatabaseStorage
+
+BOT_ID = 42
+
+# Шаги flow: (новое состояние, данные шага)
+STEPS = [
+    ("AdCreation:select_channel", {}),
+    ("AdCreation:select_duration", {"channel": "Канал 1", "price_multiplier": 1.0}),
+    ("AdCreation:add_media", {"duration": 7}),
+    ("AdCreation:enter_text", {"media": None}),
+]
+
+
+async def run_flow(storage, key: StorageKey, flush_call, flush_update):
+    """Один проход flow: len(STEPS) + 1 апдейтов"""
+    for state, data in STEPS:
+        await storage.get_state(key)
+        if data:
+            await storage.update_data(key, data)
+            await flush_call()
+        await storage.set_state(key, state)
+        await flush_call()
+        await flush_update()
+    await storage.get_state(key)
+    await storage.get_data(key)
+    await storage.set_state(key, None)
+    await flush_call()
+    await storage.set_data(key, {})
+    await flush_call()
+    await flush_update()
+
+
+async def bench(name: str, storage, users: int, per_call: bool):
+    async def nothing():
+        pass
+
+    flush = getattr(storage, "flush", nothing)
+    updates = len(STEPS) + 1
+    started = time.perf_counter()
+    for user_id in range(1, users + 1):
+        key = StorageKey(bot_id=BOT_ID, chat_id=user_id, user_id=user_id)
+        if per_call:
+            await run_flow(storage, key, flush, nothing)
+        else:
+            # Один flush на апдейт: вызовы внутри апдейта копятся в кэше
+            await run_flow(storage, key, nothing, flush)
+    elapsed = time.perf_counter() - started
+    writes = getattr(storage, "writes", None)
+    extra = f"   {writes / users:4.1f} writes/flow" if writes is not None else ""
+    print(f"{name:13s} {elapsed / (users * updates) * 1e6:8.1f} µs/update{extra}")
+    await storage.close()
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--redis-url")
+    args = parser.parse_args()
+
+    await init_db()
+    await bench("memory", MemoryStorage(), args.users, per_call=False)
+    await bench("db-through", DatabaseStorage(), args.users, per_call=True)
+    await bench("db-coalesced", DatabaseStorage(), args.users, per_call=False)
+    if args.redis_url:
+        try:
+            from aiogram.fsm.storage.redis import RedisStorage
+        except ImportError:
+            print("redis         пропущено: пакет redis не установлен")
+        else:
+            await bench("redis", RedisStorage.from_url(args.redis_url), args.users, per_call=False)
+
+    # Восстановление после «рестарта»: новый экземпляр читает состояние из БД
+    key = StorageKey(bot_id=BOT_ID, chat_id=0, user_id=0)
+    storage = DatabaseStorage()
+    await storage.set_state(key, "AdCreation:enter_text")
+    await storage.update_data(key, {"channel": "Канал 1"})
+    await storage.close()
+    restored = DatabaseStorage()
+    assert await restored.get_state(key) == "AdCreation:enter_text"
+    assert await restored.get_data(key) == {"channel": "Канал 1"}
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,113 @@
+"""Стоимость клавиатур на апдейт: построение на лету против реестра KeyboardRegistry.
+
+Апдейты — шаги сценария размещения по кругу: главное меню, выбор канала,
+выбор срока, медиа, текст. На каждом шаге клавиатура получается так, как
+это делает бот, превращается в поля запроса (build_form_data сессии), а
+у inline-экранов ещё считается контрольная сумма для ScreenRenderer.
+
+«До» — прежние функции (ReplyKeyboardBuilder/InlineKeyboardBuilder на
+каждый вызов, AiohttpSession, crc32 от model_dump_json). «После» — реестр
+и KeyboardSession. Память — отдельным прогоном под tracemalloc: пик
+временных выделений за апдейт (сколько байт было занято одновременно,
+пока строилась клавиатура и поля запроса).
+
+Запуск из корня проекта:
+    python benchmarks/bench_keyboards.py [--updates 50000]
+"""
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+import zlib
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from aiogram import Bot, types
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.methods import SendMessage
+from aiogram.utils.keyboard import ReplyKeyboardBuilder
+
+from config import keyboard_layouts
+from config.catalog import catalog
+from services.keyboards import KeyboardSession
+
+TOKEN = "123456:BENCH-token"
+
+
+def legacy_main_menu(is_admin: bool):
+    """Прежнее меню из bot.py: строится на каждый вызов"""
+    builder = ReplyKeyboardBuilder()
+    for button in ("📢 Разместить рекламу", "📋 Мои объявления", "💰 Баланс", "🆘 Помощь"):
+        builder.add(types.KeyboardButton(text=button))
+    builder.adjust(2, 2, 1)
+    if is_admin:
+        builder.row(types.KeyboardButton(text="👑 Админ-панель"))
+    return builder.as_markup(resize_keyboard=True)
+
+
+# Прежние inline-клавиатуры — те же раскладки, что и в реестре, без кэша
+LEGACY_STEPS = [
+    (lambda: legacy_main_menu(False), False),
+    (lambda: keyboard_layouts._channels_inline(catalog.snapshot, False), True),
+    (lambda: keyboard_layouts._durations_inline(catalog.snapshot, False), True),
+    (lambda: keyboard_layouts._media_inline(catalog.snapshot, False), True),
+    (lambda: keyboard_layouts._text_inline(catalog.snapshot, False), True),
+]
+
+REGISTRY_STEPS = [
+    (lambda: keyboard_layouts.get_main_menu(False), False),
+    (keyboard_layouts.channels_inline_kb, True),
+    (keyboard_layouts.durations_inline_kb, True),
+    (keyboard_layouts.media_inline_kb, True),
+    (keyboard_layouts.text_inline_kb, True),
+]
+
+
+def legacy_digest(markup) -> int:
+    return zlib.crc32(markup.model_dump_json().encode())
+
+
+def run(steps, session, digest, bot: Bot, updates: int):
+    for i in range(updates):
+        build, is_screen = steps[i % len(steps)]
+        markup = build()
+        if is_screen:
+            digest(markup)
+        session.build_form_data(bot, SendMessage(chat_id=i, text="screen", reply_markup=markup))
+
+
+def measure(name: str, steps, session, digest, bot: Bot, updates: int):
+    run(steps, session, digest, bot, len(steps))  # Прогрев (и заполнение реестра)
+    started = time.perf_counter()
+    run(steps, session, digest, bot, updates)
+    elapsed = time.perf_counter() - started
+
+    # Память — отдельным прогоном: tracemalloc сильно замедляет выполнение
+    tracemalloc.start()
+    peaks = 0
+    samples = len(steps) * 200
+    for i in range(samples):
+        tracemalloc.reset_peak()
+        base, _ = tracemalloc.get_traced_memory()
+        run([steps[i % len(steps)]], session, digest, bot, 1)
+        _, peak = tracemalloc.get_traced_memory()
+        peaks += peak - base
+    tracemalloc.stop()
+    print(f"{name:9s} {elapsed / updates * 1e6:7.1f} µs/update   peak {peaks / samples:7.0f} B/update")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--updates", type=int, default=50_000)
+    args = parser.parse_args()
+
+    bot = Bot(TOKEN)
+    print(f"{len(catalog.snapshot.channels)} channels, {len(catalog.snapshot.prices)} durations, {args.updates} updates")
+    measure("builders", LEGACY_STEPS, AiohttpSession(), legacy_digest, bot, args.updates)
+    measure("registry", REGISTRY_STEPS, KeyboardSession(), keyboard_layouts.keyboards.digest, bot, args.updates)
+    print(f"registry built {keyboard_layouts.keyboards.built} markups")
+
+
+if __name__ == "__main__":
+    main()
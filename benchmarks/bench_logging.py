@@ -0,0 +1,125 @@
+"""Время цикла событий, которое уходит на логирование одного апдейта.
+
+На апдейт пишется то же, что в боте: INFO aiogram.event «Update id=... is
+handled», INFO обработчика, DEBUG пула соединений (выдача, возврат,
+rollback — по 4 на сессию, две сессии) и раз в 100 апдейтов ошибка с
+traceback. Сравниваются:
+  basicConfig — прежняя настройка: FileHandler и StreamHandler пишут на
+                диск прямо в цикле, все DEBUG-записи;
+  queue       — services.log_pipeline без выборки DEBUG: в цикле только
+                постановка в очередь, JSON и диск — в потоке слушателя;
+  queue+sample — то же с LOG_DEBUG_SAMPLING по умолчанию.
+Консоль (stdout процесса под supervisor) направлена во временный файл.
+Для очереди отдельно показано, сколько ещё поток слушателя дописывал
+очередь после последнего апдейта.
+
+Запуск из корня проекта:
+    python benchmarks/bench_logging.py [--updates 20000]
+"""
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+_log_dir = tempfile.mkdtemp()
+os.environ["LOG_FILE"] = os.path.join(_log_dir, "bot.log")
+
+from config.settings import settings
+from services import log_pipeline
+
+TEXT_FORMAT = log_pipeline.TEXT_FORMAT
+DEFAULT_SAMPLING = dict(settings.LOG_DEBUG_SAMPLING)
+
+event_log = logging.getLogger("aiogram.event")
+handler_log = logging.getLogger("bot")
+pool_log = logging.getLogger("database.pool.InstrumentedPool")
+
+
+def log_update(update_id: int):
+    connection = f"<AdaptedConnection <aiosqlite.core.Connection object at 0x7f{update_id:010x}>>"
+    for _ in range(2):
+        pool_log.debug("Connection %s checked out from pool", connection)
+        pool_log.debug("Connection %s being returned to pool", connection)
+        pool_log.debug("Connection %s rollback-on-return", connection)
+        pool_log.debug("Connection %s reset", connection)
+    handler_log.info(f"User {update_id % 1000} opened the balance screen")
+    if update_id % 100 == 0:
+        try:
+            raise ValueError(f"message {update_id} not found")
+        except ValueError as e:
+            handler_log.error(f"Error deleting message: {e}", exc_info=True)
+    event_log.info("Update id=%s is handled. Duration %d ms by bot id=%d", update_id, 3, 123456)
+
+
+def reset_root():
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+        handler.close()
+
+
+def setup_basic(console):
+    reset_root()
+    logging.basicConfig(
+        level=logging.DEBUG,
+        format=TEXT_FORMAT,
+        handlers=[logging.FileHandler(os.path.join(_log_dir, "basic.log")), logging.StreamHandler(console)]
+    )
+
+
+def setup_queue(console, sampling):
+    reset_root()
+    settings.LOG_DEBUG_SAMPLING = sampling
+    stderr, sys.stderr = sys.stderr, console
+    try:
+        log_pipeline.setup_logging()
+    finally:
+        sys.stderr = stderr
+
+
+async def measure(updates: int):
+    """(время цикла, CPU потока цикла) на апдейт, мкс; разница — ожидание GIL и диска"""
+    started, cpu_started = time.perf_counter(), time.thread_time()
+    for update_id in range(updates):
+        log_update(update_id)
+        if update_id % 50 == 0:
+            await asyncio.sleep(0)  # Как в боте: цикл переключается между апдейтами
+    return ((time.perf_counter() - started) / updates * 1e6,
+            (time.thread_time() - cpu_started) / updates * 1e6)
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--updates", type=int, default=20000)
+    args = parser.parse_args()
+
+    results = []
+    with open(os.path.join(_log_dir, "console.log"), "w") as console:
+        setup_basic(console)
+        await measure(500)
+        results.append(("basicConfig", *await measure(args.updates), 0.0))
+
+        for name, sampling in (("queue", {}), ("queue+sample", DEFAULT_SAMPLING)):
+            setup_queue(console, sampling)
+            await measure(500)
+            loop_us, cpu_us = await measure(args.updates)
+            started = time.perf_counter()
+            log_pipeline.stop_logging()
+            results.append((name, loop_us, cpu_us, (time.perf_counter() - started) * 1000))
+    reset_root()
+
+    baseline = results[0][1]
+    print(f"{args.updates} updates, 11 records each (8 DEBUG), sampling {DEFAULT_SAMPLING}")
+    for name, loop_us, cpu_us, drain_ms in results:
+        drain = f"   listener drain {drain_ms:6.0f} ms" if drain_ms else ""
+        print(f"{name:13s} loop {loop_us:6.1f} µs/update ({baseline - loop_us:+6.1f} saved)"
+              f"   loop thread CPU {cpu_us:6.1f} µs{drain}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
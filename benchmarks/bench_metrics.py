@@ -0,0 +1,133 @@
+"""Накладные расходы метрик (services.metrics) на горячем пути.
+
+Каждая точка замера сравнивается с тем же вызовом без неё:
+  handler — обработчик через HandlerMetricsMiddleware и напрямую;
+  api     — запрос bot(...) через сессию с ApiMetricsMiddleware и без
+            (make_request подменён, сети нет);
+  db      — вызов CRUD-функции с обёрткой db_timed и без (функция пустая).
+Бюджет — не больше BUDGET_US мкс на точку. Для масштаба показано время
+апдейта через dp.feed_update без сети и БД (пустые обработчики): типичный
+апдейт бота — один обработчик, 2–3 запроса к API и 3–5 CRUD-вызовов.
+Сам feed_update от запуска к запуску гуляет сильнее, чем стоят метрики,
+поэтому точки меряются по отдельности. В конце — время выдачи /metrics
+при заполненных сериях.
+
+Запуск из корня проекта:
+    python benchmarks/bench_metrics.py [--iterations 20000]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from aiogram import Bot, Dispatcher, F
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.methods import SendChatAction
+from aiogram.types import Update
+
+from middlewares.metrics import ApiMetricsMiddleware, HandlerMetricsMiddleware
+from services import metrics
+
+TOKEN = "123456:BENCH-token"
+BUDGET_US = 5.0
+HANDLERS = 10
+
+
+async def noop(*args, **kwargs):
+    return True
+
+
+def build_dp() -> Dispatcher:
+    dp = Dispatcher(name="bench")
+    for i in range(HANDLERS):
+        dp.message.register(noop, F.text == f"Кнопка {i}")
+    return dp
+
+
+def build_bot(instrumented: bool) -> Bot:
+    session = AiohttpSession()
+    session.make_request = noop
+    if instrumented:
+        session.middleware(ApiMetricsMiddleware())
+    return Bot(TOKEN, session=session)
+
+
+async def timed(call, iterations: int) -> float:
+    for _ in range(iterations // 10):  # Прогрев
+        await call()
+    started = time.perf_counter()
+    for _ in range(iterations):
+        await call()
+    return (time.perf_counter() - started) / iterations * 1e6
+
+
+async def bench_update(iterations: int) -> float:
+    bot = build_bot(False)
+    dp = build_dp()
+    updates = [Update.model_validate({"update_id": i, "message": {
+        "message_id": i, "date": 0, "text": f"Кнопка {i % HANDLERS}",
+        "chat": {"id": 1000 + i % 100, "type": "private"},
+        "from": {"id": 1000 + i % 100, "is_bot": False, "first_name": "u"},
+    }}) for i in range(100)]
+    position = iter(range(10 ** 9))
+    return await timed(lambda: dp.feed_update(bot, updates[next(position) % 100]), iterations)
+
+
+async def bench_handler(iterations: int):
+    dp = build_dp()
+    observer = dp.message
+    data = {"handler": observer.handlers[0], "event_router": dp}
+    middleware = HandlerMetricsMiddleware()
+    return [await timed(lambda: noop(None, data), iterations),
+            await timed(lambda: middleware(noop, None, data), iterations)]
+
+
+async def bench_api(iterations: int):
+    method = SendChatAction(chat_id=1, action="typing")
+    results = []
+    for instrumented in (False, True):
+        bot = build_bot(instrumented)
+        results.append(await timed(lambda: bot(method), iterations))
+    return results
+
+
+async def bench_db(iterations: int):
+    async def get_record(db, key):
+        return None
+    wrapped = metrics.db_timed(get_record)
+    return [await timed(lambda: get_record(None, "k"), iterations), await timed(lambda: wrapped(None, "k"), iterations)]
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--iterations", type=int, default=20000)
+    args = parser.parse_args()
+
+    update_us = await bench_update(args.iterations // 4)
+    print(f"{args.iterations} iterations, budget {BUDGET_US:.0f} µs per instrumented call; "
+          f"bare update {update_us:.0f} µs")
+    total = 0.0
+    for name, bench, per_update in (("handler", bench_handler, 1), ("api", bench_api, 3), ("db", bench_db, 5)):
+        plain, instrumented = await bench(args.iterations)
+        overhead = instrumented - plain
+        total += overhead * per_update
+        verdict = "ok" if overhead <= BUDGET_US else "OVER BUDGET"
+        print(f"{name:8s} {plain:6.2f} → {instrumented:6.2f} µs   overhead {overhead:+5.2f} µs   {verdict}")
+    print(f"typical update (1 handler, 3 API calls, 5 CRUD calls): +{total:.1f} µs, "
+          f"{total / update_us:.1%} of a bare update")
+
+    # Выдача /metrics: серии, как у бота после долгой работы
+    for i in range(40):
+        metrics.handler_seconds.observe(0.004, "router", f"handler_{i}")
+        metrics.api_seconds.observe(0.08, f"method{i}")
+        metrics.db_seconds.observe(0.002, f"crud_{i}")
+    started = time.perf_counter()
+    text = await metrics.registry.render()
+    print(f"/metrics  {len(text.splitlines())} lines rendered in {(time.perf_counter() - started) * 1000:.2f} ms")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,100 @@
+"""Накладные расходы антифлуда на апдейт: старый ThrottlingMiddleware (список datetime) против GCRA.
+
+Middleware вызываются напрямую с пустым обработчиком, поэтому измеряется
+только их собственная стоимость. Пользователи приходят по кругу; лимиты
+выставлены так, чтобы никто не упирался в ограничение. Отдельно
+измеряется память таблицы пользователей (tracemalloc) после прогона.
+
+Запуск из корня проекта:
+    python benchmarks/bench_throttling.py [--users 100000] [--updates 500000]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+import tracemalloc
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from aiogram import types
+
+from middlewares.throttling import Limit, ThrottlingMiddleware
+
+
+class LegacyThrottlingMiddleware:
+    """Прежняя реализация из middlewares/throttling.py (без BaseMiddleware)"""
+
+    def __init__(self, rate: int = 5, per: float = 10.0):
+        self.rate = rate
+        self.per = timedelta(seconds=per)
+        self.user_timestamps = defaultdict(list)
+
+    async def __call__(self, handler, event, data):
+        user_id = event.from_user.id
+        now = datetime.now()
+        self.user_timestamps[user_id] = [
+            t for t in self.user_timestamps[user_id]
+            if now - t < self.per
+        ]
+        if len(self.user_timestamps[user_id]) >= self.rate:
+            return
+        self.user_timestamps[user_id].append(now)
+        return await handler(event, data)
+
+
+async def handler(event, data):
+    return None
+
+
+def make_updates(users: int):
+    now = datetime.now()
+    chat = types.Chat(id=1, type="private")
+    updates = []
+    for user_id in range(1, users + 1):
+        user = types.User(id=user_id, is_bot=False, first_name="u")
+        message = types.Message(message_id=user_id, date=now, chat=chat, from_user=user, text="hi")
+        updates.append((types.Update(update_id=user_id, message=message), user))
+    return updates
+
+
+async def feed(middleware, updates, total: int, legacy: bool) -> float:
+    started = time.perf_counter()
+    for i in range(total):
+        update, user = updates[i % len(updates)]
+        if legacy:
+            await middleware(handler, update.message, {})
+        else:
+            await middleware(handler, update, {"event_from_user": user})
+    return time.perf_counter() - started
+
+
+async def run(name: str, factory, updates, total: int, legacy: bool):
+    elapsed = await feed(factory(), updates, total, legacy)
+    # Память — отдельным прогоном: tracemalloc сильно замедляет выполнение
+    tracemalloc.start()
+    middleware = factory()
+    await feed(middleware, updates, total, legacy)
+    memory, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{name:8s} {elapsed / total * 1e6:6.2f} µs/update   table ≈ {memory / len(updates):6.0f} B/user")
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=100_000)
+    parser.add_argument("--updates", type=int, default=500_000)
+    args = parser.parse_args()
+
+    updates = make_updates(args.users)
+    # Лимиты с запасом: каждый пользователь делает updates/users запросов
+    rate = args.updates // args.users + 1
+    await run("legacy", lambda: LegacyThrottlingMiddleware(rate=rate, per=60), updates, args.updates, legacy=True)
+    await run("gcra", lambda: ThrottlingMiddleware(Limit(rate, 60), Limit(rate, 60)), updates, args.updates,
+              legacy=False)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,248 @@
+"""Нагрузочный тест webhook-режима с несколькими воркерами.
+
+Поднимает локальный фейковый Bot API (отвечает на любые методы), запускает
+bot.py в режиме webhook с N воркерами в отдельном процессе и прогоняет
+начало сценария размещения для множества пользователей параллельно:
+«📢 Разместить рекламу» → выбор канала → выбор срока. Каждый шаг — отдельный
+апдейт, который может попасть в любой воркер; следующий шаг отправляется,
+сразу, как только фейковый API получил ответ бота на предыдущий. Если
+состояние FSM или экран не общие или сохраняются позже ответа, callback не
+найдёт обработчик и шаг упрётся в таймаут: ожидаемо 0 потерянных шагов.
+
+Задержка шага — от POST апдейта до последнего вызова Bot API по нему. При
+общем состоянии нет ни одного алерта об ошибке. Экран (message_id) известен
+только из ответа на sendMessage и сохраняется в конце апдейта, поэтому без
+паузы часть callback после первого шага не находит его и присылает экран
+новым sendMessage вместо editMessageText — шаг при этом не теряется. С
+паузой в полсекунды (THINK_TIME = 0.5) каждый callback даёт editMessageText.
+Дополнительно проверяется, что
+запрос с неверным секретом получает 401.
+
+Запуск из корня проекта:
+    python benchmarks/load_webhook.py [--workers 1 4] [--users 300] [--concurrency 50]
+"""
+import argparse
+import asyncio
+import json
+import os
+import signal
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from typing import Dict, Tuple
+
+from aiohttp import ClientSession, ClientConnectionError, web
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TOKEN = "123456:LOADTEST-token-for-local-fake-api"
+SECRET = "loadtest-secret"
+ADMIN_ID = 1
+STEP_TIMEOUT = 10.0
+THINK_TIME = 0.0  # Следующий шаг — сразу после ответа бота на предыдущий
+
+
+class FakeTelegram:
+    """Фейковый Bot API: отвечает на все методы и сообщает тесту о вызовах по чатам"""
+
+    def __init__(self):
+        self.calls = Counter()
+        self.alerts = 0
+        self.message_id = 0
+        self.webhook_set = asyncio.Event()
+        self.markups: Dict[int, dict] = {}  # Последняя клавиатура экрана по чатам
+        self._waiters: Dict[Tuple[int, str], asyncio.Future] = {}
+
+    def first_button(self, chat_id: int) -> str:
+        """callback_data первой inline-кнопки экрана (в ней версия каталога)"""
+        return self.markups[chat_id]["inline_keyboard"][0][0]["callback_data"]
+
+    def wait(self, chat_id: int, method: str) -> asyncio.Future:
+        future = asyncio.get_running_loop().create_future()
+        self._waiters[(chat_id, method)] = future
+        return future
+
+    def _resolve(self, chat_id: int, method: str, result):
+        future = self._waiters.pop((chat_id, method), None)
+        if future and not future.done():
+            future.set_result(result)
+
+    async def handle(self, request: web.Request) -> web.Response:
+        method = request.match_info["method"]
+        params = await request.post()
+        self.calls[method] += 1
+        result = True
+        if method == "getMe":
+            result = {"id": 123456, "is_bot": True, "first_name": "Load"}
+        elif method == "setWebhook":
+            self.webhook_set.set()
+        elif method in ("sendMessage", "editMessageText"):
+            chat_id = int(params["chat_id"])
+            if "reply_markup" in params:
+                self.markups[chat_id] = json.loads(params["reply_markup"])
+            if method == "sendMessage":
+                self.message_id += 1
+                result = {
+                    "message_id": self.message_id, "date": int(time.time()),
+                    "chat": {"id": chat_id, "type": "private"}, "text": params.get("text", "")
+                }
+            self._resolve(chat_id, method, result)
+        elif method == "answerCallbackQuery":
+            # Обработчики отвечают алертом только на ошибку
+            self.alerts += params.get("show_alert") == "true"
+            self._resolve(int(params["callback_query_id"].split("-")[0]), method, result)
+        return web.json_response({"ok": True, "result": result})
+
+
+def message_update(update_id: int, user_id: int, text: str) -> dict:
+    user = {"id": user_id, "is_bot": False, "first_name": f"u{user_id}"}
+    return {"update_id": update_id, "message": {
+        "message_id": update_id, "date": int(time.time()),
+        "chat": {"id": user_id, "type": "private"}, "from": user, "text": text
+    }}
+
+
+def callback_update(update_id: int, user_id: int, message_id: int, data: str) -> dict:
+    user = {"id": user_id, "is_bot": False, "first_name": f"u{user_id}"}
+    return {"update_id": update_id, "callback_query": {
+        "id": f"{user_id}-{update_id}", "from": user, "chat_instance": str(user_id), "data": data,
+        "message": {
+            "message_id": message_id, "date": int(time.time()),
+            "chat": {"id": user_id, "type": "private"},
+            "from": {"id": 123456, "is_bot": True, "first_name": "Load"}, "text": "screen"
+        }
+    }}
+
+
+class LoadTest:
+    def __init__(self, api: FakeTelegram, http: ClientSession, url: str):
+        self.api = api
+        self.http = http
+        self.url = url
+        self.update_id = 0
+        self.latencies = []
+        self.failed = 0
+
+    async def post(self, update: dict, secret: str = SECRET) -> int:
+        async with self.http.post(self.url, json=update,
+                                  headers={"X-Telegram-Bot-Api-Secret-Token": secret}) as response:
+            return response.status
+
+    async def step(self, update: dict, chat_id: int, method: str):
+        waiter = self.api.wait(chat_id, method)
+        started = time.perf_counter()
+        await self.post(update)
+        try:
+            result = await asyncio.wait_for(waiter, STEP_TIMEOUT)
+        except asyncio.TimeoutError:
+            self.failed += 1
+            return None
+        self.latencies.append(time.perf_counter() - started)
+        return result
+
+    def next_id(self) -> int:
+        self.update_id += 1
+        return self.update_id
+
+    async def user_flow(self, user_id: int):
+        screen = await self.step(message_update(self.next_id(), user_id, "📢 Разместить рекламу"),
+                                 user_id, "sendMessage")
+        if not screen:
+            return
+        for _ in range(2):  # Канал, затем срок
+            await asyncio.sleep(THINK_TIME)
+            data = self.api.first_button(user_id)
+            if not await self.step(callback_update(self.next_id(), user_id, screen["message_id"], data),
+                                   user_id, "answerCallbackQuery"):
+                return
+
+
+async def wait_ready(test: LoadTest, api: FakeTelegram, process: subprocess.Popen):
+    await asyncio.wait_for(api.webhook_set.wait(), 60)
+    while True:
+        if process.poll() is not None:
+            raise RuntimeError("bot process exited")
+        try:
+            # Апдейт без сообщения: бот просто пропускает его
+            await test.post({"update_id": 0})
+            return
+        except ClientConnectionError:
+            await asyncio.sleep(0.2)
+
+
+async def run(workers: int, users: int, concurrency: int, api_port: int, bot_port: int):
+    api = FakeTelegram()
+    app = web.Application()
+    app.router.add_post("/bot{token}/{method}", api.handle)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", api_port).start()
+
+    workdir = tempfile.mkdtemp()
+    with open(os.path.join(workdir, ".env"), "w") as env:
+        env.write(
+            f"BOT_TOKEN={TOKEN}\nADMIN_IDS=[{ADMIN_ID}]\n"
+            f"DATABASE_URL=sqlite:///{workdir}/load.db\n"
+            f"WEBHOOK_URL=http://127.0.0.1:{bot_port}\nWEBHOOK_PORT={bot_port}\nWEBHOOK_HOST=127.0.0.1\n"
+            f"WEBHOOK_WORKERS={workers}\nWEBHOOK_SECRET={SECRET}\n"
+            f"TELEGRAM_API_URL=http://127.0.0.1:{api_port}\n"
+        )
+    log = open(os.path.join(workdir, "bot.log"), "w")
+    process = subprocess.Popen([sys.executable, os.path.join(ROOT, "bot.py")], cwd=workdir,
+                               stdout=log, stderr=subprocess.STDOUT)
+    try:
+        async with ClientSession() as http:
+            test = LoadTest(api, http, f"http://127.0.0.1:{bot_port}/webhook")
+            await wait_ready(test, api, process)
+            assert await test.post({"update_id": 0}, secret="wrong") == 401, "bad secret must be rejected"
+
+            api.calls.clear()
+            semaphore = asyncio.Semaphore(concurrency)
+
+            async def limited(user_id: int):
+                async with semaphore:
+                    await test.user_flow(user_id)
+
+            started = time.perf_counter()
+            await asyncio.gather(*(limited(1000 + i) for i in range(users)))
+            elapsed = time.perf_counter() - started
+    finally:
+        process.send_signal(signal.SIGTERM)
+        try:
+            process.wait(30)
+        except subprocess.TimeoutExpired:
+            process.kill()
+        await runner.cleanup()
+        log.close()
+
+    if test.failed or not test.latencies:
+        print(f"workers={workers:2d}  {test.failed} steps timed out, bot log: {log.name}")
+        if not test.latencies:
+            return
+
+    latencies = sorted(test.latencies)
+    quantile = lambda q: latencies[min(len(latencies) - 1, int(q * len(latencies)))] * 1000
+    print(
+        f"workers={workers:2d}  {len(latencies) / elapsed:7.1f} steps/s  "
+        f"p50 {quantile(0.5):6.1f} ms  p95 {quantile(0.95):6.1f} ms  p99 {quantile(0.99):6.1f} ms  "
+        f"mean {statistics.mean(latencies) * 1000:6.1f} ms  failed {test.failed}"
+    )
+    print(f"           API calls: {dict(sorted(api.calls.items()))}, error alerts: {api.alerts}")
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4])
+    parser.add_argument("--users", type=int, default=300)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--api-port", type=int, default=18081)
+    parser.add_argument("--bot-port", type=int, default=18080)
+    args = parser.parse_args()
+    for workers in args.workers:
+        await run(workers, args.users, args.concurrency, args.api_port, args.bot_port)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,29 +1,59 @@
+import time
+STARTED = time.perf_counter()  # До остальных импортов: их время входит в замер запуска
 import asyncio
 import logging
+import signal
 import sys
 from pathlib import Path
 from aiogram import Bot, Dispatcher, types, F
-from aiogram.filters import Command, StateFilter
+from aiogram.filters import Command
 from aiogram.client.default import DefaultBotProperties
-from aiogram.fsm.storage.memory import MemoryStorage
+from aiogram.client.telegram import TelegramAPIServer
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
-from aiogram.utils.keyboard import ReplyKeyboardBuilder
 from config.settings import settings
-from database.session import init_db, engine
+from database.session import SchemaError, init_db, engine, SessionLocal
+from database.pool import pool_stats, start_pool_reporter, stop_pool_reporter
+from database.crud import count_throttle_states
 from services.lock_system import InstanceLock
-from typing import Dict, Any, List, Tuple, Optional
-
-Path("logs").mkdir(exist_ok=True)
-logging.basicConfig(
-    level=logging.DEBUG,  # <- ИЗМЕНИТЕ с INFO на DEBUG
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-    handlers=[
-        logging.FileHandler("logs/bot_errors.log"),
-        logging.StreamHandler()
-    ]
-)
+from handlers.admin_handlers import admin_router
+from services.broadcast import run_broadcast_scheduler
+from services.leader import leader
+from services.deliverability import load_undeliverable, set_shared
+from middlewares.deliverability import DeliverabilityMiddleware
+from middlewares.database import DbSessionMiddleware
+from middlewares.user_registry import UserRegistryMiddleware
+from middlewares.activity import ActivityMiddleware
+from middlewares.throttling import setup_throttling
+from middlewares.fsm_flush import FsmFlushMiddleware, FsmFlushRequestMiddleware
+from middlewares.chat_scheduler import ChatSchedulerMiddleware
+from middlewares.button_router import ButtonRouterMiddleware
+from middlewares.log_context import LogContextMiddleware
+from middlewares.metrics import ApiMetricsMiddleware, HandlerMetricsMiddleware
+from middlewares.throttling import SharedThrottlingMiddleware, ThrottlingMiddleware
+from services.user_registry import user_registry
+from services.activity import activity_tracker
+from services.catalog import catalog_manager
+from services.startup import Startup
+from services.log_pipeline import setup_logging
+from services.metrics import metrics_server, registry
+from services.stats import ensure_stats, run_stats_maintenance
+from services.message_cleaner import MessageCleaner, SharedMessageCleaner
+from services.screen import ScreenRenderer, SharedScreenRenderer
+from services.fsm_storage import DatabaseStorage, count_states, create_fsm_storage
+from services.dispatch import ChatScheduler
+from services.buttons import Button
+from services.keyboards import KeyboardSession
+from config.catalog import catalog
+from config.keyboard_layouts import parse_choice, get_main_menu, channels_inline_kb, durations_inline_kb, media_inline_kb, text_inline_kb
+from typing import Optional
+
+log_sampler = setup_logging()
 logger = logging.getLogger(__name__)
+startup = Startup(STARTED)
+startup.mark("imports")
+
+EXIT_CONFIG = 78  # sysexits EX_CONFIG: exitcodes в bot_supervisor.conf, RestartPreventExitStatus в systemd
 
 class Form(StatesGroup):
     select_channel = State()
@@ -31,29 +61,43 @@ class Form(StatesGroup):
     enter_media = State()
     enter_text = State()
 
-class MessageCleaner:
-    def __init__(self):
-        self.user_messages = {}
-        self.bot_messages = {}
-
-    async def add_message(self, chat_id: int, message_id: int, is_bot: bool = False):
-        target = self.bot_messages if is_bot else self.user_messages
-        if chat_id not in target:
-            target[chat_id] = []
-        target[chat_id].append(message_id)
-
-    async def clean_chat(self, bot: Bot, chat_id: int):
-        for messages in [self.user_messages, self.bot_messages]:
-            if chat_id in messages:
-                for msg_id in messages[chat_id]:
-                    try:
-                        await bot.delete_message(chat_id, msg_id)
-                    except Exception:
-                        pass
-                messages[chat_id] = []
-
-async def on_startup(bot: Bot):
-    """Действия при запуске бота"""
+async def on_startup(bot: Bot, dispatcher: Dispatcher, cleaner: MessageCleaner):
+    """Действия при запуске процесса (в webhook-режиме — каждого воркера).
+
+    Схема БД к этому моменту уже проверена. До готовности — только то, без
+    чего апдейты обрабатывать нельзя; восстановление очереди удалений и
+    списка недоступных пользователей догружается в фоне.
+    """
+    try:
+        start_pool_reporter()
+        activity_tracker.start()
+        cleaner.start()
+        await catalog_manager.load()
+        catalog_manager.start()
+        startup.mark("catalog")
+        leader.add_job(lambda: run_singletons(bot, dispatcher))
+        leader.add_job(run_stats_maintenance)
+        await leader.start()
+        startup.mark("leader")
+    except Exception as e:
+        logger.critical(f"Startup error: {e}")
+        raise
+    startup.set_ready()
+    await metrics_server.start()
+    startup.warm_up("message cleaner", cleaner.load)
+    startup.warm_up("undeliverable users", load_undeliverable)
+
+async def run_singletons(bot: Bot, dispatcher: Dispatcher):
+    """Задания, которые выполняет только процесс-лидер"""
+    async with SessionLocal() as db:
+        await ensure_stats(db)
+        await db.commit()
+    if settings.WEBHOOK_URL:
+        await bot.set_webhook(
+            settings.WEBHOOK_URL.rstrip("/") + settings.WEBHOOK_PATH,
+            secret_token=webhook_secret(),
+            allowed_updates=dispatcher.resolve_used_update_types()
+        )
     try:
         await bot.send_message(
             settings.ADMIN_IDS[0], 
@@ -61,157 +105,158 @@ async def on_startup(bot: Bot):
             f"Версия: 2.1\n"
             f"Админов: {len(settings.ADMIN_IDS)}"
         )
-        init_db()
     except Exception as e:
-        logger.error(f"Startup error: {e}")
+        logger.error(f"Startup notification failed: {e}")
+    await run_broadcast_scheduler(bot)
 
-async def on_shutdown(bot: Bot):
+async def on_shutdown(bot: Bot, cleaner: MessageCleaner, dispatcher: Dispatcher,
+                      scheduler: Optional[ChatScheduler] = None):
     """Действия при остановке бота"""
     try:
+        await startup.stop()
+        await metrics_server.stop()
+        if scheduler:
+            await scheduler.close()
+        was_leader = leader.is_leader
+        await leader.stop()
+        await activity_tracker.stop()
+        await catalog_manager.stop()
+        await cleaner.close()
+        await dispatcher.storage.close()
+        stop_pool_reporter()
         await engine.dispose()
-        await bot.send_message(settings.ADMIN_IDS[0], "🔴 Бот остановлен")
+        logger.info(f"Log sampling: {log_sampler.dropped} DEBUG records dropped")
+        if was_leader:
+            await bot.send_message(settings.ADMIN_IDS[0], "🔴 Бот остановлен")
     except Exception as e:
         logger.error(f"Shutdown error: {e}")
     finally:
         await bot.session.close()
 
-async def show_loading(bot: Bot, chat_id: int, text: str = "⏳ Загрузка...") -> int:
-    """Показывает сообщение загрузки и возвращает его ID"""
-    msg = await bot.send_message(chat_id, text)
-    return msg.message_id
-
-async def setup_routers(dp: Dispatcher, bot: Bot, cleaner: MessageCleaner, show_loading_func):
+async def setup_routers(dp: Dispatcher, bot: Bot, cleaner: MessageCleaner, screen: ScreenRenderer):
     """Настройка всех роутеров и обработчиков"""
-    
+
+    async def show_main_menu(chat_id: int, user_id: int):
+        """Главное меню с reply-клавиатурой; живой экран размещения закрывается"""
+        await screen.dismiss(chat_id)
+        await cleaner.clean_chat(bot, chat_id)
+
+        msg = await bot.send_message(
+            chat_id,
+            "🔹 Добро пожаловать! Выберите действие:",
+            reply_markup=get_main_menu(user_id in settings.ADMIN_IDS)
+        )
+        await cleaner.add_message(chat_id, msg.message_id)
+
+    async def show_channels(chat_id: int, resend: bool = False):
+        await screen.show(bot, chat_id, "📢 Выберите канал для рекламы:", channels_inline_kb(), resend=resend)
+
+    async def show_durations(chat_id: int, channel: str, resend: bool = False):
+        await screen.show(
+            bot, chat_id,
+            f"Выбран канал: {channel}\n"
+            "📅 Выберите срок размещения:",
+            durations_inline_kb(),
+            resend=resend
+        )
+
     # Главное меню
     @dp.message(Command("start", "help"))
     async def cmd_start(message: types.Message, state: FSMContext):
         try:
             await state.clear()
-            await cleaner.clean_chat(bot, message.chat.id)
-            
-            builder = ReplyKeyboardBuilder()
-            buttons = [
-                "📢 Разместить рекламу",
-                "📋 Мои объявления",
-                "💰 Баланс",
-                "🆘 Помощь",
-                "◀️ На главную"
-            ]
-            
-            for button in buttons[:-1]:
-                builder.add(types.KeyboardButton(text=button))
-            builder.adjust(2, 2, 1)
-            
-            if message.from_user.id in settings.ADMIN_IDS:
-                builder.row(types.KeyboardButton(text="👑 Админ-панель"))
-            
-            msg = await message.answer(
-                "🔹 Добро пожаловать! Выберите действие:",
-                reply_markup=builder.as_markup(resize_keyboard=True)
-            )
-            await cleaner.add_message(message.chat.id, msg.message_id)
+            await show_main_menu(message.chat.id, message.from_user.id)
         except Exception as e:
             logger.error(f"Start command error: {e}")
             await message.answer("⚠️ Ошибка, попробуйте позже")
 
-    # Обработка кнопки "На главную"
-    @dp.message(F.text == "◀️ На главную")
+    # Обработка кнопки "На главную": срабатывает раньше роутеров, и для админов тоже
+    @dp.message(Button("◀️ На главную"))
     async def back_to_main(message: types.Message, state: FSMContext):
         await cmd_start(message, state)
 
+    @dp.callback_query(F.data == "ad_home")
+    async def ad_home(callback: types.CallbackQuery, state: FSMContext):
+        await state.clear()
+        await show_main_menu(callback.message.chat.id, callback.from_user.id)
+        await callback.answer()
+
     # Обработка кнопки "Разместить рекламу"
-    @dp.message(F.text == "📢 Разместить рекламу")
+    @dp.message(Button("📢 Разместить рекламу"))
     async def start_advert(message: types.Message, state: FSMContext):
         try:
-            await cleaner.clean_chat(bot, message.chat.id)
-            load_msg_id = await show_loading_func(bot, message.chat.id)
-            
-            builder = ReplyKeyboardBuilder()
-            for channel in settings.CHANNELS:
-                builder.add(types.KeyboardButton(text=channel))
-            builder.adjust(2)
-            builder.row(types.KeyboardButton(text="◀️ На главную"))
-            
-            await bot.delete_message(message.chat.id, load_msg_id)
-            msg = await message.answer(
-                "📢 Выберите канал для рекламы:",
-                reply_markup=builder.as_markup(resize_keyboard=True)
-            )
-            await cleaner.add_message(message.chat.id, msg.message_id)
+            # Состояние — до экрана: в общем хранилище оно сохраняется перед
+            # запросом к API, и следующее нажатие увидит уже новый шаг.
+            # Экран ниже сообщения пользователя — отправляем заново
             await state.set_state(Form.select_channel)
+            await show_channels(message.chat.id, resend=True)
         except Exception as e:
             logger.error(f"Advert start error: {e}")
             await message.answer("⚠️ Ошибка при запуске размещения")
 
     # Обработка выбора канала
-    @dp.message(Form.select_channel, F.text.in_(settings.CHANNELS))
-    async def select_channel(message: types.Message, state: FSMContext):
+    @dp.callback_query(Form.select_channel, F.data.startswith("ad_ch_"))
+    async def select_channel(callback: types.CallbackQuery, state: FSMContext):
         try:
-            await cleaner.clean_chat(bot, message.chat.id)
-            load_msg_id = await show_loading(bot, message.chat.id)
-            
-            builder = ReplyKeyboardBuilder()
-            for duration, price in settings.PRICES.items():
-                builder.add(types.KeyboardButton(
-                    text=f"{duration} - {price['amount']} руб"
-                ))
-            builder.adjust(2)
-            builder.row(types.KeyboardButton(text="◀️ Назад"))
-            
-            await bot.delete_message(message.chat.id, load_msg_id)
-            msg = await message.answer(
-                f"Выбран канал: {message.text}\n"
-                "📅 Выберите срок размещения:",
-                reply_markup=builder.as_markup(resize_keyboard=True)
-            )
-            await cleaner.add_message(message.chat.id, msg.message_id)
-            await state.update_data(channel=message.text)
+            channels = catalog.snapshot.channel_names
+            index = parse_choice(callback.data, catalog.snapshot)
+            if index is None or index >= len(channels):
+                await show_channels(callback.message.chat.id)
+                return await callback.answer("Список каналов обновился, выберите снова")
+
+            await state.update_data(channel=channels[index])
             await state.set_state(Form.select_duration)
+            await show_durations(callback.message.chat.id, channels[index])
+            await callback.answer()
         except Exception as e:
             logger.error(f"Channel select error: {e}")
-            await message.answer("⚠️ Ошибка при выборе канала")
+            await callback.answer("⚠️ Ошибка при выборе канала", show_alert=True)
 
-    # Обработка кнопки "Назад" при выборе канала
-    @dp.message(Form.select_channel, F.text == "◀️ Назад")
-    async def back_from_channels(message: types.Message, state: FSMContext):
-    # Очищаем состояние и возвращаемся в главное меню
-               await state.clear()
-               await cmd_start(message, state)
+    # Обработка кнопки "Назад" при выборе срока
+    @dp.callback_query(Form.select_duration, F.data == "ad_back_channel")
+    async def back_to_channels(callback: types.CallbackQuery, state: FSMContext):
+        await state.set_state(Form.select_channel)
+        await show_channels(callback.message.chat.id)
+        await callback.answer()
 
     # Обработка выбора срока
-    @dp.message(Form.select_duration)
-    async def select_duration(message: types.Message, state: FSMContext):
+    @dp.callback_query(Form.select_duration, F.data.startswith("ad_dur_"))
+    async def select_duration(callback: types.CallbackQuery, state: FSMContext):
         try:
-            selected_text = message.text.split(' - ')[0]
-            
-            if selected_text in settings.PRICES:
-                await cleaner.clean_chat(bot, message.chat.id)
-                price = settings.PRICES[selected_text]
-                await state.update_data(
-                    duration=selected_text,
-                    price=price['amount']
-                )
-                
-                builder = ReplyKeyboardBuilder()
-                builder.add(types.KeyboardButton(text="Пропустить"))
-                builder.row(types.KeyboardButton(text="◀️ Назад"))
-                
-                msg = await message.answer(
-                    f"📌 Вы выбрали:\n"
-                    f"Канал: {(await state.get_data())['channel']}\n"
-                    f"Срок: {selected_text}\n"
-                    f"Цена: {price['amount']} руб\n\n"
-                    "Отправьте фото или видео для объявления (или нажмите 'Пропустить'):",
-                    reply_markup=builder.as_markup(resize_keyboard=True)
-                )
-                await cleaner.add_message(message.chat.id, msg.message_id)
-                await state.set_state(Form.enter_media)
-            else:
-                await message.answer("Пожалуйста, выберите срок из предложенных вариантов")
+            snapshot = catalog.snapshot
+            index = parse_choice(callback.data, snapshot)
+            data = await state.get_data()
+            if index is None or index >= len(snapshot.durations):
+                await show_durations(callback.message.chat.id, data['channel'])
+                return await callback.answer("Цены обновились, выберите срок снова")
+
+            selected = snapshot.durations[index]
+            price = snapshot.prices[selected]
+            await state.update_data(
+                duration=selected,
+                price=price['price']
+            )
+            await state.set_state(Form.enter_media)
+
+            await screen.show(
+                bot, callback.message.chat.id,
+                f"📌 Вы выбрали:\n"
+                f"Канал: {data['channel']}\n"
+                f"Срок: {selected}\n"
+                f"Цена: {price['price']} руб\n\n"
+                "Отправьте фото или видео для объявления (или нажмите 'Пропустить'):",
+                media_inline_kb()
+            )
+            await callback.answer()
         except Exception as e:
             logger.error(f"Duration select error: {e}")
-            await message.answer("⚠️ Ошибка при выборе срока")
+            await callback.answer("⚠️ Ошибка при выборе срока", show_alert=True)
+
+    # Текст вместо кнопки — показываем экран заново под сообщением
+    @dp.message(Form.select_duration)
+    async def repeat_durations(message: types.Message, state: FSMContext):
+        data = await state.get_data()
+        await show_durations(message.chat.id, data['channel'], resend=True)
 
     # Обработка медиа-контента
     @dp.message(Form.enter_media, F.content_type.in_({'photo', 'video'}))
@@ -225,50 +270,35 @@ async def setup_routers(dp: Dispatcher, bot: Bot, cleaner: MessageCleaner, show_
                 media_type = "video"
             
             await state.update_data(media_id=media_id, media_type=media_type)
-            await cleaner.clean_chat(bot, message.chat.id)
-            
-            msg = await message.answer(
+            await state.set_state(Form.enter_text)
+            await screen.show(
+                bot, message.chat.id,
                 "Медиа-контент сохранён. Теперь введите текст объявления (максимум 1000 символов):",
-                reply_markup=types.ReplyKeyboardRemove()
+                text_inline_kb(),
+                resend=True
             )
-            await cleaner.add_message(message.chat.id, msg.message_id)
-            await state.set_state(Form.enter_text)
         except Exception as e:
             logger.error(f"Media handling error: {e}")
             await message.answer("⚠️ Ошибка при обработке медиа")
 
     # Пропуск добавления медиа
-    @dp.message(Form.enter_media, F.text == "Пропустить")
-    async def skip_media(message: types.Message, state: FSMContext):
-        await cleaner.clean_chat(bot, message.chat.id)
-        msg = await message.answer(
+    @dp.callback_query(Form.enter_media, F.data == "ad_skip_media")
+    async def skip_media(callback: types.CallbackQuery, state: FSMContext):
+        await state.set_state(Form.enter_text)
+        await screen.show(
+            bot, callback.message.chat.id,
             "Введите текст объявления (максимум 1000 символов):",
-            reply_markup=types.ReplyKeyboardRemove()
+            text_inline_kb()
         )
-        await cleaner.add_message(message.chat.id, msg.message_id)
-        await state.set_state(Form.enter_text)
+        await callback.answer()
 
     # Назад к выбору срока
-    @dp.message(Form.enter_media, F.text == "◀️ Назад")
-    async def back_from_media(message: types.Message, state: FSMContext):
+    @dp.callback_query(Form.enter_media, F.data == "ad_back_duration")
+    async def back_from_media(callback: types.CallbackQuery, state: FSMContext):
         data = await state.get_data()
-        await cleaner.clean_chat(bot, message.chat.id)
-        
-        builder = ReplyKeyboardBuilder()
-        for duration, price in settings.PRICES.items():
-            builder.add(types.KeyboardButton(
-                text=f"{duration} - {price['amount']} руб"
-            ))
-        builder.adjust(2)
-        builder.row(types.KeyboardButton(text="◀️ Назад"))
-        
-        msg = await message.answer(
-            f"Выбран канал: {data['channel']}\n"
-            "📅 Выберите срок размещения:",
-            reply_markup=builder.as_markup(resize_keyboard=True)
-        )
-        await cleaner.add_message(message.chat.id, msg.message_id)
         await state.set_state(Form.select_duration)
+        await show_durations(callback.message.chat.id, data['channel'])
+        await callback.answer()
 
     # Обработка ввода текста объявления
     @dp.message(Form.enter_text)
@@ -279,7 +309,6 @@ async def setup_routers(dp: Dispatcher, bot: Bot, cleaner: MessageCleaner, show_
                 return
             
             data = await state.get_data()
-            await cleaner.clean_chat(bot, message.chat.id)
             
             # Формируем текст объявления
             ad_text = (
@@ -293,6 +322,8 @@ async def setup_routers(dp: Dispatcher, bot: Bot, cleaner: MessageCleaner, show_
             
             # Если есть медиа - отправляем его с текстом
             if 'media_id' in data:
+                await screen.dismiss(message.chat.id)
+                await cleaner.clean_chat(bot, message.chat.id)
                 if data['media_type'] == 'photo':
                     await bot.send_photo(
                         chat_id=message.chat.id,
@@ -306,8 +337,8 @@ async def setup_routers(dp: Dispatcher, bot: Bot, cleaner: MessageCleaner, show_
                         caption=ad_text
                     )
             else:
-                # Только текст
-                await message.answer(ad_text)
+                # Только текст — итог заменяет экран размещения
+                await screen.show(bot, message.chat.id, ad_text, resend=True)
             
             await state.clear()
             
@@ -316,10 +347,9 @@ async def setup_routers(dp: Dispatcher, bot: Bot, cleaner: MessageCleaner, show_
             await message.answer("⚠️ Ошибка при создании объявления")
 
     # Обработка кнопок меню
-    @dp.message(F.text.in_(["📋 Мои объявления", "💰 Баланс", "🆘 Помощь"]))
+    @dp.message(Button("📋 Мои объявления", "💰 Баланс", "🆘 Помощь"))
     async def handle_menu_buttons(message: types.Message):
         try:
-            await cleaner.clean_chat(bot, message.chat.id)
             if message.text == "📋 Мои объявления":
                 response = "📋 Ваши объявления:\n(здесь будет список ваших объявлений)"
             elif message.text == "💰 Баланс":
@@ -330,45 +360,207 @@ async def setup_routers(dp: Dispatcher, bot: Bot, cleaner: MessageCleaner, show_
                           "/help - Эта справка\n"
                           "По вопросам: @support")
             
-            msg = await message.answer(response)
-            await cleaner.add_message(message.chat.id, msg.message_id)
+            await screen.show(bot, message.chat.id, response, resend=True)
         except Exception as e:
             logger.error(f"Menu button error: {e}")
             await message.answer("⚠️ Ошибка при обработке запроса")
 
+def create_bot() -> Bot:
+    if settings.TELEGRAM_API_URL:
+        session = KeyboardSession(api=TelegramAPIServer.from_base(settings.TELEGRAM_API_URL))
+    else:
+        session = KeyboardSession()
+    session.middleware(ApiMetricsMiddleware())
+    return Bot(
+        token=settings.BOT_TOKEN,
+        session=session,
+        default=DefaultBotProperties(parse_mode="HTML")
+    )
+
+def register_gauges(dp: Dispatcher, cleaner: MessageCleaner, throttling: ThrottlingMiddleware,
+                    scheduler: Optional[ChatScheduler]):
+    """Показатели состояния для /metrics: читаются при запросе, а не на каждом апдейте"""
+    async def throttle_entries():
+        if isinstance(throttling, SharedThrottlingMiddleware):
+            async with SessionLocal() as db:
+                return await count_throttle_states(db)
+        return len(throttling)
+
+    registry.gauge("bot_fsm_users", "Users per FSM state", lambda: count_states(dp.storage), ("state",))
+    registry.gauge("bot_cleaner_chats", "Chats tracked by the message cleaner", lambda: len(cleaner))
+    registry.gauge("bot_throttle_entries", "Users in the anti-flood table", throttle_entries)
+    registry.gauge("bot_db_connections_checked_out", "DB connections out of the pool",
+                   lambda: pool_stats.checked_out)
+    if scheduler is not None:
+        registry.gauge("bot_dispatch_queued", "Updates waiting in per-chat queues", lambda: scheduler.queued)
+        registry.gauge("bot_dispatch_running", "Updates being handled", lambda: scheduler.running)
+
+async def create_dispatcher(bot: Bot, shared: bool = False) -> Dispatcher:
+    """Диспетчер со всеми роутерами; shared — состояние в общем хранилище для нескольких воркеров"""
+    dp = Dispatcher(storage=create_fsm_storage(shared=shared), name="dispatcher")
+    set_shared(shared)
+    if shared:
+        cleaner = SharedMessageCleaner()
+        screen = SharedScreenRenderer(cleaner, dp.storage, bot.id)
+    else:
+        cleaner = MessageCleaner()
+        screen = ScreenRenderer(cleaner)
+
+    # Настройка роутеров
+    await setup_routers(dp, bot, cleaner, screen)
+    dp.include_router(admin_router)
+    dp["cleaner"] = cleaner
+    dp["screen"] = screen
+    dp["buttons"] = buttons = ButtonRouterMiddleware(dp)
+    dp.message.outer_middleware(buttons)
+    throttling = setup_throttling(dp, shared=shared)
+    scheduler = None
+    if settings.DISPATCH_CONCURRENCY > 0:
+        scheduler = ChatScheduler()
+        dp["scheduler"] = scheduler
+        dp.update.outer_middleware(ChatSchedulerMiddleware(scheduler, dp))
+    # После очередей: контекст лога задаётся в задаче, которая обрабатывает апдейт
+    log_context = LogContextMiddleware()
+    dp.update.outer_middleware(log_context)
+    dp.message.middleware(log_context)
+    dp.callback_query.middleware(log_context)
+    handler_metrics = HandlerMetricsMiddleware()
+    dp.message.middleware(handler_metrics)
+    dp.callback_query.middleware(handler_metrics)
+    register_gauges(dp, cleaner, throttling, scheduler)
+    if isinstance(dp.storage, DatabaseStorage):
+        dp.update.outer_middleware(FsmFlushMiddleware(dp.storage))
+        if shared:
+            bot.session.middleware(
+                FsmFlushRequestMiddleware(dp.storage, commit_session=engine.dialect.name == "sqlite")
+            )
+    dp.update.outer_middleware(DeliverabilityMiddleware())
+    dp.update.middleware(DbSessionMiddleware(SessionLocal))
+    dp.update.middleware(UserRegistryMiddleware(user_registry))
+    dp.update.middleware(ActivityMiddleware(activity_tracker))
+
+    # Подключение обработчиков startup/shutdown
+    dp.startup.register(on_startup)
+    dp.shutdown.register(on_shutdown)
+    return dp
+
+def webhook_secret() -> str:
+    """Значение X-Telegram-Bot-Api-Secret-Token; без WEBHOOK_SECRET выводится из токена"""
+    import hashlib
+    return settings.WEBHOOK_SECRET or hashlib.sha256(settings.BOT_TOKEN.encode()).hexdigest()
+
 async def main():
-    """Основная функция бота"""
+    """Long polling: один процесс, второй экземпляр не запустится"""
     lock = InstanceLock()
     if not lock.acquire():
         logger.critical("Another instance is already running. Exiting.")
         return
+    # Единственный процесс: аренду лидера прошлого запуска ждать не нужно
+    leader.exclusive = True
 
     try:
         # Инициализация бота и диспетчера
-        bot = Bot(
-            token=settings.BOT_TOKEN,
-            default=DefaultBotProperties(parse_mode="HTML")
-        )
-        dp = Dispatcher(storage=MemoryStorage())
-        cleaner = MessageCleaner()
-
-        # Настройка роутеров
-        await setup_routers(dp, bot, cleaner, show_loading)
+        bot = create_bot()
+        dp = await create_dispatcher(bot)
+        startup.mark("dispatcher")
+        # Схема проверяется до первого getUpdates: с неисправной БД бот не стартует
+        await init_db()
+        startup.mark("database")
 
-        # Подключение обработчиков startup/shutdown
-        dp.startup.register(on_startup)
-        dp.shutdown.register(on_shutdown)
-        
         # Запуск бота
         await bot.delete_webhook(drop_pending_updates=True)
-        await dp.start_polling(bot)
-        
-    except Exception as e:
-        logger.critical(f"Fatal error: {e}", exc_info=True)
+        startup.mark("delete_webhook")
+        # С очередями по чатам polling ждёт постановки апдейта в очередь — так
+        # работает противодавление; без них aiogram создаёт задачу на апдейт
+        await dp.start_polling(bot, handle_as_tasks=settings.DISPATCH_CONCURRENCY <= 0)
     finally:
         lock.release()
         if 'bot' in locals():
             await bot.session.close()
+        # Если запуск сорвался до polling, on_shutdown не вызывался: поток
+        # aiosqlite не дал бы процессу завершиться
+        await engine.dispose()
+
+async def healthz(request) -> "web.Response":
+    """Готовность воркера для балансировщика или супервизора: 200 после запуска, иначе 503"""
+    from aiohttp import web
+    return web.json_response({"ready": startup.ready}, status=200 if startup.ready else 503)
+
+async def create_webhook_app() -> "web.Application":
+    # Webhook-сервер нужен только в этом режиме — в polling он не импортируется
+    from aiohttp import web
+    from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
+
+    bot = create_bot()
+    dp = await create_dispatcher(bot, shared=True)
+    startup.mark("dispatcher")
+    app = web.Application()
+    app.router.add_get("/healthz", healthz)
+    # Запросы без верного секрета получают 401 до разбора апдейта
+    SimpleRequestHandler(
+        dispatcher=dp, bot=bot, secret_token=webhook_secret(),
+        # С очередями по чатам ответ уходит после постановки в очередь
+        handle_in_background=settings.DISPATCH_CONCURRENCY <= 0
+    ).register(app, path=settings.WEBHOOK_PATH)
+    setup_application(app, dp, bot=bot)
+    return app
+
+def run_webhook_worker():
+    """Процесс-воркер: все воркеры слушают один порт (SO_REUSEPORT), ядро раздаёт соединения"""
+    from aiohttp import web
+    web.run_app(
+        create_webhook_app(),
+        host=settings.WEBHOOK_HOST,
+        port=settings.WEBHOOK_PORT,
+        reuse_port=settings.WEBHOOK_WORKERS > 1,
+        print=None
+    )
+
+async def prepare_database():
+    """Таблицы создаются один раз до запуска воркеров, чтобы они не гонялись на CREATE TABLE"""
+    try:
+        await init_db()
+    finally:
+        await engine.dispose()
+
+def run_webhook():
+    """Webhook: WEBHOOK_WORKERS процессов за одним портом, одиночные задания — у лидера"""
+    asyncio.run(prepare_database())
+    startup.mark("database")
+    if settings.WEBHOOK_WORKERS <= 1:
+        return run_webhook_worker()
+
+    import multiprocessing
+    context = multiprocessing.get_context("spawn")
+    workers = [
+        context.Process(target=run_webhook_worker, name=f"webhook-worker-{i}")
+        for i in range(settings.WEBHOOK_WORKERS)
+    ]
+    for worker in workers:
+        worker.start()
+    logger.info(f"Started {len(workers)} webhook workers on port {settings.WEBHOOK_PORT}")
+
+    stopping = False
+
+    def stop_workers(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for worker in workers:
+            worker.terminate()  # SIGTERM: aiohttp штатно вызывает on_shutdown
+
+    signal.signal(signal.SIGTERM, stop_workers)
+    try:
+        for worker in workers:
+            worker.join()
+    except KeyboardInterrupt:
+        # Ctrl+C получает вся группа процессов — ждём, пока воркеры остановятся
+        stopping = True
+        for worker in workers:
+            worker.join()
+    failed = [worker.name for worker in workers if worker.exitcode]
+    if failed and not stopping:
+        # Иначе главный процесс выйдет с кодом 0 и супервизор не перезапустит бота
+        raise RuntimeError(f"Webhook workers failed: {', '.join(failed)}")
 
 if __name__ == "__main__":
     if not Path(".env").exists():
@@ -376,8 +568,14 @@ if __name__ == "__main__":
         sys.exit(1)
 
     try:
-        asyncio.run(main())
+        if settings.WEBHOOK_URL:
+            run_webhook()
+        else:
+            asyncio.run(main())
     except KeyboardInterrupt:
         logger.info("Bot stopped by user")
     except Exception as e:
-        logger.critical(f"Unexpected error: {e}")
\ No newline at end of file
+        logger.critical(f"Fatal error: {e}", exc_info=True)
+        # Ненулевой код: супервизор видит сбой; при неверной схеме БД —
+        # EXIT_CONFIG, по которому он процесс не перезапускает
+        sys.exit(EXIT_CONFIG if isinstance(e, SchemaError) else 1)
\ No newline at end of file
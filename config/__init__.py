@@ -1,6 +1,26 @@
+from importlib import import_module
+
+# settings и messages совпадают по имени с модулями пакета, поэтому
+# импортируются сразу (оба лёгкие). Клавиатуры и состояния тянут aiogram —
+# они загружаются при первом обращении: config.settings нужен и там, где
+# aiogram не нужен (главный процесс webhook, скрипты)
 from .settings import settings
 from .messages import messages
-from .keyboard_layouts import get_main_menu, generate_channels_kb, generate_durations_kb
-from .states import States
 
-__all__ = ['settings', 'messages', 'get_main_menu', 'generate_channels_kb', 'generate_durations_kb', 'States']
\ No newline at end of file
+_LAZY = {
+    'get_main_menu': '.keyboard_layouts',
+    'generate_channels_kb': '.keyboard_layouts',
+    'generate_durations_kb': '.keyboard_layouts',
+    'States': '.states',
+}
+
+
+def __getattr__(name):
+    if name not in _LAZY:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(import_module(_LAZY[name], __name__), name)
+    globals()[name] = value
+    return value
+
+
+__all__ = ['settings', 'messages', 'get_main_menu', 'generate_channels_kb', 'generate_durations_kb', 'States']
@@ -0,0 +1,51 @@
+from types import MappingProxyType
+from typing import Any, Callable, Dict, List, Mapping
+
+from config.settings import settings
+
+CHANNEL = "channel"
+DURATION = "duration"
+
+
+class CatalogSnapshot:
+    """Неизменяемый снимок каталога: каналы и сроки размещения в порядке показа.
+
+    Версия 0 — значения из .env до первой загрузки из БД. Вложенные словари
+    (id/url канала, price/discount срока) тоже нельзя менять: снимок общий
+    для всех апдейтов.
+    """
+
+    __slots__ = ("version", "channels", "prices", "channel_names", "durations")
+
+    def __init__(self, version: int, channels: Mapping[str, Dict[str, Any]],
+                 prices: Mapping[str, Dict[str, Any]]):
+        self.version = version
+        self.channels = MappingProxyType(dict(channels))
+        self.prices = MappingProxyType(dict(prices))
+        self.channel_names = tuple(self.channels)
+        self.durations = tuple(self.prices)
+
+
+class Catalog:
+    """Текущий снимок каталога. Чтение — одно обращение к атрибуту, без блокировок;
+    новый снимок подменяет старый целиком, поэтому обработчик, взявший
+    snapshot в начале, видит согласованные каналы и цены до конца."""
+
+    def __init__(self):
+        self.snapshot = CatalogSnapshot(0, settings.CHANNELS, settings.PRICES)
+        self._listeners: List[Callable[[CatalogSnapshot], None]] = []
+
+    def subscribe(self, listener: Callable[[CatalogSnapshot], None]):
+        self._listeners.append(listener)
+
+    def swap(self, snapshot: CatalogSnapshot) -> bool:
+        """Подменяет снимок, если он новее текущего"""
+        if snapshot.version <= self.snapshot.version:
+            return False
+        self.snapshot = snapshot
+        for listener in self._listeners:
+            listener(snapshot)
+        return True
+
+
+catalog = Catalog()
@@ -1,24 +1,30 @@
-from aiogram.utils.keyboard import ReplyKeyboardBuilder
+import zlib
+from typing import Callable, Dict, Optional, Tuple, Union
+
+from aiogram.utils.keyboard import InlineKeyboardBuilder, ReplyKeyboardBuilder
 from aiogram import types
-from config.settings import settings
-def get_main_menu(is_admin: bool = False):
-    builder = ReplyKeyboardBuilder()
-    menu_items = [
-        ("📢 Разместить рекламу", "Создать новое объявление"),
-        ("📋 Мои объявления", "Ваши активные объявления"),
-        ("💰 Баланс", "Пополнение и история платежей"),
-        ("🆘 Помощь", "Инструкции и поддержка")
-    ]
-    
-    for btn, _ in menu_items:
-        builder.add(types.KeyboardButton(text=btn))
-    builder.adjust(2, 2)
-    
-    if is_admin:
-        builder.row(types.KeyboardButton(text="👑 Админ-панель"))
-    
-    return builder.as_markup(resize_keyboard=True)
-def get_main_menu(is_admin: bool = False):
+from config.catalog import CatalogSnapshot, catalog
+
+Markup = Union[types.ReplyKeyboardMarkup, types.InlineKeyboardMarkup]
+Layout = Callable[[CatalogSnapshot, bool], Markup]
+
+
+def choice_callback(prefix: str, version: int, index: int) -> str:
+    """callback_data выбора из каталога: ad_ch_<версия>_<индекс>"""
+    return f"{prefix}_{version}_{index}"
+
+def parse_choice(data: str, snapshot: CatalogSnapshot) -> Optional[int]:
+    """Индекс из callback_data; None, если кнопка от другой версии каталога или данные подделаны"""
+    try:
+        version, index = map(int, data.rsplit("_", 2)[1:])
+    except ValueError:
+        return None
+    # Отрицательный индекс прошёл бы проверку index >= len(...) у вызывающих
+    return index if version == snapshot.version and index >= 0 else None
+
+
+# Раскладки: каждая клавиатура описана один раз и строится только реестром
+def _main_menu(snapshot: CatalogSnapshot, is_admin: bool) -> Markup:
     builder = ReplyKeyboardBuilder()
     builder.row(
         types.KeyboardButton(text="📢 Разместить рекламу"),
@@ -32,21 +38,175 @@ def get_main_menu(is_admin: bool = False):
         builder.row(types.KeyboardButton(text="👑 Админ-панель"))
     return builder.as_markup(resize_keyboard=True)
 
-def generate_channels_kb():
+def _admin_panel(snapshot: CatalogSnapshot, is_admin: bool) -> Markup:
     builder = ReplyKeyboardBuilder()
-    for channel in settings.CHANNELS:
+    builder.row(types.KeyboardButton(text="📈 Статистика"))
+    builder.row(types.KeyboardButton(text="📢 Рассылка"))
+    builder.row(types.KeyboardButton(text="✅ Модерация"))
+    builder.row(types.KeyboardButton(text="🗂 Каталог"))
+    builder.row(types.KeyboardButton(text="◀️ На главную"))
+    return builder.as_markup(resize_keyboard=True)
+
+def _channels_reply(snapshot: CatalogSnapshot, is_admin: bool) -> Markup:
+    builder = ReplyKeyboardBuilder()
+    for channel in snapshot.channel_names:
         builder.add(types.KeyboardButton(text=channel))
     builder.add(types.KeyboardButton(text="◀️ Назад"))
     return builder.as_markup(resize_keyboard=True)
 
-def generate_durations_kb():
+def _durations_reply(snapshot: CatalogSnapshot, is_admin: bool) -> Markup:
     builder = ReplyKeyboardBuilder()
-    for duration in settings.PRICES:
+    for duration in snapshot.durations:
         builder.add(types.KeyboardButton(text=duration))
     builder.add(types.KeyboardButton(text="◀️ Назад"))
     return builder.as_markup(resize_keyboard=True)
-def generate_channels_kb():
+
+def _balance(snapshot: CatalogSnapshot, is_admin: bool) -> Markup:
+    builder = ReplyKeyboardBuilder()
+    builder.row(types.KeyboardButton(text="💳 Пополнить баланс"))
+    builder.row(types.KeyboardButton(text="📊 История платежей"))
+    builder.row(types.KeyboardButton(text="◀️ На главную"))
+    return builder.as_markup(resize_keyboard=True)
+
+def _top_up(snapshot: CatalogSnapshot, is_admin: bool) -> Markup:
     builder = ReplyKeyboardBuilder()
-    # Добавление кнопок каналов...
-    builder.row(types.KeyboardButton(text="❌ Отмена"))
-    return builder.as_markup(resize_keyboard=True)
\ No newline at end of file
+    for amount in ("100 руб", "300 руб", "500 руб", "1000 руб"):
+        builder.add(types.KeyboardButton(text=amount))
+    builder.adjust(2)
+    builder.row(types.KeyboardButton(text="◀️ Назад"))
+    return builder.as_markup(resize_keyboard=True)
+
+# Inline-клавиатуры шагов размещения рекламы: экран редактируется, а не отправляется заново.
+# В callback_data — версия каталога и индекс канала/срока: названия не помещаются в 64 байта,
+# а по версии видно, что кнопка нажата на устаревшем списке
+def _channels_inline(snapshot: CatalogSnapshot, is_admin: bool) -> Markup:
+    builder = InlineKeyboardBuilder()
+    for index, channel in enumerate(snapshot.channel_names):
+        builder.button(text=channel, callback_data=choice_callback("ad_ch", snapshot.version, index))
+    builder.adjust(2)
+    builder.row(types.InlineKeyboardButton(text="◀️ На главную", callback_data="ad_home"))
+    return builder.as_markup()
+
+def _durations_inline(snapshot: CatalogSnapshot, is_admin: bool) -> Markup:
+    builder = InlineKeyboardBuilder()
+    for index, (duration, price) in enumerate(snapshot.prices.items()):
+        builder.button(text=f"{duration} - {price['price']} руб",
+                       callback_data=choice_callback("ad_dur", snapshot.version, index))
+    builder.adjust(2)
+    builder.row(types.InlineKeyboardButton(text="◀️ Назад", callback_data="ad_back_channel"))
+    return builder.as_markup()
+
+def _media_inline(snapshot: CatalogSnapshot, is_admin: bool) -> Markup:
+    builder = InlineKeyboardBuilder()
+    builder.row(types.InlineKeyboardButton(text="Пропустить", callback_data="ad_skip_media"))
+    builder.row(types.InlineKeyboardButton(text="◀️ Назад", callback_data="ad_back_duration"))
+    return builder.as_markup()
+
+def _text_inline(snapshot: CatalogSnapshot, is_admin: bool) -> Markup:
+    builder = InlineKeyboardBuilder()
+    builder.row(types.InlineKeyboardButton(text="❌ Отмена", callback_data="ad_home"))
+    return builder.as_markup()
+
+
+LAYOUTS: Dict[str, Layout] = {
+    "main": _main_menu,
+    "admin": _admin_panel,
+    "channels": _channels_reply,
+    "durations": _durations_reply,
+    "balance": _balance,
+    "top_up": _top_up,
+    "channels_inline": _channels_inline,
+    "durations_inline": _durations_inline,
+    "media_inline": _media_inline,
+    "text_inline": _text_inline,
+}
+
+
+class KeyboardRegistry:
+    """Готовые клавиатуры: каждая строится один раз на (раскладка, is_admin).
+
+    Разметка aiogram — замороженные pydantic-модели, поэтому один объект
+    безопасно отдаётся всем апдейтам (менять списки кнопок в нём нельзя).
+    Вместе с клавиатурой хранится её JSON и контрольная сумма: сессия
+    отправляет JSON без повторной сериализации, ScreenRenderer сравнивает
+    клавиатуры без неё. Кэш сбрасывается, когда подменяется снимок
+    каталога (config.catalog), или явным invalidate().
+    """
+
+    def __init__(self, layouts: Dict[str, Layout] = LAYOUTS):
+        self.layouts = layouts
+        self.version = 0
+        self.built = 0
+        self._snapshot: Optional[CatalogSnapshot] = None
+        self._markups: Dict[Tuple[str, bool], Markup] = {}
+        # id(клавиатуры) -> (клавиатура, JSON, crc32 JSON)
+        self._serialized: Dict[int, Tuple[Markup, str, int]] = {}
+
+    def invalidate(self):
+        self._markups.clear()
+        self._serialized.clear()
+        self.version += 1
+
+    def get(self, layout: str, is_admin: bool = False) -> Markup:
+        snapshot = catalog.snapshot
+        if snapshot is not self._snapshot:
+            self._snapshot = snapshot
+            self.invalidate()
+        key = (layout, is_admin)
+        markup = self._markups.get(key)
+        if markup is None:
+            markup = self._markups[key] = self.layouts[layout](snapshot, is_admin)
+            data = markup.model_dump_json(exclude_none=True)
+            self._serialized[id(markup)] = (markup, data, zlib.crc32(data.encode()))
+            self.built += 1
+        return markup
+
+    def _entry(self, markup: Markup) -> Optional[Tuple[Markup, str, int]]:
+        entry = self._serialized.get(id(markup))
+        return entry if entry and entry[0] is markup else None
+
+    def json(self, markup: Markup) -> Optional[str]:
+        """Готовый JSON клавиатуры из реестра (None для построенных на лету)"""
+        entry = self._entry(markup)
+        return entry[1] if entry else None
+
+    def digest(self, markup: Markup) -> int:
+        """Контрольная сумма клавиатуры; у клавиатур реестра — без сериализации"""
+        entry = self._entry(markup)
+        if entry:
+            return entry[2]
+        return zlib.crc32(markup.model_dump_json(exclude_none=True).encode())
+
+
+keyboards = KeyboardRegistry()
+
+
+def get_main_menu(is_admin: bool = False):
+    return keyboards.get("main", is_admin)
+
+def admin_kb():
+    return keyboards.get("admin")
+
+def generate_channels_kb():
+    return keyboards.get("channels")
+
+def generate_durations_kb():
+    return keyboards.get("durations")
+
+def balance_kb():
+    return keyboards.get("balance")
+
+def top_up_kb():
+    return keyboards.get("top_up")
+
+def channels_inline_kb():
+    return keyboards.get("channels_inline")
+
+def durations_inline_kb():
+    return keyboards.get("durations_inline")
+
+def media_inline_kb():
+    return keyboards.get("media_inline")
+
+def text_inline_kb():
+    return keyboards.get("text_inline")
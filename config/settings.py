@@ -11,6 +11,15 @@ class Settings(BaseSettings):
         default="sqlite:///./database.db",
         description="Database connection URL"
     )
+    DB_POOL_SIZE: int = Field(default=5, description="Persistent DB connections")
+    DB_MAX_OVERFLOW: int = Field(default=10, description="Extra connections under load")
+    DB_POOL_TIMEOUT: float = Field(default=30.0, description="Seconds to wait for a free connection")
+    USER_CACHE_SIZE: int = Field(default=100_000, description="Known users kept in memory")
+    ACTIVITY_FLUSH_INTERVAL: float = Field(default=5.0, description="Seconds between last_activity flushes")
+    CLEANER_MAX_PER_CHAT: int = Field(default=100, description="Tracked messages kept per chat for cleanup")
+    CLEANER_FLUSH_INTERVAL: float = Field(default=10.0, description="Seconds between cleaner state flushes")
+    FSM_STORAGE: str = Field(default="database", description="FSM backend: database, redis or memory")
+    FSM_CACHE_SIZE: int = Field(default=100_000, description="FSM records cached in memory (database backend)")
     REDIS_URL: str = "redis://localhost:6379/0"  # Значение по умолчанию
     
     # Настройки каналов
@@ -27,7 +36,7 @@ class Settings(BaseSettings):
                 "price_multiplier": 1.0
             }
         },
-        description="Channels available for advertising"
+        description="Initial channels, seeded into the catalog table on first start"
     )
     
     # Настройки цен
@@ -37,9 +46,62 @@ class Settings(BaseSettings):
             "2 дня": {"price": 1800, "discount": 0},
             "неделя": {"price": 5000, "discount": 0}
         },
-        description="Pricing information"
+        description="Initial pricing, seeded into the catalog table on first start"
     )
 
+    # Настройки рассылки
+    BROADCAST_RATE: float = Field(
+        default=30.0,
+        description="Global outgoing messages per second (Telegram limit ~30)"
+    )
+    BROADCAST_WORKERS: int = Field(
+        default=20,
+        description="Concurrent broadcast senders"
+    )
+
+    # Настройки антифлуда (GCRA): rate запросов за per секунд на пользователя
+    THROTTLE_MESSAGE_RATE: int = Field(default=5, description="Messages allowed per window")
+    THROTTLE_MESSAGE_PER: float = Field(default=10.0, description="Message window, seconds")
+    THROTTLE_CALLBACK_RATE: int = Field(default=10, description="Button presses allowed per window")
+    THROTTLE_CALLBACK_PER: float = Field(default=5.0, description="Button press window, seconds")
+
+    # Настройки модерации
+    MODERATION_LEASE_SECONDS: int = Field(
+        default=300,
+        description="How long a moderator keeps the ads on their queue page"
+    )
+
+    # Обработка апдейтов: по порядку внутри чата, параллельно между чатами
+    DISPATCH_CONCURRENCY: int = Field(default=32, description="Updates handled at once (0 = task per update, unordered)")
+    DISPATCH_MAX_QUEUED: int = Field(default=1000, description="Accepted updates before intake is paused")
+
+    # Режим webhook: пустой WEBHOOK_URL — long polling в одном процессе
+    WEBHOOK_URL: str = Field(default="", description="Public HTTPS base URL Telegram posts updates to")
+    WEBHOOK_PATH: str = Field(default="/webhook", description="Path of the webhook endpoint")
+    WEBHOOK_SECRET: str = Field(default="", description="X-Telegram-Bot-Api-Secret-Token value (derived from token if empty)")
+    WEBHOOK_HOST: str = Field(default="0.0.0.0", description="Address the webhook server binds to")
+    WEBHOOK_PORT: int = Field(default=8080, description="Port shared by all webhook workers")
+    WEBHOOK_WORKERS: int = Field(default=1, description="Worker processes serving the webhook")
+    LEADER_LEASE_SECONDS: float = Field(default=30.0, description="Leader lease for singleton jobs")
+    BROADCAST_POLL_INTERVAL: float = Field(default=5.0, description="How often the leader syncs broadcast jobs")
+    TELEGRAM_API_URL: str = Field(default="", description="Custom Bot API server base URL (local server or test stub)")
+    READY_FILE: str = Field(default="", description="File written when the process starts serving updates, removed on shutdown")
+    CATALOG_POLL_INTERVAL: float = Field(default=5.0, description="How often each process checks the catalog version")
+
+    # Логирование: запись на диск — в отдельном потоке, файл — JSON-строки с ротацией
+    LOG_LEVEL: str = Field(default="DEBUG", description="Root logger level")
+    LOG_FILE: str = Field(default="logs/bot_errors.log", description="JSON log file (webhook workers add their name)")
+    LOG_MAX_BYTES: int = Field(default=10 * 1024 * 1024, description="Log file size that triggers rotation")
+    LOG_BACKUP_COUNT: int = Field(default=5, description="Rotated gzip archives kept")
+    LOG_DEBUG_SAMPLING: Dict[str, float] = Field(
+        default={"aiosqlite": 0.01, "database.pool": 0.1},
+        description="Share of DEBUG records kept per logger (and its children)"
+    )
+
+    # Метрики: GET /metrics в формате Prometheus на локальном адресе
+    METRICS_HOST: str = Field(default="127.0.0.1", description="Address the metrics endpoint binds to")
+    METRICS_PORT: int = Field(default=9108, description="Metrics port, webhook workers use the next ones (0 = off)")
+
     # Валидаторы
     @field_validator('ADMIN_IDS', mode='before')
     @classmethod
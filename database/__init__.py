@@ -1,12 +1,30 @@
-from .session import get_db, init_db
-from .models import User, Ad
-from .crud import get_or_create_user, get_user_ads
+from importlib import import_module
+
+# Загружается при первом обращении: database.session при импорте создаёт
+# движок, а импорт одного database.models не должен его тянуть
+_LAZY = {
+    'SessionLocal': '.session',
+    'init_db': '.session',
+    'User': '.models',
+    'Ad': '.models',
+    'get_or_create_user': '.crud',
+    'get_user_ads': '.crud',
+}
+
+
+def __getattr__(name):
+    if name not in _LAZY:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(import_module(_LAZY[name], __name__), name)
+    globals()[name] = value
+    return value
+
 
 __all__ = [
-    'get_db', 
+    'SessionLocal',
     'init_db', 
     'User', 
     'Ad',
     'get_or_create_user',
     'get_user_ads'
-]
\ No newline at end of file
+]
@@ -1,9 +1,75 @@
-from sqlalchemy.orm import Session
-from .models import User, Ad
-from typing import List, Optional
+from sqlalchemy import LargeBinary, and_, case, cast, delete, func, insert, or_, select, tuple_, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from services.metrics import db_timed
+from .models import User, Ad, BroadcastJob, StatsCounter, CleanerChat, FsmRecord, ThrottleState, LeaderLease, CatalogItem, CatalogVersion
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Set, Tuple
 
-def get_or_create_user(db: Session, telegram_id: int, username: str = None, full_name: str = None) -> User:
-    user = db.query(User).filter(User.telegram_id == telegram_id).first()
+# Каждая корутина модуля помечена @db_timed: её время — в метрике
+# bot_db_query_seconds{function=...}. Новые функции помечаются так же
+
+# Ключи stats_counters
+USERS_TOTAL = "users_total"
+ADS_TOTAL = "ads_total"
+USERS_NEW_PREFIX = "users_new:"
+STATS_RECONCILED = "stats_reconciled_at"  # Время последней сверки, unix; пишет только reconcile_stats
+
+def ads_status_key(status: str) -> str:
+    return f"ads_status:{status}"
+
+def users_new_key(created_at: datetime) -> str:
+    """Часовая корзина регистраций"""
+    return f"{USERS_NEW_PREFIX}{created_at:%Y-%m-%dT%H}"
+
+def _insert(db: AsyncSession):
+    # Диалект уже загружен движком; второй при импорте не нужен
+    if db.bind.dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as pg_insert
+        return pg_insert
+    from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+    return sqlite_insert
+
+@db_timed
+async def bump_counters(db: AsyncSession, deltas: Dict[str, int]) -> None:
+    """Одно INSERT ... ON CONFLICT DO UPDATE value = value + delta на все ключи"""
+    deltas = {key: delta for key, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    stmt = _insert(db)(StatsCounter).values([{"key": key, "value": delta} for key, delta in deltas.items()])
+    await db.execute(stmt.on_conflict_do_update(
+        index_elements=[StatsCounter.key],
+        set_={"value": StatsCounter.value + stmt.excluded.value}
+    ))
+
+@db_timed
+async def get_counters(db: AsyncSession, keys: Iterable[str]) -> Dict[str, int]:
+    result = await db.execute(select(StatsCounter.key, StatsCounter.value).where(StatsCounter.key.in_(list(keys))))
+    return dict(result.all())
+
+@db_timed
+async def get_all_counters(db: AsyncSession) -> Dict[str, int]:
+    return dict((await db.execute(select(StatsCounter.key, StatsCounter.value))).all())
+
+@db_timed
+async def replace_counters(db: AsyncSession, values: Dict[str, int]) -> None:
+    await db.execute(delete(StatsCounter))
+    if values:
+        await db.execute(insert(StatsCounter), [{"key": key, "value": value} for key, value in values.items()])
+
+@db_timed
+async def delete_counters_before(db: AsyncSession, prefix: str, bound: str) -> int:
+    """Удаляет ключи с префиксом prefix, меньшие bound (часовые корзины сравниваются как строки)"""
+    result = await db.execute(
+        delete(StatsCounter).where(StatsCounter.key.startswith(prefix, autoescape=True), StatsCounter.key < bound)
+    )
+    return result.rowcount
+
+def _user_created_deltas(created_at: datetime) -> Dict[str, int]:
+    return {USERS_TOTAL: 1, users_new_key(created_at): 1}
+
+@db_timed
+async def get_or_create_user(db: AsyncSession, telegram_id: int, username: str = None, full_name: str = None) -> User:
+    user = await db.scalar(select(User).where(User.telegram_id == telegram_id))
     if not user:
         user = User(
             telegram_id=telegram_id,
@@ -11,22 +77,434 @@ def get_or_create_user(db: Session, telegram_id: int, username: str = None, full
             full_name=full_name
         )
         db.add(user)
-        db.commit()
-        db.refresh(user)
+        await db.flush()
+        await bump_counters(db, _user_created_deltas(user.created_at))
     return user
 
-def get_user_ads(db: Session, user_id: int) -> List[Ad]:
-    return db.query(Ad).filter(Ad.user_id == user_id).order_by(Ad.created_at.desc()).all()
+@db_timed
+async def upsert_user(db: AsyncSession, telegram_id: int, username: str = None,
+                      full_name: str = None) -> Tuple[int, bool]:
+    """SELECT, для нового — INSERT ... ON CONFLICT DO NOTHING; возвращает (User.id, создан ли).
+
+    Сначала чтение: холостой INSERT для существующего пользователя в SQLite
+    берёт блокировку записи на всю БД, а в PostgreSQL расходует значение
+    последовательности.
+    """
+    user_id = await db.scalar(select(User.id).where(User.telegram_id == telegram_id))
+    if user_id is not None:
+        return user_id, False
+    created_at = datetime.utcnow()
+    user_id = await db.scalar(
+        _insert(db)(User)
+        .values(telegram_id=telegram_id, username=username, full_name=full_name, created_at=created_at)
+        .on_conflict_do_nothing(index_elements=[User.telegram_id])
+        .returning(User.id)
+    )
+    if user_id is not None:
+        await bump_counters(db, _user_created_deltas(created_at))
+        return user_id, True
+    # Другой апдейт зарегистрировал пользователя между SELECT и INSERT
+    return await db.scalar(select(User.id).where(User.telegram_id == telegram_id)), False
+
+@db_timed
+async def get_user_ads(db: AsyncSession, user_id: int) -> List[Ad]:
+    result = await db.scalars(select(Ad).where(Ad.user_id == user_id).order_by(Ad.created_at.desc()))
+    return list(result)
 
-def create_ad(db: Session, user_id: int, channel: str, text: str, price: int, duration: str) -> Ad:
+@db_timed
+async def create_ad(db: AsyncSession, user_id: int, channel: str, text: str, price: int, duration: str) -> Ad:
     ad = Ad(
         user_id=user_id,
         channel=channel,
         text=text,
         price=price,
-        duration=duration
+        duration=duration,
+        status="pending"
     )
     db.add(ad)
-    db.commit()
-    db.refresh(ad)
-    return ad
\ No newline at end of file
+    await db.flush()
+    await bump_counters(db, {ADS_TOTAL: 1, ads_status_key(ad.status): 1})
+    return ad
+
+def _claimable(admin_id: int, now: datetime):
+    """Ожидающие объявления, свободные, с истёкшей арендой или арендованные этим модератором"""
+    return and_(
+        Ad.status == "pending",
+        or_(Ad.claimed_by.is_(None), Ad.claimed_by == admin_id, Ad.claim_expires_at < now)
+    )
+
+def _keyset(anchor: Tuple[datetime, int], direction: str):
+    key, anchor = tuple_(Ad.created_at, Ad.id), tuple_(*anchor)
+    return {"from": key >= anchor, "after": key > anchor, "before": key < anchor}[direction]
+
+@db_timed
+async def claim_pending_ads(db: AsyncSession, admin_id: int, limit: int, lease: timedelta,
+                            anchor: Optional[Tuple[datetime, int]] = None, direction: str = "from") -> List[Ad]:
+    """Берёт в аренду страницу очереди, старые первыми; keyset по (created_at, id).
+
+    direction: "from" — с anchor включительно, "after" — после него, "before" —
+    страница перед ним. Прежняя аренда модератора возвращается в очередь.
+    Выборка и захват — один UPDATE ... WHERE id IN (SELECT ... FOR UPDATE SKIP
+    LOCKED), поэтому два модератора никогда не получат одно объявление.
+    """
+    now = datetime.utcnow()
+    await db.execute(
+        update(Ad)
+        .where(Ad.claimed_by == admin_id, Ad.status == "pending")
+        .values(claimed_by=None, claim_expires_at=None)
+        .execution_options(synchronize_session=False)
+    )
+
+    candidates = select(Ad.id).where(_claimable(admin_id, now))
+    if anchor:
+        candidates = candidates.where(_keyset(anchor, direction))
+    if direction == "before":
+        candidates = candidates.order_by(Ad.created_at.desc(), Ad.id.desc())
+    else:
+        candidates = candidates.order_by(Ad.created_at, Ad.id)
+    candidates = candidates.limit(limit).with_for_update(skip_locked=True)
+
+    ids = list(await db.scalars(
+        update(Ad)
+        .where(Ad.id.in_(candidates), _claimable(admin_id, now))
+        .values(claimed_by=admin_id, claim_expires_at=now + lease)
+        .returning(Ad.id)
+        .execution_options(synchronize_session=False)
+    ))
+    if not ids:
+        return []
+    result = await db.scalars(
+        select(Ad).where(Ad.id.in_(ids)).order_by(Ad.created_at, Ad.id)
+        .execution_options(populate_existing=True)
+    )
+    return list(result)
+
+@db_timed
+async def has_claimable_ads(db: AsyncSession, admin_id: int, anchor: Tuple[datetime, int], direction: str) -> bool:
+    return await db.scalar(
+        select(Ad.id).where(_claimable(admin_id, datetime.utcnow()), _keyset(anchor, direction)).limit(1)
+    ) is not None
+
+@db_timed
+async def set_pending_ads_status(db: AsyncSession, admin_id: int, status: str, ids: Iterable[int] = None,
+                                 user_id: int = None, channel: str = None) -> List[Tuple[int, int, str, str, str]]:
+    """Один UPDATE ... WHERE status='pending' AND (id IN / user_id / channel) RETURNING.
+
+    Объявления, арендованные другим модератором, не затрагиваются. Счётчики
+    по статусам обновляются в той же транзакции; возвращает
+    (id, user_id, channel, duration, text) изменённых объявлений.
+    """
+    query = update(Ad).where(_claimable(admin_id, datetime.utcnow()))
+    if ids is not None:
+        query = query.where(Ad.id.in_(list(ids)))
+    if user_id is not None:
+        query = query.where(Ad.user_id == user_id)
+    if channel is not None:
+        query = query.where(Ad.channel == channel)
+    result = await db.execute(
+        query.values(status=status, claimed_by=None, claim_expires_at=None)
+        .returning(Ad.id, Ad.user_id, Ad.channel, Ad.duration, Ad.text)
+        .execution_options(synchronize_session=False)
+    )
+    rows = [tuple(row) for row in result]
+    await bump_counters(db, {ads_status_key("pending"): -len(rows), ads_status_key(status): len(rows)})
+    return rows
+
+@db_timed
+async def create_broadcast_job(db: AsyncSession, admin_id: int, from_chat_id: int, message_id: int) -> BroadcastJob:
+    deliverable = await db.scalar(select(func.count(User.id)).where(User.is_deliverable.is_(True)))
+    job = BroadcastJob(
+        admin_id=admin_id,
+        from_chat_id=from_chat_id,
+        message_id=message_id,
+        total=deliverable,
+        skipped=await db.scalar(select(func.count(User.id))) - deliverable
+    )
+    db.add(job)
+    await db.flush()
+    return job
+
+@db_timed
+async def get_broadcast_jobs(db: AsyncSession, statuses: Tuple[str, ...] = None, limit: int = 10) -> List[BroadcastJob]:
+    query = select(BroadcastJob)
+    if statuses:
+        query = query.where(BroadcastJob.status.in_(statuses))
+    result = await db.scalars(query.order_by(BroadcastJob.id.desc()).limit(limit))
+    return list(result)
+
+@db_timed
+async def get_broadcast_recipients(db: AsyncSession, after_id: int, limit: int) -> List[Tuple[int, int]]:
+    """Страница (User.id, telegram_id) после курсора по возрастанию id (keyset-пагинация)"""
+    result = await db.execute(
+        select(User.id, User.telegram_id)
+        .where(User.is_deliverable.is_(True), User.id > after_id)
+        .order_by(User.id)
+        .limit(limit)
+    )
+    return [tuple(row) for row in result]
+
+@db_timed
+async def save_broadcast_checkpoint(db: AsyncSession, job_id: int, cursor: int, delivered: int, failed: int,
+                                    status: Optional[str] = None) -> None:
+    values = {"cursor": cursor, "delivered": delivered, "failed": failed}
+    if status:
+        values["status"] = status
+    await db.execute(update(BroadcastJob).where(BroadcastJob.id == job_id).values(**values))
+
+@db_timed
+async def get_undeliverable_ids(db: AsyncSession) -> Set[int]:
+    result = await db.scalars(select(User.telegram_id).where(User.is_deliverable.is_(False)))
+    return set(result)
+
+@db_timed
+async def count_undeliverable_users(db: AsyncSession) -> int:
+    return await db.scalar(select(func.count(User.id)).where(User.is_deliverable.is_(False)))
+
+@db_timed
+async def is_user_deliverable(db: AsyncSession, telegram_id: int) -> bool:
+    """Неизвестный пользователь считается доступным"""
+    return await db.scalar(select(User.is_deliverable).where(User.telegram_id == telegram_id)) is not False
+
+@db_timed
+async def set_users_deliverable(db: AsyncSession, telegram_ids: Iterable[int], deliverable: bool) -> int:
+    telegram_ids = list(telegram_ids)
+    if not telegram_ids:
+        return 0
+    result = await db.execute(
+        update(User)
+        .where(User.telegram_id.in_(telegram_ids), User.is_deliverable.is_(not deliverable))
+        .values(is_deliverable=deliverable, undeliverable_since=None if deliverable else datetime.utcnow())
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount
+
+@db_timed
+async def get_saved_broadcast_sends(db: AsyncSession) -> int:
+    return await db.scalar(select(func.coalesce(func.sum(BroadcastJob.skipped), 0)))
+
+@db_timed
+async def update_last_activity(db: AsyncSession, activity: Dict[int, datetime]) -> None:
+    """Один executemany UPDATE по первичному ключу для всей пачки"""
+    await db.execute(
+        update(User),
+        [{"id": user_id, "last_activity": seen_at} for user_id, seen_at in activity.items()]
+    )
+
+@db_timed
+async def get_cleaner_chats(db: AsyncSession, since: datetime) -> List[Tuple[int, bytes]]:
+    """(chat_id, messages) чатов, обновлённых после since, старые первыми"""
+    result = await db.execute(
+        select(CleanerChat.chat_id, CleanerChat.messages)
+        .where(CleanerChat.updated_at >= since)
+        .order_by(CleanerChat.updated_at)
+    )
+    return [tuple(row) for row in result]
+
+@db_timed
+async def save_cleaner_chats(db: AsyncSession, chats: Dict[int, bytes],
+                             removed: Iterable[int]) -> None:
+    """Одним upsert сохраняет изменённые чаты и одним DELETE удаляет опустевшие"""
+    removed = list(removed)
+    if removed:
+        await db.execute(delete(CleanerChat).where(CleanerChat.chat_id.in_(removed)))
+    if chats:
+        now = datetime.utcnow()
+        stmt = _insert(db)(CleanerChat).values([
+            {"chat_id": chat_id, "messages": messages, "updated_at": now}
+            for chat_id, messages in chats.items()
+        ])
+        await db.execute(stmt.on_conflict_do_update(
+            index_elements=[CleanerChat.chat_id],
+            set_={"messages": stmt.excluded.messages, "updated_at": stmt.excluded.updated_at}
+        ))
+
+@db_timed
+async def append_cleaner_messages(db: AsyncSession, chat_id: int, messages: bytes) -> None:
+    """Дописывает сообщения к чату одним upsert (конкатенация в БД — без гонок между воркерами)"""
+    stmt = _insert(db)(CleanerChat).values(chat_id=chat_id, messages=messages, updated_at=datetime.utcnow())
+    await db.execute(stmt.on_conflict_do_update(
+        index_elements=[CleanerChat.chat_id],
+        set_={"messages": cast(CleanerChat.messages.op("||")(stmt.excluded.messages), LargeBinary),
+              "updated_at": stmt.excluded.updated_at}
+    ))
+
+@db_timed
+async def take_cleaner_chat(db: AsyncSession, chat_id: int) -> Optional[bytes]:
+    """Забирает сообщения чата: DELETE ... RETURNING, второй воркер получит None"""
+    result = await db.execute(
+        delete(CleanerChat).where(CleanerChat.chat_id == chat_id).returning(CleanerChat.messages)
+    )
+    return result.scalar_one_or_none()
+
+@db_timed
+async def delete_stale_cleaner_chats(db: AsyncSession, before: datetime) -> int:
+    result = await db.execute(delete(CleanerChat).where(CleanerChat.updated_at < before))
+    return result.rowcount
+
+@db_timed
+async def count_cleaner_chats(db: AsyncSession) -> int:
+    return await db.scalar(select(func.count()).select_from(CleanerChat))
+
+@db_timed
+async def get_fsm_record(db: AsyncSession, key: str) -> Optional[Tuple[Optional[str], str]]:
+    """(state, data JSON) или None"""
+    row = (await db.execute(select(FsmRecord.state, FsmRecord.data).where(FsmRecord.key == key))).first()
+    return tuple(row) if row else None
+
+@db_timed
+async def save_fsm_records(db: AsyncSession, records: Dict[str, Tuple[Optional[str], str]],
+                           removed: Iterable[str]) -> None:
+    """Одним upsert сохраняет изменённые записи и одним DELETE удаляет очищенные"""
+    removed = list(removed)
+    if removed:
+        await db.execute(delete(FsmRecord).where(FsmRecord.key.in_(removed)))
+    if records:
+        now = datetime.utcnow()
+        stmt = _insert(db)(FsmRecord).values([
+            {"key": key, "state": state, "data": data, "updated_at": now}
+            for key, (state, data) in records.items()
+        ])
+        await db.execute(stmt.on_conflict_do_update(
+            index_elements=[FsmRecord.key],
+            set_={"state": stmt.excluded.state, "data": stmt.excluded.data, "updated_at": stmt.excluded.updated_at}
+        ))
+
+@db_timed
+async def count_fsm_states(db: AsyncSession) -> Dict[str, int]:
+    """Сколько пользователей в каждом состоянии FSM"""
+    result = await db.execute(
+        select(FsmRecord.state, func.count()).where(FsmRecord.state.is_not(None)).group_by(FsmRecord.state)
+    )
+    return {state: count for state, count in result.all()}
+
+@db_timed
+async def count_throttle_states(db: AsyncSession) -> int:
+    return await db.scalar(select(func.count()).select_from(ThrottleState))
+
+@db_timed
+async def hit_throttle(db: AsyncSession, user_id: int, is_callback: bool, now: float,
+                       interval: float, tolerance: float) -> bool:
+    """GCRA одним upsert: TAT сдвигается, только если запрос укладывается в лимит.
+
+    Если условие ON CONFLICT ... WHERE не выполнено, строка не обновляется и
+    RETURNING ничего не возвращает — значит, запрос нужно отклонить.
+    """
+    column = ThrottleState.callback_tat if is_callback else ThrottleState.message_tat
+    tat = case((column > now, column), else_=now)
+    stmt = _insert(db)(ThrottleState).values(
+        user_id=user_id,
+        message_tat=0.0 if is_callback else now + interval,
+        callback_tat=now + interval if is_callback else 0.0
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[ThrottleState.user_id],
+        set_={column.key: tat + interval},
+        where=tat - now <= tolerance
+    ).returning(ThrottleState.user_id)
+    return (await db.execute(stmt)).first() is not None
+
+@db_timed
+async def get_throttle_tat(db: AsyncSession, user_id: int, is_callback: bool) -> float:
+    column = ThrottleState.callback_tat if is_callback else ThrottleState.message_tat
+    return await db.scalar(select(column).where(ThrottleState.user_id == user_id)) or 0.0
+
+@db_timed
+async def delete_idle_throttle(db: AsyncSession, now: float) -> int:
+    """Удаляет пользователей, чьи лимиты полностью восстановились"""
+    result = await db.execute(
+        delete(ThrottleState).where(ThrottleState.message_tat <= now, ThrottleState.callback_tat <= now)
+    )
+    return result.rowcount
+
+@db_timed
+async def acquire_leader_lease(db: AsyncSession, name: str, holder: str, lease: timedelta,
+                               take_over: bool = False) -> bool:
+    """Берёт или продлевает аренду; чужую — только если она истекла или take_over"""
+    now = datetime.utcnow()
+    stmt = _insert(db)(LeaderLease).values(name=name, holder=holder, expires_at=now + lease)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[LeaderLease.name],
+        set_={"holder": stmt.excluded.holder, "expires_at": stmt.excluded.expires_at},
+        where=None if take_over else or_(LeaderLease.holder == holder, LeaderLease.expires_at < now)
+    ).returning(LeaderLease.holder)
+    return (await db.execute(stmt)).first() is not None
+
+@db_timed
+async def release_leader_lease(db: AsyncSession, name: str, holder: str) -> None:
+    await db.execute(delete(LeaderLease).where(LeaderLease.name == name, LeaderLease.holder == holder))
+
+@db_timed
+async def get_broadcast_statuses(db: AsyncSession, job_ids: Iterable[int]) -> Dict[int, str]:
+    result = await db.execute(select(BroadcastJob.id, BroadcastJob.status).where(BroadcastJob.id.in_(list(job_ids))))
+    return dict(result.all())
+
+@db_timed
+async def next_catalog_version(db: AsyncSession) -> int:
+    """Новая версия каталога для правки в этой транзакции.
+
+    Вторая правка ждёт на строке счётчика, пока первая не зафиксируется,
+    поэтому номера не повторяются и идут в порядке commit — воркеры, которые
+    сравнивают версию с max(version), не пропустят изменение. Первая выдача
+    продолжает нумерацию уже сохранённых строк каталога.
+    """
+    start = select(func.coalesce(func.max(CatalogItem.version), 0) + 1).scalar_subquery()
+    stmt = _insert(db)(CatalogVersion).values(id=1, version=start)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[CatalogVersion.id], set_={"version": CatalogVersion.version + 1}
+    )
+    return await db.scalar(stmt.returning(CatalogVersion.version))
+
+@db_timed
+async def get_catalog_version(db: AsyncSession) -> int:
+    """Версия каталога — последняя версия изменения любой строки (и удалённой тоже)"""
+    return await db.scalar(select(func.coalesce(func.max(CatalogItem.version), 0)))
+
+@db_timed
+async def get_catalog_items(db: AsyncSession) -> List[Tuple[str, str, str]]:
+    """(kind, name, data) активных позиций в порядке показа"""
+    result = await db.execute(
+        select(CatalogItem.kind, CatalogItem.name, CatalogItem.data)
+        .where(CatalogItem.active.is_(True))
+        .order_by(CatalogItem.kind, CatalogItem.position, CatalogItem.name)
+    )
+    return [tuple(row) for row in result]
+
+@db_timed
+async def seed_catalog(db: AsyncSession, items: Iterable[Tuple[str, str, str]]) -> None:
+    """Начальный каталог из .env как версия 1; если каталог уже есть — ничего не делает"""
+    if await db.scalar(select(CatalogItem.name).limit(1)) is not None:
+        return
+    rows, positions = [], {}
+    for kind, name, data in items:
+        positions[kind] = positions.get(kind, -1) + 1
+        rows.append({"kind": kind, "name": name, "position": positions[kind],
+                     "data": data, "active": True, "version": 1})
+    if rows:
+        # Воркеры webhook-режима стартуют одновременно — второй просто ничего не вставит
+        await db.execute(_insert(db)(CatalogItem).on_conflict_do_nothing(), rows)
+
+@db_timed
+async def save_catalog_item(db: AsyncSession, kind: str, name: str, data: str) -> int:
+    """Добавляет позицию в конец списка или обновляет существующую; возвращает новую версию каталога"""
+    position = (
+        select(func.coalesce(func.max(CatalogItem.position), -1) + 1)
+        .where(CatalogItem.kind == kind).scalar_subquery()
+    )
+    stmt = _insert(db)(CatalogItem).values(
+        kind=kind, name=name, position=position, data=data, active=True, version=await next_catalog_version(db)
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[CatalogItem.kind, CatalogItem.name],
+        set_={"data": stmt.excluded.data, "active": True, "version": stmt.excluded.version},
+    )
+    return await db.scalar(stmt.returning(CatalogItem.version))
+
+@db_timed
+async def deactivate_catalog_item(db: AsyncSession, kind: str, name: str) -> Optional[int]:
+    """Скрывает позицию; возвращает новую версию каталога или None, если такой позиции нет"""
+    return await db.scalar(
+        update(CatalogItem)
+        .where(CatalogItem.kind == kind, CatalogItem.name == name, CatalogItem.active.is_(True))
+        .values(active=False, version=await next_catalog_version(db))
+        .returning(CatalogItem.version)
+    )
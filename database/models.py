@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey
+from sqlalchemy import Column, BigInteger, Integer, String, DateTime, ForeignKey, Boolean, Index, LargeBinary, Text, Float, true
 from sqlalchemy.ext.declarative import declarative_base
 from datetime import datetime
 
@@ -11,6 +11,15 @@ class User(Base):
     username = Column(String(50))
     full_name = Column(String(100))
     created_at = Column(DateTime, default=datetime.utcnow)
+    last_activity = Column(DateTime, index=True)  # Обновляется пачками, см. services/activity.py
+    # Бот заблокирован или аккаунт удалён — массовые отправки пропускают пользователя
+    # server_default нужен и для ALTER TABLE ADD COLUMN на существующих строках
+    is_deliverable = Column(Boolean, default=True, server_default=true(), nullable=False)
+    undeliverable_since = Column(DateTime)
+
+    __table_args__ = (
+        Index('ix_users_deliverable_id', 'is_deliverable', 'id'),
+    )
 
 class Ad(Base):
     __tablename__ = 'ads'
@@ -21,4 +30,80 @@ class Ad(Base):
     price = Column(Integer)
     duration = Column(String(50))
     status = Column(String(20), default='pending')
-    created_at = Column(DateTime, default=datetime.utcnow)
\ No newline at end of file
+    created_at = Column(DateTime, default=datetime.utcnow)
+    # Аренда модератором: пока не истекла, объявление не видно другим админам
+    claimed_by = Column(BigInteger, index=True)
+    claim_expires_at = Column(DateTime)
+
+    __table_args__ = (
+        # Очередь модерации: WHERE status = ... ORDER BY created_at, id (keyset)
+        Index('ix_ads_status_created', 'status', 'created_at', 'id'),
+    )
+
+class BroadcastJob(Base):
+    __tablename__ = 'broadcast_jobs'
+    id = Column(Integer, primary_key=True)
+    admin_id = Column(BigInteger, nullable=False)  # Telegram ID не помещается в int32
+    from_chat_id = Column(BigInteger, nullable=False)
+    message_id = Column(Integer, nullable=False)
+    progress_message_id = Column(Integer)
+    status = Column(String(20), default='running', index=True)
+    cursor = Column(Integer, default=0, nullable=False)  # Последний обработанный User.id
+    total = Column(Integer, default=0)
+    skipped = Column(Integer, default=0)  # Недоступные пользователи, которым не отправляли
+    delivered = Column(Integer, default=0)
+    failed = Column(Integer, default=0)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class StatsCounter(Base):
+    """Счётчики для экрана статистики, обновляются в тех же транзакциях, что и данные"""
+    __tablename__ = 'stats_counters'
+    key = Column(String(64), primary_key=True)
+    value = Column(Integer, default=0, nullable=False)
+
+class CleanerChat(Base):
+    """Сообщения чата, которые MessageCleaner удалит при следующей очистке"""
+    __tablename__ = 'cleaner_chats'
+    chat_id = Column(BigInteger, primary_key=True)  # У групп ID вида -100…, больше int32
+    messages = Column(LargeBinary, nullable=False)  # array('q') пар (message_id, unix-время добавления)
+    updated_at = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
+
+class FsmRecord(Base):
+    """Состояние и данные FSM (черновик объявления) — переживают рестарт"""
+    __tablename__ = 'fsm_states'
+    key = Column(String(200), primary_key=True)
+    state = Column(String(100))
+    data = Column(Text, nullable=False, default='{}')  # JSON
+    updated_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+class ThrottleState(Base):
+    """TAT антифлуда (GCRA), общий для всех воркеров; unix-время"""
+    __tablename__ = 'throttle_states'
+    user_id = Column(BigInteger, primary_key=True)  # Telegram ID
+    message_tat = Column(Float, default=0.0, nullable=False)
+    callback_tat = Column(Float, default=0.0, nullable=False)
+
+class LeaderLease(Base):
+    """Аренда лидерства: одиночные задания выполняет только её владелец"""
+    __tablename__ = 'leader_leases'
+    name = Column(String(64), primary_key=True)
+    holder = Column(String(128), nullable=False)
+    expires_at = Column(DateTime, nullable=False)
+
+class CatalogItem(Base):
+    """Канал или срок размещения; админы правят каталог без рестарта бота"""
+    __tablename__ = 'catalog_items'
+    kind = Column(String(16), primary_key=True)  # channel | duration
+    name = Column(String(100), primary_key=True)
+    position = Column(Integer, default=0, nullable=False)
+    data = Column(Text, nullable=False, default='{}')  # JSON: id/url канала, price/discount срока
+    active = Column(Boolean, default=True, nullable=False)
+    version = Column(Integer, nullable=False, index=True)  # Версия каталога, в которой строка изменена
+
+class CatalogVersion(Base):
+    """Счётчик версий каталога — одна строка. Номер выдаётся upsert с блокировкой
+    строки до конца транзакции, поэтому параллельные правки не получат один номер"""
+    __tablename__ = 'catalog_version'
+    id = Column(Integer, primary_key=True)
+    version = Column(Integer, nullable=False)
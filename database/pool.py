@@ -0,0 +1,109 @@
+import asyncio
+import logging
+import time
+from typing import Dict, Optional
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+logger = logging.getLogger(__name__)
+
+LEAK_WARNING_SECONDS = 30.0  # Соединение дольше этого вне пула — вероятно, незакрытая сессия
+REPORT_INTERVAL = 300.0      # Как часто писать сводку по пулу в лог, сек
+
+
+class PoolStats:
+    """Счётчики пула соединений для подбора pool_size/max_overflow"""
+
+    def __init__(self):
+        self.checkouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.leak_warnings = 0
+        self._held: Dict[int, float] = {}  # id(connection record) -> время выдачи
+
+    @property
+    def checked_out(self) -> int:
+        return len(self._held)
+
+    @property
+    def wait_avg(self) -> float:
+        return self.wait_total / self.checkouts if self.checkouts else 0.0
+
+    def record_wait(self, seconds: float):
+        self.checkouts += 1
+        self.wait_total += seconds
+        self.wait_max = max(self.wait_max, seconds)
+
+    def snapshot(self) -> dict:
+        return {
+            "checkouts": self.checkouts,
+            "checked_out": self.checked_out,
+            "wait_avg_ms": round(self.wait_avg * 1000, 2),
+            "wait_max_ms": round(self.wait_max * 1000, 2),
+            "leak_warnings": self.leak_warnings,
+        }
+
+
+pool_stats = PoolStats()
+
+
+class InstrumentedPool(AsyncAdaptedQueuePool):
+    """Пул, который замеряет ожидание свободного соединения"""
+
+    def connect(self):
+        started = time.perf_counter()
+        try:
+            return super().connect()
+        finally:
+            pool_stats.record_wait(time.perf_counter() - started)
+
+
+def instrument_engine(engine: AsyncEngine):
+    """Следит за временем, которое соединения проводят вне пула"""
+
+    @event.listens_for(engine.sync_engine, "checkout")
+    def on_checkout(dbapi_connection, connection_record, connection_proxy):
+        pool_stats._held[id(connection_record)] = time.monotonic()
+
+    @event.listens_for(engine.sync_engine, "checkin")
+    def on_checkin(dbapi_connection, connection_record):
+        checked_out_at = pool_stats._held.pop(id(connection_record), None)
+        if checked_out_at is None:
+            return
+        held = time.monotonic() - checked_out_at
+        if held > LEAK_WARNING_SECONDS:
+            pool_stats.leak_warnings += 1
+            logger.warning(f"DB connection was held for {held:.1f}s — session not closed promptly?")
+
+
+def check_leaks():
+    """Предупреждает о соединениях, которые слишком долго не возвращаются в пул"""
+    now = time.monotonic()
+    for checked_out_at in list(pool_stats._held.values()):
+        held = now - checked_out_at
+        if held > LEAK_WARNING_SECONDS:
+            pool_stats.leak_warnings += 1
+            logger.warning(f"DB connection checked out for {held:.1f}s — possible leaked session")
+
+
+_reporter: Optional[asyncio.Task] = None
+
+
+async def _report_pool_stats():
+    while True:
+        await asyncio.sleep(REPORT_INTERVAL)
+        check_leaks()
+        logger.info(f"DB pool stats: {pool_stats.snapshot()}")
+
+
+def start_pool_reporter():
+    global _reporter
+    if _reporter is None or _reporter.done():
+        _reporter = asyncio.create_task(_report_pool_stats())
+
+
+def stop_pool_reporter():
+    if _reporter:
+        _reporter.cancel()
@@ -1,52 +1,106 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from typing import List
+
+from sqlalchemy import event, inspect, text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.engine import make_url
 from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.schema import CreateColumn
 from config.settings import settings
 from .models import Base
+from .pool import InstrumentedPool, instrument_engine
 import logging
-import sqlite3
 logger = logging.getLogger(__name__)
 
+# Асинхронные драйверы для синхронных URL из .env
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+    "postgres": "postgresql+asyncpg",
+    "mysql": "mysql+aiomysql",
+}
+
+def get_async_url(url: str) -> str:
+    """sqlite:///./database.db -> sqlite+aiosqlite:///./database.db"""
+    parsed = make_url(url)
+    if "+" in parsed.drivername:
+        return url
+    drivername = ASYNC_DRIVERS.get(parsed.drivername, parsed.drivername)
+    return parsed.set(drivername=drivername).render_as_string(hide_password=False)
+
+def set_sqlite_pragmas(dbapi_connection, connection_record):
+    """WAL и ожидание блокировки вместо мгновенного «database is locked» при параллельных сессиях"""
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA busy_timeout=5000")
+    cursor.close()
+
 try:
-    engine = create_engine(
-        settings.DATABASE_URL,
+    engine = create_async_engine(
+        get_async_url(settings.DATABASE_URL),
         pool_pre_ping=True,
-        connect_args={"check_same_thread": False} if "sqlite" in settings.DATABASE_URL else {}
+        poolclass=InstrumentedPool,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT
     )
-    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    SessionLocal = async_sessionmaker(engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+    if engine.dialect.name == "sqlite":
+        event.listen(engine.sync_engine, "connect", set_sqlite_pragmas)
+    instrument_engine(engine)
 except SQLAlchemyError as e:
     logger.critical(f"Database connection error: {e}")
     raise
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    except SQLAlchemyError as e:
-        logger.error(f"Database session error: {e}")
-        db.rollback()
-        raise
-    finally:
-        db.close()
+def upgrade_schema(connection) -> List[str]:
+    """Добавляет в существующие таблицы новые столбцы и индексы моделей.
+
+    Идемпотентно: ALTER TABLE ... ADD COLUMN только для отсутствующих столбцов,
+    которые можно добавить к уже заполненной таблице (nullable или с
+    server_default). Остальные расхождения найдёт missing_columns.
+    """
+    inspector = inspect(connection)
+    preparer = connection.dialect.identifier_preparer
+    added = []
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing or not (column.nullable or column.server_default is not None):
+                continue
+            ddl = CreateColumn(column).compile(dialect=connection.dialect)
+            connection.execute(text(f"ALTER TABLE {preparer.format_table(table)} ADD COLUMN {ddl}"))
+            added.append(f"{table.name}.{column.name}")
+        for index in table.indexes:
+            index.create(connection, checkfirst=True)
+    if added:
+        logger.warning(f"Database schema upgraded, added columns: {', '.join(added)}")
+    return added
+
+def missing_columns(connection) -> List[str]:
+    """Столбцы моделей, которых нет в существующих таблицах (create_all их не добавляет)"""
+    inspector = inspect(connection)
+    missing = []
+    for table in Base.metadata.sorted_tables:
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        missing += [f"{table.name}.{column.name}" for column in table.columns if column.name not in existing]
+    return missing
 
-def init_db():
+class SchemaError(RuntimeError):
+    """Схема БД отстала от моделей: перезапуск процесса не поможет"""
+
+async def init_db():
+    """Создаёт недостающие таблицы, дополняет существующие и проверяет схему;
+    при оставшемся расхождении бот не запускается"""
     try:
-        Base.metadata.create_all(bind=engine)
-        logger.info("Database initialized successfully")
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+            await conn.run_sync(upgrade_schema)
+            missing = await conn.run_sync(missing_columns)
     except SQLAlchemyError as e:
         logger.critical(f"Database initialization failed: {e}")
         raise
-
-def get_db():
-    conn = sqlite3.connect('database.db')
-    try:
-        yield conn
-    finally:
-        conn.close()
-
-def init_db():
-    if "sqlite" in settings.DATABASE_URL:
-        from pathlib import Path
-        db_path = Path("./database.db")
-        if not db_path.exists():
-            db_path.touch()
\ No newline at end of file
+    if missing:
+        logger.critical(f"Database schema is outdated, missing columns: {', '.join(missing)}")
+        raise SchemaError("Database schema is outdated")
+    logger.info("Database initialized successfully")
@@ -1,48 +1,62 @@
 from aiogram import Router, types, F
-from aiogram.filters import Command, StateFilter
+from aiogram.filters import Command, CommandObject, StateFilter
 from aiogram.fsm.context import FSMContext
-from aiogram.utils.keyboard import ReplyKeyboardBuilder, InlineKeyboardBuilder
 from aiogram.types import ReplyKeyboardRemove
 
 from services.message_cleaner import MessageCleaner
+from services.broadcast import job_keyboard, start_broadcast, stop_broadcast
+from services import deliverability
 from config import settings
-from database.session import get_db
-from database.models import User, Ad
+from config.catalog import CHANNEL, DURATION, CatalogSnapshot, catalog
+from config.keyboard_layouts import admin_kb
+from services.catalog import catalog_manager
+from sqlalchemy.ext.asyncio import AsyncSession
+from database.models import User, Ad, BroadcastJob
+from database.crud import count_undeliverable_users, create_broadcast_job, get_broadcast_jobs, get_saved_broadcast_sends
+from services.stats import read_stats, reconcile_stats
+from services.moderation import moderate, render_queue, show_queue
+from services.dispatch import ChatScheduler
+from services.buttons import Button
 from sqlalchemy import select, func
 from datetime import datetime, timedelta
+from typing import List, Optional, Set
+import html
 import logging
-import asyncio
 
 admin_router = Router(name='admin_router')
 logger = logging.getLogger(__name__)
 
+BROADCAST_STATUSES = {
+    "running": "идёт",
+    "paused": "на паузе",
+    "cancelled": "отменена",
+    "done": "завершена",
+}
+
+# Рассылки выполняет только процесс-лидер (services/leader.py)
+NOT_LEADER_BROADCAST = (
+    "⏳ Рассылка #{} сохранена, но этот процесс сейчас не ведущий. Её запустит "
+    "ведущий процесс при следующей проверке. Отправлять её заново не нужно: "
+    "проверьте статус через /broadcasts."
+)
+
+CATALOG_NAME_MAX = 100  # Длина CatalogItem.name
+CATALOG_HELP = (
+    "\n\n<b>Изменить:</b>\n"
+    "<code>/channel Название | @id | ссылка</code> — добавить или обновить канал\n"
+    "<code>/channel_del Название</code> — убрать канал\n"
+    "<code>/price Срок | цена</code> — добавить срок или изменить цену\n"
+    "<code>/price_del Срок</code> — убрать срок"
+)
+
+# modq_<f|n|b>_<курсор>: с курсора, после него, страница перед ним
+QUEUE_DIRECTIONS = {"f": "from", "n": "after", "b": "before"}
+
 async def is_admin(user_id: int) -> bool:
     """Проверка прав администратора"""
     return user_id in settings.ADMIN_IDS
 
-def get_admin_keyboard():
-    """Клавиатура админ-панели"""
-    builder = ReplyKeyboardBuilder()
-    builder.row(types.KeyboardButton(text="📈 Статистика"))
-    builder.row(types.KeyboardButton(text="📢 Рассылка"))
-    builder.row(types.KeyboardButton(text="✅ Модерация"))
-    builder.row(types.KeyboardButton(text="◀️ На главную"))
-    return builder.as_markup(resize_keyboard=True)
-
-def get_main_keyboard(is_admin: bool = False):
-    """Основная клавиатура"""
-    builder = ReplyKeyboardBuilder()
-    builder.row(types.KeyboardButton(text="📢 Разместить рекламу"))
-    builder.row(
-        types.KeyboardButton(text="📋 Мои объявления"),
-        types.KeyboardButton(text="💰 Баланс")
-    )
-    builder.row(types.KeyboardButton(text="🆘 Помощь"))
-    if is_admin:
-        builder.row(types.KeyboardButton(text="👑 Админ-панель"))
-    return builder.as_markup(resize_keyboard=True)
-
-@admin_router.message(F.text == "👑 Админ-панель")
+@admin_router.message(Button("👑 Админ-панель"))
 @admin_router.message(Command("admin"))
 async def admin_panel(message: types.Message, cleaner: MessageCleaner):
     """Главное меню админ-панели"""
@@ -52,220 +66,345 @@ async def admin_panel(message: types.Message, cleaner: MessageCleaner):
     await cleaner.clean_chat(message.bot, message.chat.id)
     await message.answer(
         "🛠️ <b>Админ-панель</b>\nВыберите действие:",
-        reply_markup=get_admin_keyboard()
+        reply_markup=admin_kb()
     )
 
-@admin_router.message(F.text == "📈 Статистика")
-async def show_stats(message: types.Message, cleaner: MessageCleaner):
+@admin_router.message(Button("📈 Статистика"))
+async def show_stats(message: types.Message, cleaner: MessageCleaner, db: AsyncSession,
+                     scheduler: Optional[ChatScheduler] = None):
     """Показать статистику бота"""
     if not await is_admin(message.from_user.id):
         return
     
     await cleaner.clean_chat(message.bot, message.chat.id)
-    db = next(get_db())
     
     try:
-        # Общая статистика
-        total_users = db.scalar(select(func.count(User.id)))
-        total_ads = db.scalar(select(func.count(Ad.id)))
-        
-        # Статистика за последние 24 часа
+        # Счётчики из stats_counters (см. services/stats.py)
+        stats = await read_stats(db)
+
+        # Активные за последние 24 часа — по индексу last_activity
         day_ago = datetime.utcnow() - timedelta(days=1)
-        new_users = db.scalar(select(func.count(User.id)).where(User.created_at >= day_ago))
-        active_users = db.scalar(select(func.count(User.id)).where(User.last_activity >= day_ago))
+        active_users = await db.scalar(select(func.count(User.id)).where(User.last_activity >= day_ago))
+
+        # Отправки, пропущенные из-за заблокировавших бота пользователей
+        saved_sends = await get_saved_broadcast_sends(db) + deliverability.skipped_notifications
+        # Из БД, а не из кэша воркера: отметки ставят и снимают все процессы
+        undeliverable = await count_undeliverable_users(db)
         
         text = (
             "📊 <b>Статистика бота</b>\n\n"
-            f"👥 Всего пользователей: <b>{total_users}</b>\n"
-            f"🆕 Новых за сутки: <b>{new_users}</b>\n"
+            f"👥 Всего пользователей: <b>{stats['total_users']}</b>\n"
+            f"🆕 Новых за сутки: <b>{stats['new_users']}</b>\n"
             f"🔥 Активных: <b>{active_users}</b>\n\n"
-            f"📢 Всего объявлений: <b>{total_ads}</b>\n"
-            f"⏳ На модерации: <b>{db.scalar(select(func.count(Ad.id)).where(Ad.status == 'pending'))}</b>"
+            f"📢 Всего объявлений: <b>{stats['total_ads']}</b>\n"
+            f"⏳ На модерации: <b>{stats['pending_ads']}</b>\n"
+            f"✅ Одобрено: <b>{stats['approved_ads']}</b>\n"
+            f"❌ Отклонено: <b>{stats['rejected_ads']}</b>\n\n"
+            f"🚫 Недоступных пользователей: <b>{undeliverable}</b>\n"
+            f"💡 Сэкономлено отправок: <b>{saved_sends}</b>\n"
+            f"🧹 Сэкономлено вызовов удаления: <b>{cleaner.calls_saved}</b>"
         )
+        if scheduler:
+            p50, p95, _ = scheduler.wait_percentiles()
+            text += (
+                f"\n📥 Очередь апдейтов: <b>{scheduler.queued}</b> ждут, <b>{scheduler.running}</b> в работе\n"
+                f"⏱ Ожидание в очереди: p50 <b>{p50 * 1000:.0f}</b> мс, p95 <b>{p95 * 1000:.0f}</b> мс"
+            )
         
         await message.answer(text)
     except Exception as e:
         logger.error(f"Stats error: {e}")
         await message.answer("❌ Ошибка при получении статистики")
 
-@admin_router.message(F.text == "📢 Рассылка")
-async def start_broadcast(message: types.Message, state: FSMContext, cleaner: MessageCleaner):
+@admin_router.message(Command("reconcile_stats"))
+async def reconcile_stats_command(message: types.Message, db: AsyncSession):
+    """Пересчитать счётчики статистики с нуля и показать расхождения"""
+    if not await is_admin(message.from_user.id):
+        return
+
+    diff = await reconcile_stats(db)
+    if not diff:
+        return await message.answer("✅ Счётчики статистики сходятся")
+
+    lines = [f"<code>{key}</code>: {stored} → {actual}" for key, (stored, actual) in sorted(diff.items())]
+    await message.answer(
+        f"⚠️ Исправлено расхождений: <b>{len(diff)}</b>\n\n" + "\n".join(lines[:30])
+    )
+
+@admin_router.message(Button("📢 Рассылка"))
+async def ask_broadcast_message(message: types.Message, state: FSMContext, cleaner: MessageCleaner):
     """Начать процесс рассылки"""
     if not await is_admin(message.from_user.id):
         return
     
+    await state.set_state("broadcast")
     await cleaner.clean_chat(message.bot, message.chat.id)
     await message.answer(
         "📢 <b>Создание рассылки</b>\n"
         "Отправьте сообщение для рассылки (текст, фото или видео):",
         reply_markup=ReplyKeyboardRemove()
     )
-    await state.set_state("broadcast")
 
 @admin_router.message(StateFilter("broadcast"))
-async def process_broadcast(message: types.Message, state: FSMContext, cleaner: MessageCleaner):
+async def process_broadcast(message: types.Message, state: FSMContext, cleaner: MessageCleaner, db: AsyncSession):
     """Обработка рассылки"""
-    db = next(get_db())
-    users = db.scalars(select(User)).all()
-    
-    success = failed = 0
-    progress_msg = await message.answer("⏳ Начинаю рассылку...")
-    await cleaner.add_message(message.chat.id, progress_msg.message_id)
-    
-    for user in users:
-        try:
-            if message.photo:
-                await message.bot.send_photo(
-                    chat_id=user.telegram_id,
-                    photo=message.photo[-1].file_id,
-                    caption=message.caption
-                )
-            elif message.video:
-                await message.bot.send_video(
-                    chat_id=user.telegram_id,
-                    video=message.video.file_id,
-                    caption=message.caption
-                )
-            else:
-                await message.send_copy(user.telegram_id)
-            success += 1
-        except Exception as e:
-            logger.error(f"Ошибка рассылки для {user.telegram_id}: {e}")
-            failed += 1
-        await asyncio.sleep(0.1)
-    
-    await progress_msg.edit_text(
-        f"📢 <b>Рассылка завершена</b>\n\n"
-        f"✅ Успешно: {success}\n"
-        f"❌ Не удалось: {failed}"
-    )
     await state.clear()
+
+    job = await create_broadcast_job(db, message.from_user.id, message.chat.id, message.message_id)
+    # Прогресс не регистрируем в cleaner: он редактируется до конца рассылки
+    progress_msg = await message.answer(
+        f"⏳ Начинаю рассылку #{job.id} на {job.total} пользователей...",
+        reply_markup=job_keyboard(job.id, "running")
+    )
+    job.progress_message_id = progress_msg.message_id
+    # Фиксируем сразу: фоновая задача работает со своей сессией
+    await db.commit()
+
+    if start_broadcast(message.bot, job):
+        logger.info(f"Broadcast #{job.id} started by {message.from_user.id} for {job.total} users")
+    else:
+        # Задача уже в БД со статусом running: её запустит лидер, повторная отправка создала бы дубль
+        logger.warning(f"Broadcast #{job.id} queued by {message.from_user.id}: this process is not the leader")
+        await message.answer(NOT_LEADER_BROADCAST.format(job.id))
+
     await admin_panel(message, cleaner)
 
-@admin_router.message(F.text == "✅ Модерация")
-async def moderate_ads(message: types.Message, cleaner: MessageCleaner):
+@admin_router.message(Command("broadcasts"))
+async def list_broadcasts(message: types.Message, db: AsyncSession):
+    """Список последних рассылок с кнопками управления"""
+    if not await is_admin(message.from_user.id):
+        return
+
+    jobs = await get_broadcast_jobs(db)
+
+    if not jobs:
+        return await message.answer("ℹ️ Рассылок пока не было")
+
+    for job in jobs:
+        await message.answer(
+            f"📢 Рассылка #{job.id} — <b>{BROADCAST_STATUSES.get(job.status, job.status)}</b>\n"
+            f"📨 Обработано: {job.delivered + job.failed}/{job.total}\n"
+            f"✅ {job.delivered} ❌ {job.failed}",
+            reply_markup=job_keyboard(job.id, job.status)
+        )
+
+@admin_router.callback_query(F.data.regexp(r"^bcast_(pause|resume|cancel)_\d+$"))
+async def control_broadcast(callback: types.CallbackQuery, db: AsyncSession):
+    """Пауза, продолжение или отмена рассылки"""
+    if not await is_admin(callback.from_user.id):
+        return await callback.answer("Доступ запрещён", show_alert=True)
+
+    _, action, job_id = callback.data.split("_")
+    job_id = int(job_id)
+
+    job = await db.get(BroadcastJob, job_id)
+    if not job or job.status not in ("running", "paused"):
+        return await callback.answer("Рассылка уже завершена", show_alert=True)
+
+    if action == "resume":
+        if job.status != "paused":
+            return await callback.answer("Рассылка уже идёт")
+        job.status = "running"
+        job.progress_message_id = callback.message.message_id
+        await db.commit()  # До запуска фоновой задачи
+        if not start_broadcast(callback.bot, job):
+            return await callback.answer(NOT_LEADER_BROADCAST.format(job.id), show_alert=True)
+        return await callback.answer("Рассылка продолжена")
+
+    status = "paused" if action == "pause" else "cancelled"
+    if not await stop_broadcast(job_id, status):
+        # Задача не запущена в этом процессе — достаточно сменить статус
+        job.status = status
+        await callback.message.edit_reply_markup(reply_markup=job_keyboard(job_id, status))
+
+    await callback.answer("Рассылка приостановлена" if action == "pause" else "Рассылка отменена")
+
+@admin_router.message(Button("✅ Модерация"))
+async def moderate_ads(message: types.Message, state: FSMContext, cleaner: MessageCleaner, db: AsyncSession):
     """Модерация объявлений"""
     if not await is_admin(message.from_user.id):
         return
     
+    await state.update_data(mod_selected=[])
     await cleaner.clean_chat(message.bot, message.chat.id)
-    db = next(get_db())
     
-    ads = db.scalars(
-        select(Ad)
-        .where(Ad.status == "pending")
-        .order_by(Ad.created_at.desc())
-        .limit(5)
-    ).all()
-    
-    if not ads:
-        return await message.answer("ℹ️ Нет объявлений для модерации")
-    
-    builder = InlineKeyboardBuilder()
-    for ad in ads:
-        builder.row(
-            types.InlineKeyboardButton(
-                text=f"✅ Одобрить #{ad.id}",
-                callback_data=f"approve_{ad.id}"),
-            types.InlineKeyboardButton(
-                text=f"❌ Отклонить #{ad.id}",
-                callback_data=f"reject_{ad.id}")
-        )
-    
-    builder.row(
-        types.InlineKeyboardButton(
-            text="🔄 Обновить список",
-            callback_data="refresh_moderation")
-    )
-    
-    msg = await message.answer(
-        "⏳ <b>Ожидающие модерации:</b>\n"
-        f"Найдено: {len(ads)}\n\n"
-        "Последние 5 объявлений:",
-        reply_markup=builder.as_markup()
-    )
+    text, markup = await render_queue(db, message.from_user.id)
+    msg = await message.answer(text, reply_markup=markup)
     await cleaner.add_message(message.chat.id, msg.message_id)
 
-@admin_router.callback_query(F.data.startswith("approve_"))
-async def approve_ad(callback: types.CallbackQuery, cleaner: MessageCleaner):
-    """Одобрить объявление"""
+async def _selected(state: FSMContext) -> Set[int]:
+    return set((await state.get_data()).get("mod_selected", []))
+
+@admin_router.callback_query(F.data.regexp(r"^modq_[fnb]_\d+-\d+$"))
+async def page_moderation(callback: types.CallbackQuery, state: FSMContext, db: AsyncSession):
+    """Листание очереди модерации"""
     if not await is_admin(callback.from_user.id):
         return await callback.answer("Доступ запрещён", show_alert=True)
-    
-    ad_id = int(callback.data.split("_")[1])
-    db = next(get_db())
-    
+
+    _, direction, cursor = callback.data.split("_")
+    await show_queue(callback.message, db, callback.from_user.id, cursor, QUEUE_DIRECTIONS[direction],
+                     selected=await _selected(state))
+    await callback.answer()
+
+@admin_router.callback_query(F.data.regexp(r"^modsel_\d+_\d+-\d+$"))
+async def toggle_ad_selection(callback: types.CallbackQuery, state: FSMContext, db: AsyncSession):
+    """Отметить объявление для массового решения"""
+    if not await is_admin(callback.from_user.id):
+        return await callback.answer("Доступ запрещён", show_alert=True)
+
+    _, ad_id, page = callback.data.split("_")
+    selected = await _selected(state)
+    selected ^= {int(ad_id)}
+    await state.update_data(mod_selected=sorted(selected))
+    await show_queue(callback.message, db, callback.from_user.id, page, selected=selected)
+    await callback.answer()
+
+async def _apply_moderation(callback: types.CallbackQuery, state: FSMContext, cleaner: MessageCleaner,
+                            db: AsyncSession, page: Optional[str], status: str, **where):
+    """Применяет решение к пачке, перерисовывает очередь и для пачек присылает отчёт"""
+    await callback.answer("⏳ Обрабатываю...")
     try:
-        ad = db.get(Ad, ad_id)
-        if not ad:
-            return await callback.answer("Объявление не найдено", show_alert=True)
-        
-        ad.status = "approved"
-        ad.approved_at = datetime.utcnow()
-        db.commit()
-        
-        try:
-            await callback.bot.send_message(
-                ad.user_id,
-                f"✅ Ваше объявление #{ad.id} одобрено!\n"
-                f"Канал: {ad.channel}\n"
-                f"Срок: {ad.duration}\n\n"
-                f"Текст: {ad.text[:200]}..."
-            )
-        except Exception as e:
-            logger.error(f"Ошибка уведомления: {e}")
-        
-        await callback.answer("Объявление одобрено")
-        await moderate_ads(callback.message, cleaner)
+        result = await moderate(callback.bot, db, callback.from_user.id, status, **where)
     except Exception as e:
         logger.error(f"Ошибка модерации: {e}")
-        await callback.answer("❌ Ошибка", show_alert=True)
+        return await callback.message.answer("❌ Ошибка модерации")
+
+    selected = await _selected(state)
+    if selected:
+        await state.update_data(mod_selected=[])
+    await show_queue(callback.message, db, callback.from_user.id, page)
+    if not result.changed:
+        msg = await callback.message.answer("ℹ️ Объявление уже обработано")
+    elif result.changed > 1:
+        msg = await callback.message.answer(result.report())
+    else:
+        return
+    await cleaner.add_message(callback.message.chat.id, msg.message_id)
+
+@admin_router.callback_query(F.data.startswith("approve_"))
+async def approve_ad(callback: types.CallbackQuery, state: FSMContext, cleaner: MessageCleaner, db: AsyncSession):
+    """Одобрить объявление"""
+    if not await is_admin(callback.from_user.id):
+        return await callback.answer("Доступ запрещён", show_alert=True)
+
+    _, ad_id, *page = callback.data.split("_")
+    await _apply_moderation(callback, state, cleaner, db, next(iter(page), None), "approved", ids=[int(ad_id)])
 
 @admin_router.callback_query(F.data.startswith("reject_"))
-async def reject_ad(callback: types.CallbackQuery, cleaner: MessageCleaner):
+async def reject_ad(callback: types.CallbackQuery, state: FSMContext, cleaner: MessageCleaner, db: AsyncSession):
     """Отклонить объявление"""
     if not await is_admin(callback.from_user.id):
         return await callback.answer("Доступ запрещён", show_alert=True)
-    
-    ad_id = int(callback.data.split("_")[1])
-    db = next(get_db())
-    
-    try:
-        ad = db.get(Ad, ad_id)
-        if not ad:
-            return await callback.answer("Объявление не найдено", show_alert=True)
-        
-        ad.status = "rejected"
-        db.commit()
-        
-        try:
-            await callback.bot.send_message(
-                ad.user_id,
-                f"❌ Ваше объявление #{ad.id} отклонено\n"
-                f"Причина: не соответствует правилам\n\n"
-                f"Текст: {ad.text[:200]}..."
-            )
-        except Exception as e:
-            logger.error(f"Ошибка уведомления: {e}")
-        
-        await callback.answer("Объявление отклонено")
-        await moderate_ads(callback.message, cleaner)
-    except Exception as e:
-        logger.error(f"Ошибка модерации: {e}")
-        await callback.answer("❌ Ошибка", show_alert=True)
+
+    _, ad_id, *page = callback.data.split("_")
+    await _apply_moderation(callback, state, cleaner, db, next(iter(page), None), "rejected", ids=[int(ad_id)])
+
+@admin_router.callback_query(F.data.regexp(r"^modbulk_(approve|reject|clear)_\d+-\d+$"))
+async def bulk_moderation(callback: types.CallbackQuery, state: FSMContext, cleaner: MessageCleaner,
+                          db: AsyncSession):
+    """Решение по всем отмеченным объявлениям"""
+    if not await is_admin(callback.from_user.id):
+        return await callback.answer("Доступ запрещён", show_alert=True)
+
+    _, action, page = callback.data.split("_")
+    selected = await _selected(state)
+    if action == "clear" or not selected:
+        await state.update_data(mod_selected=[])
+        await show_queue(callback.message, db, callback.from_user.id, page)
+        return await callback.answer()
+
+    status = "approved" if action == "approve" else "rejected"
+    await _apply_moderation(callback, state, cleaner, db, page, status, ids=selected)
+
+@admin_router.callback_query(F.data.regexp(r"^modall_(user|chan)_\d+_\d+-\d+$"))
+async def approve_all_from(callback: types.CallbackQuery, state: FSMContext, cleaner: MessageCleaner,
+                           db: AsyncSession):
+    """Одобрить все ожидающие объявления автора или канала"""
+    if not await is_admin(callback.from_user.id):
+        return await callback.answer("Доступ запрещён", show_alert=True)
+
+    _, scope, ad_id, page = callback.data.split("_")
+    ad = await db.get(Ad, int(ad_id))
+    if not ad:
+        return await callback.answer("Объявление не найдено", show_alert=True)
+
+    where = {"user_id": ad.user_id} if scope == "user" else {"channel": ad.channel}
+    await _apply_moderation(callback, state, cleaner, db, page, "approved", **where)
 
 @admin_router.callback_query(F.data == "refresh_moderation")
-async def refresh_moderation(callback: types.CallbackQuery, cleaner: MessageCleaner):
-    """Обновить список модерации"""
+async def refresh_moderation(callback: types.CallbackQuery, db: AsyncSession):
+    """Обновить список модерации (кнопка старых сообщений — с начала очереди)"""
     await callback.answer("Обновляем список...")
-    await moderate_ads(callback.message, cleaner)
+    await show_queue(callback.message, db, callback.from_user.id)
 
-@admin_router.message(F.text == "◀️ На главную")
-async def back_to_main(message: types.Message, state: FSMContext, cleaner: MessageCleaner):
-    """Вернуться в главное меню"""
-    await state.clear()
-    await cleaner.clean_chat(message.bot, message.chat.id)
-    await message.answer(
-        "Главное меню:",
-        reply_markup=get_main_keyboard(await is_admin(message.from_user.id))
-    )
\ No newline at end of file
+def render_catalog(snapshot: CatalogSnapshot) -> str:
+    lines = [f"🗂 <b>Каталог</b> (версия {snapshot.version})", "", "<b>Каналы:</b>"]
+    lines += [f"• {html.escape(name)} — {html.escape(str(data.get('id', '')))}"
+              for name, data in snapshot.channels.items()] or ["—"]
+    lines += ["", "<b>Сроки и цены:</b>"]
+    lines += [f"• {html.escape(name)} — {data['price']} руб" for name, data in snapshot.prices.items()] or ["—"]
+    return "\n".join(lines) + CATALOG_HELP
+
+def catalog_args(command: CommandObject, required: int) -> Optional[List[str]]:
+    """Аргументы команды через «|»; None — не хватает обязательных или название слишком длинное"""
+    parts = [part.strip() for part in (command.args or "").split("|")]
+    if len(parts) < required or not all(parts[:required]) or len(parts[0]) > CATALOG_NAME_MAX:
+        return None
+    return parts
+
+@admin_router.message(Button("🗂 Каталог"))
+@admin_router.message(Command("catalog"))
+async def show_catalog(message: types.Message):
+    """Каналы и цены, которые сейчас видят пользователи"""
+    if not await is_admin(message.from_user.id):
+        return
+    await message.answer(render_catalog(catalog.snapshot))
+
+@admin_router.message(Command("channel"))
+async def set_channel(message: types.Message, command: CommandObject):
+    """Добавить канал или изменить его id/ссылку — без рестарта бота"""
+    if not await is_admin(message.from_user.id):
+        return
+    args = catalog_args(command, 2)
+    if not args:
+        return await message.answer("Формат: <code>/channel Название | @id | ссылка</code>")
+
+    name, channel_id = args[0], args[1]
+    url = args[2] if len(args) > 2 and args[2] else f"https://t.me/{channel_id.lstrip('@')}"
+    current = catalog.snapshot.channels.get(name, {})
+    snapshot = await catalog_manager.save(
+        CHANNEL, name, {"price_multiplier": 1.0, **current, "id": channel_id, "url": url}
+    )
+    logger.info(f"Admin {message.from_user.id} saved channel {name!r}")
+    await message.answer(render_catalog(snapshot))
+
+@admin_router.message(Command("price"))
+async def set_price(message: types.Message, command: CommandObject):
+    """Добавить срок размещения или изменить его цену"""
+    if not await is_admin(message.from_user.id):
+        return
+    args = catalog_args(command, 2)
+    if not args or not args[1].isdigit() or int(args[1]) <= 0:
+        return await message.answer("Формат: <code>/price Срок | цена в рублях</code>")
+
+    name, price = args[0], int(args[1])
+    current = catalog.snapshot.prices.get(name, {})
+    snapshot = await catalog_manager.save(DURATION, name, {"discount": 0, **current, "price": price})
+    logger.info(f"Admin {message.from_user.id} set price {name!r} = {price}")
+    await message.answer(render_catalog(snapshot))
+
+@admin_router.message(Command("channel_del", "price_del"))
+async def remove_catalog_item(message: types.Message, command: CommandObject):
+    """Убрать канал или срок: он пропадёт из клавиатур, объявления с ним останутся"""
+    if not await is_admin(message.from_user.id):
+        return
+    args = catalog_args(command, 1)
+    if not args:
+        return await message.answer(f"Формат: <code>/{command.command} Название</code>")
+
+    kind = CHANNEL if command.command == "channel_del" else DURATION
+    snapshot = await catalog_manager.remove(kind, args[0])
+    if snapshot is None:
+        return await message.answer("❌ Такой позиции в каталоге нет")
+    logger.info(f"Admin {message.from_user.id} removed {kind} {args[0]!r}")
+    await message.answer(render_catalog(snapshot))
@@ -5,7 +5,7 @@ from config.states import States
 from config.keyboard_layouts import get_main_menu
 from services.payment import process_payment
 from database.crud import create_ad
-from database.session import get_db
+from sqlalchemy.ext.asyncio import AsyncSession
 from aiogram.types import ReplyKeyboardRemove
 import logging
 
@@ -13,7 +13,7 @@ logger = logging.getLogger(__name__)
 payment_router = Router(name='payment_router')
 
 @payment_router.message(States.enter_text)
-async def enter_ad_text(message: types.Message, state: FSMContext):
+async def enter_ad_text(message: types.Message, state: FSMContext, db: AsyncSession):
     try:
         # Получаем данные из состояния
         data = await state.get_data()
@@ -28,8 +28,7 @@ async def enter_ad_text(message: types.Message, state: FSMContext):
             return
 
         # Создаем объявление в БД
-        db = next(get_db())
-        ad = create_ad(
+        ad = await create_ad(
             db,
             user_id=message.from_user.id,
             channel=data['channel'],
@@ -68,5 +67,4 @@ async def enter_ad_text(message: types.Message, state: FSMContext):
         )
     finally:
         # Всегда очищаем состояние
-        await state.clear()
-        db.close()
\ No newline at end of file
+        await state.clear()
\ No newline at end of file
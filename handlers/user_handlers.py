@@ -1,16 +1,17 @@
 from aiogram import Router, types, F, Bot
 from aiogram.filters import Command
 from aiogram.fsm.context import FSMContext
-from aiogram.utils.keyboard import ReplyKeyboardBuilder
 import logging
 from config.states import States
 from config import settings, messages
-from config.keyboard_layouts import get_main_menu, generate_channels_kb, generate_durations_kb
+from config.catalog import catalog
+from config.keyboard_layouts import (
+    parse_choice, get_main_menu, balance_kb, top_up_kb, channels_inline_kb, durations_inline_kb, media_inline_kb, text_inline_kb,
+)
 from config.states import States
-from database.crud import get_or_create_user
-from database.session import get_db
 from services.message_cleaner import MessageCleaner
-import asyncio
+from services.screen import ScreenRenderer
+from services.buttons import Button
 
 logger = logging.getLogger(__name__)
 user_router = Router(name='user_router')
@@ -22,15 +23,7 @@ async def cmd_start(message: types.Message, cleaner: MessageCleaner):
     try:
         await cleaner.clean_chat(message.bot, message.chat.id)
         
-        # Регистрация/получение пользователя
-        db = next(get_db())
-        user = get_or_create_user(
-            db,
-            telegram_id=message.from_user.id,
-            username=message.from_user.username,
-            full_name=message.from_user.full_name
-        )
-        
+        # Пользователь уже зарегистрирован UserRegistryMiddleware
         logger.info(f"User {message.from_user.id} started the bot")
         
         await message.answer(
@@ -42,170 +35,195 @@ async def cmd_start(message: types.Message, cleaner: MessageCleaner):
         await message.answer("⚠️ Произошла ошибка, попробуйте позже")
 
 # Навигация
-@user_router.message(F.text == "◀️ На главную")
-@user_router.message(F.text == "🔙 Назад")
+@user_router.message(Button("◀️ На главную"))
+@user_router.message(Button("🔙 Назад"))
 async def back_to_main(message: types.Message, state: FSMContext, cleaner: MessageCleaner):
     """Возврат в главное меню"""
     await state.clear()
     await cmd_start(message, cleaner)
 
 # Баланс и платежи
-@user_router.message(F.text == "💰 Баланс")
+@user_router.message(Button("💰 Баланс"))
 @user_router.message(Command("payment"))
 async def handle_payment(message: types.Message, state: FSMContext, cleaner: MessageCleaner):
     """Управление балансом"""
     await cleaner.clean_chat(message.bot, message.chat.id)
     await state.clear()
     
-    builder = ReplyKeyboardBuilder()
-    builder.row(types.KeyboardButton(text="💳 Пополнить баланс"))
-    builder.row(types.KeyboardButton(text="📊 История платежей"))
-    builder.row(types.KeyboardButton(text="◀️ На главную"))
-    
     await message.answer(
         "💰 <b>Ваш баланс:</b> 0 руб\n\n"
         "Выберите действие:",
-        reply_markup=builder.as_markup(resize_keyboard=True)
+        reply_markup=balance_kb()
     )
 
-@user_router.message(F.text == "💳 Пополнить баланс")
+@user_router.message(Button("💳 Пополнить баланс"))
 async def process_payment(message: types.Message, cleaner: MessageCleaner):
     """Пополнение баланса"""
     await cleaner.clean_chat(message.bot, message.chat.id)
     
-    builder = ReplyKeyboardBuilder()
-    amounts = ["100 руб", "300 руб", "500 руб", "1000 руб"]
-    for amount in amounts:
-        builder.add(types.KeyboardButton(text=amount))
-    builder.adjust(2)
-    builder.row(types.KeyboardButton(text="◀️ Назад"))
-    
     await message.answer(
         "💳 <b>Пополнение баланса</b>\n\n"
         "Выберите сумму:",
-        reply_markup=builder.as_markup(resize_keyboard=True)
+        reply_markup=top_up_kb()
     )
 
 # Размещение рекламы
-@user_router.message(F.text == "📢 Разместить рекламу")
-async def start_ad(message: types.Message, state: FSMContext, bot: Bot, cleaner: MessageCleaner):
+@user_router.message(Button("📢 Разместить рекламу"))
+async def start_ad(message: types.Message, state: FSMContext, bot: Bot, screen: ScreenRenderer):
     """Начало процесса размещения рекламы"""
     try:
-        await cleaner.clean_chat(bot, message.chat.id)
-        
-        # Показываем сообщение загрузки
-        load_msg = await message.answer("⏳ Загрузка доступных каналов...")
-        await asyncio.sleep(1)  # Имитация загрузки
-        await bot.delete_message(message.chat.id, load_msg.message_id)
-        
-        # Предлагаем выбрать канал
-        await message.answer(
-            messages.CHANNEL_CHOICE,
-            reply_markup=generate_channels_kb()
-        )
+        # Состояние — до экрана, чтобы в общем хранилище оно было сохранено к ответу.
+        # Экран ниже сообщения пользователя — отправляем заново
         await state.set_state(States.select_channel)
+        await screen.show(bot, message.chat.id, messages.CHANNEL_CHOICE, channels_inline_kb(), resend=True)
         
         logger.info(f"User {message.from_user.id} started ad placement")
     except Exception as e:
         logger.error(f"Ad start error: {e}")
         await message.answer("⚠️ Ошибка при запуске размещения")
 
-@user_router.message(States.select_channel, F.text.in_(settings.CHANNELS.keys()))
-async def select_channel(message: types.Message, state: FSMContext, cleaner: MessageCleaner):
+async def show_durations(bot: Bot, screen: ScreenRenderer, chat_id: int, channel: str, resend: bool = False):
+    await screen.show(
+        bot, chat_id,
+        f"Выбран канал: <b>{channel}</b>\n"
+        "Теперь выберите срок размещения:",
+        durations_inline_kb(),
+        resend=resend
+    )
+
+@user_router.callback_query(States.select_channel, F.data.startswith("ad_ch_"))
+async def select_channel(callback: types.CallbackQuery, state: FSMContext, screen: ScreenRenderer):
     """Выбор канала для рекламы"""
     try:
-        await cleaner.clean_chat(message.bot, message.chat.id)
-        await state.update_data(channel=message.text)
-        
-        await message.answer(
-            f"Выбран канал: <b>{message.text}</b>\n"
-            "Теперь выберите срок размещения:",
-            reply_markup=generate_durations_kb()
-        )
+        channels = catalog.snapshot.channel_names
+        index = parse_choice(callback.data, catalog.snapshot)
+        if index is None or index >= len(channels):
+            await screen.show(callback.bot, callback.message.chat.id, messages.CHANNEL_CHOICE, channels_inline_kb())
+            return await callback.answer("Список каналов обновился, выберите снова")
+
+        await state.update_data(channel=channels[index])
         await state.set_state(States.select_duration)
+        await show_durations(callback.bot, screen, callback.message.chat.id, channels[index])
+        await callback.answer()
     except Exception as e:
         logger.error(f"Channel select error: {e}")
-        await message.answer("⚠️ Ошибка при выборе канала")
+        await callback.answer("⚠️ Ошибка при выборе канала", show_alert=True)
 
 @user_router.message(States.select_channel)
-async def invalid_channel(message: types.Message):
+async def invalid_channel(message: types.Message, screen: ScreenRenderer):
     """Некорректный выбор канала"""
-    await message.answer(
+    await screen.show(
+        message.bot, message.chat.id,
         "❌ Пожалуйста, выберите канал из списка ниже:",
-        reply_markup=generate_channels_kb()
+        channels_inline_kb(),
+        resend=True
     )
 
-@user_router.message(States.select_duration, F.text.in_(settings.PRICES))
-async def select_duration(message: types.Message, state: FSMContext, cleaner: MessageCleaner):
+@user_router.callback_query(States.select_duration, F.data == "ad_back_channel")
+async def back_to_channels(callback: types.CallbackQuery, state: FSMContext, screen: ScreenRenderer):
+    """Назад к выбору канала"""
+    await state.set_state(States.select_channel)
+    await screen.show(callback.bot, callback.message.chat.id, messages.CHANNEL_CHOICE, channels_inline_kb())
+    await callback.answer()
+
+@user_router.callback_query(States.select_duration, F.data.startswith("ad_dur_"))
+async def select_duration(callback: types.CallbackQuery, state: FSMContext, screen: ScreenRenderer):
     """Выбор длительности размещения"""
     try:
         data = await state.get_data()
-        price_info = settings.PRICES[message.text]
-        
-        await cleaner.clean_chat(message.bot, message.chat.id)
-        
-        builder = ReplyKeyboardBuilder()
-        builder.add(types.KeyboardButton(text="Пропустить"))
-        builder.row(types.KeyboardButton(text="◀️ Назад"))
+        snapshot = catalog.snapshot
+        index = parse_choice(callback.data, snapshot)
+        if index is None or index >= len(snapshot.durations):
+            await show_durations(callback.bot, screen, callback.message.chat.id, data['channel'])
+            return await callback.answer("Цены обновились, выберите срок снова")
+
+        duration = snapshot.durations[index]
+        price_info = snapshot.prices[duration]
+        await state.update_data(
+            duration=duration, 
+            price=price_info['price'],
+            currency=price_info.get('currency', 'RUB')
+        )
+        await state.set_state(States.enter_media)
         
-        await message.answer(
+        await screen.show(
+            callback.bot, callback.message.chat.id,
             f"📌 <b>Вы выбрали:</b>\n"
             f"Канал: {data['channel']}\n"
-            f"Срок: {message.text}\n"
+            f"Срок: {duration}\n"
             f"Цена: {price_info['price']} руб.\n\n"
             "Отправьте фото/видео для объявления (или нажмите 'Пропустить'):",
-            reply_markup=builder.as_markup(resize_keyboard=True)
+            media_inline_kb()
         )
-        await state.update_data(
-            duration=message.text, 
-            price=price_info['price'],
-            currency=price_info.get('currency', 'RUB')
-        )
-        await state.set_state(States.enter_media)
+        await callback.answer()
     except Exception as e:
         logger.error(f"Duration select error: {e}")
-        await message.answer("⚠️ Ошибка при выборе срока")
+        await callback.answer("⚠️ Ошибка при выборе срока", show_alert=True)
 
 # Медиа в объявлениях
 @user_router.message(States.enter_media, F.content_type.in_({'photo', 'video'}))
-async def handle_ad_media(message: types.Message, state: FSMContext, cleaner: MessageCleaner):
+async def handle_ad_media(message: types.Message, state: FSMContext, screen: ScreenRenderer):
     """Обработка медиа для объявления"""
     try:
         media_type = 'photo' if message.photo else 'video'
         media_id = message.photo[-1].file_id if message.photo else message.video.file_id
         
         await state.update_data(media_type=media_type, media_id=media_id)
-        await cleaner.clean_chat(message.bot, message.chat.id)
-        
-        await message.answer(
+        await state.set_state(States.enter_text)
+        await screen.show(
+            message.bot, message.chat.id,
             "🖼️ Медиа-контент сохранён!\n\n"
             "Теперь введите текст объявления (максимум 500 символов):",
-            reply_markup=ReplyKeyboardRemove()
+            text_inline_kb(),
+            resend=True
         )
-        await state.set_state(States.enter_text)
     except Exception as e:
         logger.error(f"Media upload error: {e}")
         await message.answer("⚠️ Ошибка при загрузке медиа")
 
-@user_router.message(States.enter_media, F.text == "Пропустить")
-async def skip_media(message: types.Message, state: FSMContext, cleaner: MessageCleaner):
+@user_router.callback_query(States.enter_media, F.data == "ad_skip_media")
+async def skip_media(callback: types.CallbackQuery, state: FSMContext, screen: ScreenRenderer):
     """Пропуск добавления медиа"""
-    await cleaner.clean_chat(message.bot, message.chat.id)
-    await message.answer(
+    await state.set_state(States.enter_text)
+    await screen.show(
+        callback.bot, callback.message.chat.id,
         "Введите текст объявления (максимум 500 символов):",
-        reply_markup=ReplyKeyboardRemove()
+        text_inline_kb()
     )
-    await state.set_state(States.enter_text)
+    await callback.answer()
+
+@user_router.callback_query(States.enter_media, F.data == "ad_back_duration")
+async def back_to_durations(callback: types.CallbackQuery, state: FSMContext, screen: ScreenRenderer):
+    """Назад к выбору срока"""
+    data = await state.get_data()
+    await state.set_state(States.select_duration)
+    await show_durations(callback.bot, screen, callback.message.chat.id, data['channel'])
+    await callback.answer()
+
+@user_router.callback_query(F.data == "ad_home")
+async def cancel_ad_flow(callback: types.CallbackQuery, state: FSMContext, cleaner: MessageCleaner,
+                         screen: ScreenRenderer):
+    """Выход из размещения в главное меню"""
+    await state.clear()
+    await screen.dismiss(callback.message.chat.id)
+    await cleaner.clean_chat(callback.bot, callback.message.chat.id)
+    await callback.message.answer(
+        messages.START,
+        reply_markup=get_main_menu(callback.from_user.id in settings.ADMIN_IDS)
+    )
+    await callback.answer()
 
 # Текст объявления
 @user_router.message(States.enter_text)
-async def process_ad_text(message: types.Message, state: FSMContext, cleaner: MessageCleaner):
+async def process_ad_text(message: types.Message, state: FSMContext, cleaner: MessageCleaner,
+                          screen: ScreenRenderer):
     """Обработка текста объявления"""
     try:
         if len(message.text) > 500:
             return await message.answer("❌ Превышен лимит в 500 символов")
         
         data = await state.get_data()
+        await screen.dismiss(message.chat.id)
         await cleaner.clean_chat(message.bot, message.chat.id)
         
         # Формируем текст подтверждения
@@ -244,7 +262,7 @@ async def process_ad_text(message: types.Message, state: FSMContext, cleaner: Me
         await message.answer("⚠️ Ошибка при создании объявления")
 
 # Отмена действий
-@user_router.message(F.text == "❌ Отмена")
+@user_router.message(Button("❌ Отмена"))
 async def cancel_ad(message: types.Message, state: FSMContext, cleaner: MessageCleaner):
     """Отмена текущего действия"""
     await state.clear()
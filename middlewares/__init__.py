@@ -1,3 +1,16 @@
 from .auth import AdminMiddleware
+from .deliverability import DeliverabilityMiddleware
+from .database import DbSessionMiddleware
+from .user_registry import UserRegistryMiddleware
+from .activity import ActivityMiddleware
+from .throttling import ThrottlingMiddleware, setup_throttling
+from .fsm_flush import FsmFlushMiddleware, FsmFlushRequestMiddleware
+from .chat_scheduler import ChatSchedulerMiddleware
+from .button_router import ButtonRouterMiddleware
+from .log_context import LogContextMiddleware
+from .metrics import ApiMetricsMiddleware, HandlerMetricsMiddleware
 
-__all__ = ['AdminMiddleware']
\ No newline at end of file
+__all__ = ['AdminMiddleware', 'DeliverabilityMiddleware', 'DbSessionMiddleware', 'UserRegistryMiddleware',
+           'ActivityMiddleware', 'ThrottlingMiddleware', 'setup_throttling', 'FsmFlushMiddleware',
+           'FsmFlushRequestMiddleware', 'ChatSchedulerMiddleware', 'ButtonRouterMiddleware', 'LogContextMiddleware',
+           'ApiMetricsMiddleware', 'HandlerMetricsMiddleware']
\ No newline at end of file
@@ -0,0 +1,15 @@
+from aiogram.dispatcher.middlewares.base import BaseMiddleware
+from services.activity import ActivityTracker
+
+class ActivityMiddleware(BaseMiddleware):
+    """Отмечает активность пользователя в памяти; в БД пишет фоновый flush"""
+
+    def __init__(self, tracker: ActivityTracker):
+        self.tracker = tracker
+        super().__init__()
+
+    async def __call__(self, handler, event, data):
+        user_id = data.get("db_user_id")
+        if user_id is not None:
+            self.tracker.touch(user_id)
+        return await handler(event, data)
@@ -0,0 +1,55 @@
+from typing import Optional
+
+from aiogram import Router
+from aiogram.dispatcher.event.bases import SkipHandler
+from aiogram.dispatcher.middlewares.base import BaseMiddleware
+from services.buttons import ButtonIndex
+
+class ButtonRouterMiddleware(BaseMiddleware):
+    """Нажатие кнопки сразу попадает в её обработчик, минуя цепочку фильтров.
+
+    Ставится внешним middleware сообщений диспетчера. Если по ButtonIndex
+    сообщение первым принял бы обработчик кнопки, он вызывается так же, как
+    это сделал бы его роутер (с его внутренними middleware — их список даёт
+    приватный observer._resolve_middlewares(), тот же вызов, что в
+    TelegramEventObserver.trigger aiogram 3.13; tests/test_buttons.py это
+    закрепляет). Всё остальное — свободный текст, команды, медиа, кнопка не
+    прошла свои фильтры — идёт обычным путём aiogram по роутерам.
+    """
+
+    def __init__(self, root: Router, index: Optional[ButtonIndex] = None):
+        self.root = root
+        self.index = index if index is not None else ButtonIndex()
+        self._built = False
+        self.hits = 0
+        self.misses = 0
+        super().__init__()
+
+    def invalidate(self):
+        """Перестроить индекс при следующем сообщении (после изменения роутеров)"""
+        self._built = False
+
+    async def __call__(self, handler, event, data):
+        if event.text is None:
+            return await handler(event, data)
+        if not self._built:
+            # Роутеры подключаются после регистрации middleware — индекс строится при первом сообщении
+            self.index.build(self.root)
+            self._built = True
+
+        target = self.index.find(event.text, data.get("raw_state"))
+        if target is not None:
+            observer, button = target
+            passed, button_data = await button.check(event, **data)
+            if passed:
+                button_data.update(handler=button, event_router=observer.router)
+                wrapped = observer.outer_middleware.wrap_middlewares(
+                    observer._resolve_middlewares(), button.call
+                )
+                self.hits += 1
+                try:
+                    return await wrapped(event, button_data)
+                except SkipHandler:
+                    self.hits -= 1
+        self.misses += 1
+        return await handler(event, data)
@@ -0,0 +1,38 @@
+from aiogram import Router
+from aiogram.dispatcher.middlewares.base import BaseMiddleware
+from aiogram.dispatcher.middlewares.error import ErrorsMiddleware
+from services.dispatch import ChatScheduler
+
+class ChatSchedulerMiddleware(BaseMiddleware):
+    """Передаёт апдейт в очередь его чата и сразу возвращает управление.
+
+    Ставится внешним middleware после антифлуда: отброшенные апдейты не
+    занимают очередь, а всё, что зарегистрировано после (сессия БД, запись
+    FSM), выполняется уже в очереди чата. Длительность в логе aiogram
+    «Update id=... is handled» — это время постановки в очередь.
+
+    FSMContextMiddleware aiogram стоит раньше и читает raw_state ещё при
+    постановке в очередь, поэтому в очереди состояние перечитывается:
+    второй апдейт чата фильтруется по состоянию, которое оставил первый.
+    Ошибки обработчиков aiogram ловит в ErrorsMiddleware, который тоже стоит
+    раньше и к моменту выполнения задачи уже отработал, — поэтому они
+    передаются в обработчики dp.errors здесь; необработанные пишутся в лог
+    планировщиком.
+    """
+
+    def __init__(self, scheduler: ChatScheduler, router: Router):
+        self.scheduler = scheduler
+        self.errors = ErrorsMiddleware(router)
+        super().__init__()
+
+    async def _run(self, handler, event, data):
+        state = data.get("state")
+        if state is not None:
+            data["raw_state"] = await state.get_state()
+        return await self.errors(handler, event, data)
+
+    async def __call__(self, handler, event, data):
+        chat = data.get("event_chat")
+        user = data.get("event_from_user")
+        key = chat.id if chat else user.id if user else None
+        await self.scheduler.submit(key, lambda: self._run(handler, event, data), event.update_id)
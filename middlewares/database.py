@@ -0,0 +1,30 @@
+from contextvars import ContextVar
+from typing import Optional
+
+from aiogram.dispatcher.middlewares.base import BaseMiddleware
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+# Сессия апдейта, который сейчас обрабатывается в этой задаче (для request-middleware)
+current_session: ContextVar[Optional[AsyncSession]] = ContextVar("current_session", default=None)
+
+class DbSessionMiddleware(BaseMiddleware):
+    """Одна сессия БД на апдейт: передаётся в обработчик как `db`,
+    фиксируется одним commit в конце или откатывается при ошибке"""
+
+    def __init__(self, session_pool: async_sessionmaker):
+        self.session_pool = session_pool
+        super().__init__()
+
+    async def __call__(self, handler, event, data):
+        async with self.session_pool() as session:
+            data["db"] = session
+            token = current_session.set(session)
+            try:
+                result = await handler(event, data)
+            except Exception:
+                await session.rollback()
+                raise
+            finally:
+                current_session.reset(token)
+            await session.commit()
+            return result
@@ -0,0 +1,11 @@
+from aiogram.dispatcher.middlewares.base import BaseMiddleware
+from services.deliverability import mark_deliverable
+
+class DeliverabilityMiddleware(BaseMiddleware):
+    """Снимает отметку «недоступен», когда пользователь снова пишет боту"""
+
+    async def __call__(self, handler, event, data):
+        user = data.get("event_from_user")
+        if user:
+            await mark_deliverable(user.id)
+        return await handler(event, data)
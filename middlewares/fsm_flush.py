@@ -0,0 +1,45 @@
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware
+from aiogram.dispatcher.middlewares.base import BaseMiddleware
+from middlewares.database import current_session
+from services.fsm_storage import DatabaseStorage
+
+class FsmFlushMiddleware(BaseMiddleware):
+    """Сохраняет изменения FSM одним запросом после обработки апдейта"""
+
+    def __init__(self, storage: DatabaseStorage):
+        self.storage = storage
+        super().__init__()
+
+    async def __call__(self, handler, event, data):
+        try:
+            return await handler(event, data)
+        finally:
+            await self.storage.flush()
+
+
+class FsmFlushRequestMiddleware(BaseRequestMiddleware):
+    """Сохраняет изменения FSM перед запросом к Bot API (для общего хранилища).
+
+    Ответ бота — новый экран или ответ на нажатие — уходит только после
+    commit состояния, поэтому следующее действие пользователя, в какой бы
+    воркер оно ни попало, фильтруется уже по новому состоянию. Обработчик,
+    который меняет состояние и отвечает одним сообщением, по-прежнему пишет
+    в БД один раз: в конце апдейта записывать уже нечего.
+
+    commit_session — SQLite: блокировка записи одна на всю БД, и пока сессия
+    обработчика держит её, запись FSM из другого соединения ждала бы
+    busy_timeout. Поэтому сначала фиксируется сессия апдейта — всё равно
+    ответ пользователю должен уходить после commit его изменений.
+    """
+
+    def __init__(self, storage: DatabaseStorage, commit_session: bool = False):
+        self.storage = storage
+        self.commit_session = commit_session
+
+    async def __call__(self, make_request, bot, method):
+        if self.storage.pending:
+            db = current_session.get()
+            if self.commit_session and db is not None and db.in_transaction():
+                await db.commit()
+            await self.storage.flush()
+        return await make_request(bot, method)
@@ -0,0 +1,27 @@
+from aiogram.dispatcher.middlewares.base import BaseMiddleware
+from aiogram.types import Update
+from services.log_pipeline import log_context
+
+class LogContextMiddleware(BaseMiddleware):
+    """Привязывает записи лога к апдейту: update_id, chat_id и имя обработчика.
+
+    Один экземпляр ставится дважды: внешним middleware апдейтов после
+    очередей чатов (контекст задаётся уже в задаче, которая обрабатывает
+    апдейт) и внутренним middleware сообщений и нажатий — там известен
+    выбранный обработчик.
+    """
+
+    async def __call__(self, handler, event, data):
+        if isinstance(event, Update):
+            chat = data.get("event_chat")
+            token = log_context.set({"update_id": event.update_id, "chat_id": chat.id if chat else None})
+            try:
+                return await handler(event, data)
+            finally:
+                log_context.reset(token)
+
+        context = log_context.get()
+        handler_object = data.get("handler")
+        if context is not None and handler_object is not None:
+            context["handler"] = getattr(handler_object.callback, "__qualname__", None)
+        return await handler(event, data)
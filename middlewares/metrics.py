@@ -0,0 +1,46 @@
+import time
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware
+from aiogram.dispatcher.middlewares.base import BaseMiddleware
+from aiogram.exceptions import TelegramRetryAfter
+from services.metrics import api_errors, api_retry_after, api_seconds, handler_errors, handler_seconds
+
+class HandlerMetricsMiddleware(BaseMiddleware):
+    """Время выбранного обработчика по роутеру и имени — в bot_handler_seconds.
+
+    Ставится внутренним middleware сообщений и нажатий: до него фильтры уже
+    отработали, поэтому в замер попадает только обработчик (и внутренние
+    middleware после этого).
+    """
+
+    async def __call__(self, handler, event, data):
+        handler_object = data.get("handler")
+        if handler_object is None:
+            return await handler(event, data)
+        router = data.get("event_router")
+        labels = (router.name if router else "", handler_object.callback.__qualname__)
+        started = time.perf_counter()
+        try:
+            return await handler(event, data)
+        except Exception:
+            handler_errors.inc(*labels)
+            raise
+        finally:
+            handler_seconds.observe(time.perf_counter() - started, *labels)
+
+
+class ApiMetricsMiddleware(BaseRequestMiddleware):
+    """Время, ошибки и 429 запросов к Bot API по методам; ставится на сессию бота"""
+
+    async def __call__(self, make_request, bot, method):
+        name = method.__api_method__
+        started = time.perf_counter()
+        try:
+            return await make_request(bot, method)
+        except TelegramRetryAfter:
+            api_retry_after.inc(name)
+            raise
+        except Exception as e:
+            api_errors.inc(name, type(e).__name__)
+            raise
+        finally:
+            api_seconds.observe(time.perf_counter() - started, name)
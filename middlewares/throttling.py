@@ -1,38 +1,168 @@
-import asyncio
-from collections import defaultdict
-from datetime import datetime, timedelta
 import logging
+import time
+from typing import Dict
 from aiogram import types
 from aiogram.dispatcher.middlewares.base import BaseMiddleware
+from config.settings import settings
+from database.crud import delete_idle_throttle, get_throttle_tat, hit_throttle
+from database.session import SessionLocal
 
 logger = logging.getLogger(__name__)
 
+SWEEP_INTERVAL = 30.0  # Как часто вытеснять пользователей без активности, сек
+TOLERANCE_SLACK = 1e-6  # Погрешность сложения float, иначе всплеск ровно в rate может не пройти
+
+
+class Limit:
+    """GCRA: rate запросов за per секунд, допускается всплеск до rate подряд"""
+    __slots__ = ("interval", "tolerance", "per")
+
+    def __init__(self, rate: int, per: float):
+        self.interval = per / rate                    # Период эмиссии одного запроса
+        self.tolerance = self.interval * (rate - 1) + TOLERANCE_SLACK  # Насколько TAT может опережать «сейчас»
+        self.per = per
+
+
+class _UserState:
+    """Теоретическое время прибытия (TAT) следующего запроса по каждому лимиту"""
+    __slots__ = ("message_tat", "callback_tat", "warned_until")
+
+    def __init__(self):
+        self.message_tat = 0.0
+        self.callback_tat = 0.0
+        self.warned_until = 0.0
+
+
 class ThrottlingMiddleware(BaseMiddleware):
-    def __init__(self, rate: int = 5, per: float = 10.0):
-        self.rate = rate
-        self.per = timedelta(seconds=per)
-        self.user_timestamps = defaultdict(list)
+    """Антифлуд для сообщений и нажатий кнопок с отдельными лимитами.
+
+    Ставится внешним middleware на update, поэтому отброшенный апдейт не
+    открывает сессию БД и не проходит фильтры. На пользователя хранится одна
+    запись из трёх float; записи, у которых TAT уже в прошлом, ничем не
+    отличаются от новых и периодически вытесняются.
+    """
+
+    clock = staticmethod(time.monotonic)
+
+    def __init__(self, message_limit: Limit, callback_limit: Limit):
+        self.message_limit = message_limit
+        self.callback_limit = callback_limit
+        # Порядок вставки = порядок последнего запроса: вытеснение идёт с начала
+        self._users: Dict[int, _UserState] = {}
+        self._next_sweep = self.clock() + SWEEP_INTERVAL
+        self.throttled = 0
         super().__init__()
 
-    async def __call__(self, handler, event: types.Message, data):
-        user_id = event.from_user.id
-        now = datetime.now()
+    def __len__(self) -> int:
+        return len(self._users)
 
-        # Очищаем старые запросы
-        self.user_timestamps[user_id] = [
-            t for t in self.user_timestamps[user_id] 
-            if now - t < self.per
-        ]
+    async def __call__(self, handler, event: types.Update, data):
+        if event.message is not None:
+            is_callback = False
+        elif event.callback_query is not None:
+            is_callback = True
+        else:
+            return await handler(event, data)
 
-        # Проверяем лимит
-        if len(self.user_timestamps[user_id]) >= self.rate:
-            logger.warning(f"Rate limit exceeded for user {user_id}")
-            await event.answer("⚠️ Слишком много запросов! Пожалуйста, подождите.")
-            return
+        user = data.get("event_from_user")
+        if user is None:
+            return await handler(event, data)
 
-        # Добавляем текущий запрос
-        self.user_timestamps[user_id].append(now)
+        now = self.clock()
+        # Вытеснение до перестановки: иначе текущий пользователь, чей TAT ещё
+        # не сдвинут, попадёт под него вместе с запросом
+        if now >= self._next_sweep:
+            await self.sweep(now)
+        state = self._users.pop(user.id, None)
+        if state is None:
+            state = _UserState()
+        self._users[user.id] = state
+
+        retry_in = await self._hit(user.id, state, is_callback, now)
+        if retry_in:
+            return await self._reject(event, state, user.id, now, retry_in)
         return await handler(event, data)
 
-def setup_throttling(dp):
-    dp.message.middleware(ThrottlingMiddleware(rate=5, per=10))  # 5 сообщений в 10 секунд
\ No newline at end of file
+    async def _hit(self, user_id: int, state: _UserState, is_callback: bool, now: float) -> float:
+        """0, если запрос укладывается в лимит, иначе через сколько секунд можно повторить"""
+        limit = self.callback_limit if is_callback else self.message_limit
+        tat = max(state.callback_tat if is_callback else state.message_tat, now)
+        if tat - now > limit.tolerance:
+            return tat - now - limit.tolerance
+        if is_callback:
+            state.callback_tat = tat + limit.interval
+        else:
+            state.message_tat = tat + limit.interval
+        return 0.0
+
+    async def _reject(self, event: types.Update, state: _UserState, user_id: int, now: float, retry_in: float):
+        self.throttled += 1
+        if event.callback_query is not None:
+            # Ответ на callback нужен в любом случае, иначе кнопка «висит»
+            await event.callback_query.answer("⚠️ Слишком часто, подождите немного")
+            return
+        # Предупреждаем один раз за окно, а не на каждое лишнее сообщение
+        if now >= state.warned_until:
+            state.warned_until = now + self.message_limit.per
+            logger.warning(f"Rate limit exceeded for user {user_id}")
+            await event.message.answer(
+                f"⚠️ Слишком много запросов! Подождите {max(1, round(retry_in))} с."
+            )
+
+    async def sweep(self, now: float) -> int:
+        """Вытесняет пользователей, чьи лимиты полностью восстановились"""
+        self._next_sweep = now + SWEEP_INTERVAL
+        idle = []
+        for user_id, state in self._users.items():
+            if max(state.message_tat, state.callback_tat, state.warned_until) > now:
+                break
+            idle.append(user_id)
+        for user_id in idle:
+            del self._users[user_id]
+        return len(idle)
+
+
+class SharedThrottlingMiddleware(ThrottlingMiddleware):
+    """Антифлуд для нескольких воркеров: TAT хранится в throttle_states.
+
+    Проверка и сдвиг TAT — один атомарный upsert, поэтому лимит общий, какой
+    бы воркер ни получил апдейт. Время — unix, а не monotonic: его сравнивают
+    разные процессы. Локально остаются только отметки о предупреждениях.
+    """
+
+    clock = staticmethod(time.time)
+
+    async def _hit(self, user_id: int, state: _UserState, is_callback: bool, now: float) -> float:
+        limit = self.callback_limit if is_callback else self.message_limit
+        try:
+            async with SessionLocal() as db:
+                allowed = await hit_throttle(db, user_id, is_callback, now, limit.interval, limit.tolerance)
+                await db.commit()
+                if allowed:
+                    return 0.0
+                tat = await get_throttle_tat(db, user_id, is_callback)
+        except Exception as e:
+            # Недоступная БД не должна блокировать бота целиком
+            logger.error(f"Shared throttle check failed for user {user_id}: {e}")
+            return 0.0
+        return max(tat - now - limit.tolerance, 0.001)
+
+    async def sweep(self, now: float) -> int:
+        swept = await super().sweep(now)
+        try:
+            async with SessionLocal() as db:
+                await delete_idle_throttle(db, now)
+                await db.commit()
+        except Exception as e:
+            logger.error(f"Shared throttle sweep failed: {e}")
+        return swept
+
+
+def setup_throttling(dp, shared: bool = False) -> ThrottlingMiddleware:
+    """Регистрирует антифлуд первым внешним middleware апдейтов"""
+    throttling = (SharedThrottlingMiddleware if shared else ThrottlingMiddleware)(
+        message_limit=Limit(settings.THROTTLE_MESSAGE_RATE, settings.THROTTLE_MESSAGE_PER),
+        callback_limit=Limit(settings.THROTTLE_CALLBACK_RATE, settings.THROTTLE_CALLBACK_PER)
+    )
+    dp.update.outer_middleware(throttling)
+    return throttling
@@ -0,0 +1,25 @@
+from aiogram.dispatcher.middlewares.base import BaseMiddleware
+from services.user_registry import UserRegistry
+
+class UserRegistryMiddleware(BaseMiddleware):
+    """Регистрирует автора любого апдейта; передаёт в обработчик `db_user_id`"""
+
+    def __init__(self, registry: UserRegistry):
+        self.registry = registry
+        super().__init__()
+
+    async def __call__(self, handler, event, data):
+        user = data.get("event_from_user")
+        if not user or user.is_bot:
+            return await handler(event, data)
+
+        db = data["db"]
+        user_id, created = await self.registry.resolve(db, user)
+        if db.in_transaction():
+            # Регистрация фиксируется сразу: иначе транзакция записи (в SQLite —
+            # блокировка всей БД) и соединение из пула держались бы до конца
+            # обработчика вместе с его запросами к Bot API
+            await db.commit()
+        self.registry.remember(user.id, user_id)
+        data["db_user_id"] = user_id
+        return await handler(event, data)
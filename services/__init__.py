@@ -1,5 +1,23 @@
-from .payment import process_payment
-from .keyboards import admin_kb, get_main_menu, generate_channels_kb, generate_durations_kb
+from importlib import import_module
+
+# Модули сервисов загружаются при первом обращении: импорт пакета ради
+# одного сервиса не тянет остальные (и SQLAlchemy, aiogram вместе с ними)
+_LAZY = {
+    'process_payment': '.payment',
+    'admin_kb': '.keyboards',
+    'get_main_menu': '.keyboards',
+    'generate_channels_kb': '.keyboards',
+    'generate_durations_kb': '.keyboards',
+}
+
+
+def __getattr__(name):
+    if name not in _LAZY:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(import_module(_LAZY[name], __name__), name)
+    globals()[name] = value
+    return value
+
 
 __all__ = [
     'process_payment',
@@ -7,4 +25,4 @@ __all__ = [
     'get_main_menu',
     'generate_channels_kb',
     'generate_durations_kb'
-]
\ No newline at end of file
+]
@@ -0,0 +1,70 @@
+import asyncio
+import logging
+import time
+from datetime import datetime
+from typing import Dict, Optional
+
+from config.settings import settings
+from database.crud import update_last_activity
+from database.session import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+
+class ActivityTracker:
+    """Write-behind буфер User.last_activity.
+
+    Middleware только запоминает время последнего апдейта пользователя в
+    памяти; фоновая задача раз в ACTIVITY_FLUSH_INTERVAL секунд пишет всё
+    накопленное одним пакетным UPDATE. При остановке буфер сбрасывается.
+    """
+
+    def __init__(self, interval: float = settings.ACTIVITY_FLUSH_INTERVAL):
+        self.interval = interval
+        self._pending: Dict[int, float] = {}  # User.id -> unix time
+        self._task: Optional[asyncio.Task] = None
+        self.flushes = 0
+        self.rows_written = 0
+
+    def touch(self, user_id: int):
+        self._pending[user_id] = time.time()
+
+    async def flush(self):
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, {}
+        try:
+            async with SessionLocal() as db:
+                await update_last_activity(
+                    db, {user_id: datetime.utcfromtimestamp(ts) for user_id, ts in pending.items()}
+                )
+                await db.commit()
+        except Exception as e:
+            # Возвращаем в буфер, не затирая более свежие отметки
+            for user_id, ts in pending.items():
+                if ts > self._pending.get(user_id, 0):
+                    self._pending[user_id] = ts
+            logger.error(f"Activity flush failed ({len(pending)} users): {e}")
+            return
+        self.flushes += 1
+        self.rows_written += len(pending)
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.flush()
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await self.flush()
+        logger.info(f"Activity tracker stopped: {self.rows_written} rows in {self.flushes} flushes")
+
+
+activity_tracker = ActivityTracker()
@@ -0,0 +1,436 @@
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramBadRequest, TelegramRetryAfter
+from aiogram.utils.keyboard import InlineKeyboardBuilder
+from config.settings import settings
+from database.crud import get_broadcast_jobs, get_broadcast_recipients, get_broadcast_statuses, save_broadcast_checkpoint
+from database.models import BroadcastJob
+from database.session import SessionLocal
+from services.deliverability import is_undeliverable_error, mark_undeliverable, notify
+from services.leader import leader
+
+logger = logging.getLogger(__name__)
+
+PAGE_SIZE = 500          # Получателей в одной странице выборки из БД
+PROGRESS_INTERVAL = 3.0  # Как часто сохранять курсор и обновлять прогресс, сек
+MAX_RETRIES = 5          # Сколько раз повторять отправку после flood control
+STOP_GRACE = 10.0        # Сколько ждать текущие отправки при сбое рассылки, сек
+
+
+class TokenBucket:
+    """Глобальный лимитер исходящих запросов к Bot API.
+
+    Скорость адаптивная: после TelegramRetryAfter все отправители ждут
+    указанное время, а темп снижается; при успешных отправках он плавно
+    возвращается к максимальному.
+    """
+
+    def __init__(self, rate: float, capacity: Optional[float] = None, min_rate: float = 1.0):
+        self.max_rate = rate
+        self.rate = rate
+        self.min_rate = min(min_rate, rate)
+        self.capacity = capacity or rate
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self._blocked_until:
+                    await asyncio.sleep(self._blocked_until - now)
+                    continue
+
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+    def on_success(self):
+        if self.rate < self.max_rate:
+            self.rate = min(self.max_rate, self.rate + self.max_rate * 0.01)
+
+    def on_retry_after(self, retry_after: float):
+        self._blocked_until = max(self._blocked_until, time.monotonic() + retry_after)
+        self._tokens = 0
+        self.rate = max(self.min_rate, self.rate * 0.75)
+        logger.warning(f"Flood control: pause {retry_after}s, rate lowered to {self.rate:.1f}/s")
+
+
+# Общий лимитер для всех массовых отправок бота
+bot_limiter = TokenBucket(settings.BROADCAST_RATE)
+
+
+async def notify_many(bot: Bot, notifications: List[Tuple[int, str]], limiter: TokenBucket = bot_limiter,
+                      workers: int = settings.BROADCAST_WORKERS) -> int:
+    """Параллельная отправка уведомлений под общим лимитером; возвращает число доставленных"""
+    semaphore = asyncio.Semaphore(workers)
+
+    async def send(telegram_id: int, text: str) -> bool:
+        async with semaphore:
+            for _ in range(MAX_RETRIES):
+                await limiter.acquire()
+                try:
+                    delivered = await notify(bot, telegram_id, text)
+                except TelegramRetryAfter as e:
+                    limiter.on_retry_after(e.retry_after)
+                    continue
+                limiter.on_success()
+                return delivered
+            return False
+
+    results = await asyncio.gather(*(send(telegram_id, text) for telegram_id, text in notifications))
+    return sum(results)
+
+
+@dataclass
+class BroadcastStats:
+    total: int
+    delivered: int = 0
+    failed: int = 0
+    retried: int = 0
+    started_at: float = field(default_factory=time.monotonic)
+    done_at_start: int = 0  # Обработано до перезапуска/паузы
+
+    def __post_init__(self):
+        self.done_at_start = self.done
+
+    @property
+    def done(self) -> int:
+        return self.delivered + self.failed
+
+    @property
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started_at
+
+    @property
+    def speed(self) -> float:
+        """Сообщений в секунду с момента (пере)запуска"""
+        elapsed = self.elapsed
+        return (self.done - self.done_at_start) / elapsed if elapsed > 0 else 0.0
+
+    @property
+    def eta(self) -> Optional[float]:
+        speed = self.speed
+        if not speed:
+            return None
+        return max(self.total - self.done, 0) / speed
+
+
+def _format_seconds(seconds: Optional[float]) -> str:
+    if seconds is None:
+        return "—"
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    if hours:
+        return f"{hours} ч {minutes} мин"
+    if minutes:
+        return f"{minutes} мин {seconds} с"
+    return f"{seconds} с"
+
+
+def job_keyboard(job_id: int, status: str):
+    """Кнопки управления рассылкой"""
+    builder = InlineKeyboardBuilder()
+    if status == "running":
+        builder.button(text="⏸ Пауза", callback_data=f"bcast_pause_{job_id}")
+    elif status == "paused":
+        builder.button(text="▶️ Продолжить", callback_data=f"bcast_resume_{job_id}")
+    if status in ("running", "paused"):
+        builder.button(text="⛔ Отменить", callback_data=f"bcast_cancel_{job_id}")
+    return builder.as_markup()
+
+
+class Broadcast:
+    """Рассылка пулом отправителей под общим лимитером.
+
+    Состояние хранится в BroadcastJob: курсор по User.id и счётчики
+    периодически сохраняются, поэтому после перезапуска процесса или паузы
+    рассылка продолжается с последней контрольной точки.
+    """
+
+    def __init__(
+        self,
+        bot: Bot,
+        job: BroadcastJob,
+        limiter: TokenBucket = bot_limiter,
+        workers: int = settings.BROADCAST_WORKERS,
+    ):
+        self.bot = bot
+        self.job_id = job.id
+        self.admin_id = job.admin_id
+        self.from_chat_id = job.from_chat_id
+        self.message_id = job.message_id
+        self.progress_message_id = job.progress_message_id
+        self.cursor = job.cursor
+        self.limiter = limiter
+        self.workers = workers
+        self.stats = BroadcastStats(total=job.total, delivered=job.delivered, failed=job.failed)
+        self._page: List[Tuple[int, int]] = []
+        self._pos = 0
+        self._next_page: Optional[asyncio.Task] = None
+        self._page_lock = asyncio.Lock()
+        self._last_dispatched = job.cursor
+        self._in_flight: Dict[int, None] = {}
+        self._undeliverable: List[int] = []
+        self._stop_status: Optional[str] = None
+        self._stopping = False
+
+    @property
+    def checkpoint(self) -> int:
+        """Курсор, до которого (включительно) все получатели обработаны"""
+        if self._in_flight:
+            return min(self._in_flight) - 1
+        return self._last_dispatched
+
+    def stop(self, status: Optional[str] = None):
+        """Останавливает рассылку; status=None оставляет задачу для продолжения после рестарта"""
+        self._stop_status = status
+        self._stopping = True
+
+    async def run(self) -> BroadcastStats:
+        self._next_page = asyncio.create_task(self._fetch_page(self.cursor))
+        workers = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        progress = asyncio.create_task(self._report_progress())
+        try:
+            done, _ = await asyncio.wait(workers, return_when=asyncio.FIRST_EXCEPTION)
+            error = next((task.exception() for task in done if task.exception()), None)
+            if error:
+                # Сбой одного отправителя (например, БД при подгрузке страницы):
+                # остальные досылают текущее сообщение и выходят
+                self._stopping = True
+                await asyncio.wait(workers, timeout=STOP_GRACE)
+                raise error
+        except BaseException:
+            # Не успевшие за STOP_GRACE или отмена всей рассылки: оборванная
+            # отправка считается обработанной — лучше пропуск, чем дубль
+            self._stopping = True
+            await self._cancel(*workers, progress, self._next_page)
+            try:
+                # Статус не меняется: лидер продолжит рассылку с этой точки
+                await self._save()
+            except Exception as e:
+                logger.error(f"Broadcast #{self.job_id} checkpoint failed: {e}")
+            raise
+        await self._cancel(progress, self._next_page)
+
+        stats = self.stats
+        if not self._stopping:
+            status = "done"
+        else:
+            status = self._stop_status or "running"
+        await self._save(status)
+
+        logger.info(
+            f"Broadcast #{self.job_id} {status}: {stats.delivered} delivered, {stats.failed} failed, "
+            f"{stats.retried} retried in {stats.elapsed:.1f}s ({stats.speed:.1f} msg/s)"
+        )
+        if status == "done":
+            await self._edit_progress(
+                f"📢 <b>Рассылка #{self.job_id} завершена</b>\n\n"
+                f"✅ Успешно: {stats.delivered}\n"
+                f"❌ Не удалось: {stats.failed}\n"
+                f"⚡ Скорость: {stats.speed:.1f} сообщ./с\n"
+                f"⏱ Время: {_format_seconds(stats.elapsed)}",
+                status
+            )
+        elif status in ("paused", "cancelled"):
+            title = "⏸ Рассылка #{} приостановлена" if status == "paused" else "⛔ Рассылка #{} отменена"
+            await self._edit_progress(
+                f"<b>{title.format(self.job_id)}</b>\n\n"
+                f"📨 Обработано: {stats.done}/{stats.total}\n"
+                f"✅ Успешно: {stats.delivered}\n"
+                f"❌ Не удалось: {stats.failed}",
+                status
+            )
+        return stats
+
+    @staticmethod
+    async def _cancel(*tasks: Optional[asyncio.Task]):
+        tasks = [task for task in tasks if task]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _fetch_page(self, after_id: int) -> List[Tuple[int, int]]:
+        async with SessionLocal() as db:
+            return await get_broadcast_recipients(db, after_id, PAGE_SIZE)
+
+    async def _next_recipient(self) -> Optional[Tuple[int, int]]:
+        """Следующий получатель; следующая страница подгружается, пока отправляется текущая"""
+        async with self._page_lock:
+            if self._pos >= len(self._page):
+                if self._next_page is None:
+                    return None
+                self._page = await self._next_page
+                self._pos = 0
+                if len(self._page) == PAGE_SIZE:
+                    self._next_page = asyncio.create_task(self._fetch_page(self._page[-1][0]))
+                else:
+                    self._next_page = None
+                if not self._page:
+                    return None
+
+            recipient = self._page[self._pos]
+            self._pos += 1
+            self._last_dispatched = recipient[0]
+            self._in_flight[recipient[0]] = None
+            return recipient
+
+    async def _worker(self):
+        while not self._stopping:
+            recipient = await self._next_recipient()
+            if recipient is None:
+                return
+            user_id, chat_id = recipient
+            try:
+                await self._deliver(chat_id)
+            finally:
+                del self._in_flight[user_id]
+
+    async def _deliver(self, chat_id: int):
+        for _ in range(MAX_RETRIES):
+            await self.limiter.acquire()
+            try:
+                # copy_message работает по ссылке на исходное сообщение и переживает рестарт
+                await self.bot.copy_message(chat_id, self.from_chat_id, self.message_id)
+            except TelegramRetryAfter as e:
+                # Flood control — не ошибка получателя, повторяем после паузы
+                self.stats.retried += 1
+                self.limiter.on_retry_after(e.retry_after)
+                continue
+            except Exception as e:
+                if is_undeliverable_error(e):
+                    self._undeliverable.append(chat_id)
+                logger.error(f"Ошибка рассылки для {chat_id}: {e}")
+                self.stats.failed += 1
+                return
+            self.limiter.on_success()
+            self.stats.delivered += 1
+            return
+
+        logger.error(f"Ошибка рассылки для {chat_id}: retry limit exceeded")
+        self.stats.failed += 1
+
+    async def _save(self, status: Optional[str] = None):
+        undeliverable, self._undeliverable = self._undeliverable, []
+        await mark_undeliverable(undeliverable)
+        async with SessionLocal() as db:
+            await save_broadcast_checkpoint(
+                db, self.job_id, self.checkpoint,
+                self.stats.delivered, self.stats.failed, status
+            )
+            await db.commit()
+
+    async def _report_progress(self):
+        while True:
+            await asyncio.sleep(PROGRESS_INTERVAL)
+            await self._save()
+            stats = self.stats
+            await self._edit_progress(
+                f"⏳ <b>Рассылка #{self.job_id}...</b>\n\n"
+                f"📨 Обработано: {stats.done}/{stats.total}\n"
+                f"✅ Успешно: {stats.delivered}\n"
+                f"❌ Не удалось: {stats.failed}\n"
+                f"⚡ Скорость: {stats.speed:.1f} сообщ./с\n"
+                f"⏱ Осталось: ~{_format_seconds(stats.eta)}",
+                "running"
+            )
+
+    async def _edit_progress(self, text: str, status: str):
+        if not self.progress_message_id:
+            return
+        await self.limiter.acquire()
+        try:
+            await self.bot.edit_message_text(
+                text,
+                chat_id=self.admin_id,
+                message_id=self.progress_message_id,
+                reply_markup=job_keyboard(self.job_id, status)
+            )
+        except TelegramBadRequest as e:
+            if "message is not modified" not in str(e):
+                logger.warning(f"Broadcast progress edit failed: {e}")
+        except Exception as e:
+            logger.warning(f"Broadcast progress edit failed: {e}")
+
+
+# Запущенные в этом процессе рассылки по id задачи
+_running: Dict[int, Tuple[Broadcast, asyncio.Task]] = {}
+
+
+def start_broadcast(bot: Bot, job: BroadcastJob) -> Optional[asyncio.Task]:
+    """Запускает (или продолжает) рассылку фоновой задачей и сразу возвращает управление.
+
+    Рассылки выполняет только лидер; в остальных воркерах задача со статусом
+    running подхватывается его sync_broadcasts.
+    """
+    if not leader.is_leader:
+        return None
+    broadcast = Broadcast(bot, job)
+    task = asyncio.create_task(broadcast.run())
+    _running[job.id] = (broadcast, task)
+    task.add_done_callback(lambda t: _on_broadcast_done(job.id, t))
+    return task
+
+
+def _on_broadcast_done(job_id: int, task: asyncio.Task):
+    _running.pop(job_id, None)
+    if not task.cancelled() and task.exception():
+        logger.error(f"Broadcast #{job_id} crashed: {task.exception()}", exc_info=task.exception())
+
+
+async def stop_broadcast(job_id: int, status: str) -> bool:
+    """Ставит рассылку на паузу или отменяет её; False, если она не запущена здесь"""
+    if job_id not in _running:
+        return False
+    broadcast, task = _running[job_id]
+    broadcast.stop(status)
+    await asyncio.gather(task, return_exceptions=True)
+    return True
+
+
+async def sync_broadcasts(bot: Bot):
+    """Приводит запущенные здесь рассылки к статусам в БД: запускает новые и
+    прерванные рестартом, останавливает поставленные на паузу в другом воркере"""
+    async with SessionLocal() as db:
+        jobs = await get_broadcast_jobs(db, statuses=("running",), limit=100)
+        running_ids = {job.id for job in jobs}
+        stale = [job_id for job_id in _running if job_id not in running_ids]
+        statuses = await get_broadcast_statuses(db, stale) if stale else {}
+    for job in jobs:
+        if job.id not in _running:
+            logger.info(f"Resuming broadcast #{job.id} from user id {job.cursor}")
+            start_broadcast(bot, job)
+    for job_id, status in statuses.items():
+        if status in ("paused", "cancelled"):
+            await stop_broadcast(job_id, status)
+
+
+async def run_broadcast_scheduler(bot: Bot):
+    """Задание лидера: синхронизация рассылок; при потере лидерства — контрольные точки"""
+    try:
+        while True:
+            try:
+                await sync_broadcasts(bot)
+            except Exception as e:
+                logger.error(f"Broadcast sync failed: {e}")
+            await asyncio.sleep(settings.BROADCAST_POLL_INTERVAL)
+    finally:
+        await shutdown_broadcasts()
+
+
+async def shutdown_broadcasts():
+    """Сохраняет контрольные точки запущенных рассылок перед остановкой"""
+    for broadcast, _ in list(_running.values()):
+        broadcast.stop()
+    await asyncio.gather(*(task for _, task in list(_running.values())), return_exceptions=True)
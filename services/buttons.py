@@ -0,0 +1,133 @@
+import logging
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from aiogram import Router, types
+from aiogram.dispatcher.event.handler import HandlerObject
+from aiogram.dispatcher.event.telegram import TelegramEventObserver
+from aiogram.filters import Command, Filter, StateFilter
+from aiogram.fsm.state import State, StatesGroup
+
+logger = logging.getLogger(__name__)
+
+ANY_STATE = "*"  # Как в aiogram: обработчик кнопки без фильтра состояния
+
+Target = Tuple[TelegramEventObserver, HandlerObject]
+
+
+class Button(Filter):
+    """Точный текст кнопки reply-клавиатуры (одной или нескольких).
+
+    Работает и как обычный фильтр aiogram, но главное — по нему
+    ButtonIndex находит обработчик за один поиск в словаре.
+    """
+
+    def __init__(self, *texts: str):
+        self.texts = frozenset(texts)
+
+    def __str__(self) -> str:
+        return f"Button({', '.join(sorted(self.texts))})"
+
+    async def __call__(self, message: types.Message) -> bool:
+        return message.text in self.texts
+
+
+def _states(handler: HandlerObject) -> Optional[List[Optional[str]]]:
+    """Состояния FSM из фильтров обработчика; None — фильтра состояния нет"""
+    states = None
+    for filter_object in handler.filters or ():
+        callback = filter_object.callback
+        if isinstance(callback, State):
+            items: Iterable = (callback,)
+        elif isinstance(callback, StateFilter):
+            items = callback.states
+        else:
+            continue
+        if states is not None:
+            return []  # Два фильтра состояния: состояния обработчика неизвестны
+        states = []
+        for item in items:
+            if isinstance(item, State):
+                states.append(item.state)
+            elif isinstance(item, type) and issubclass(item, StatesGroup):
+                states += item.__all_states_names__
+            else:
+                states.append(item)
+    return states
+
+
+def _may_match(handler: HandlerObject, text: str) -> bool:
+    """Может ли обработчик без индекса принять этот текст (в сомнительных случаях — да)"""
+    for filter_object in handler.filters or ():
+        callback = filter_object.callback
+        if isinstance(callback, Button) and text not in callback.texts:
+            return False
+        if isinstance(callback, Command) and text[:1] not in callback.prefix:
+            return False
+    return True
+
+
+class ButtonIndex:
+    """Обработчики кнопок всех роутеров в одной хеш-таблице (состояние, текст).
+
+    Строится один раз по дереву роутеров в том порядке, в каком aiogram
+    перебирает обработчики сообщений. Для каждого текста кнопки и каждого
+    состояния FSM из фильтров запоминается первый обработчик, который мог бы
+    принять такое сообщение. Если это обработчик кнопки с одним фильтром
+    Button — он и попадает в индекс. Если раньше стоит обработчик, который
+    индекс не разбирает (свободный текст в состоянии, магические фильтры,
+    фильтры и внешние middleware роутера), ключ остаётся пустым и сообщение
+    идёт обычным путём aiogram. Так индекс выбирает тот же обработчик, что и
+    перебор; остальные фильтры найденного обработчика проверяются при вызове.
+    """
+
+    def __init__(self):
+        # None — первым сообщение принял бы обработчик вне индекса
+        self._targets: Dict[Tuple[Optional[str], str], Optional[Target]] = {}
+        self.handlers = 0
+
+    def __len__(self) -> int:
+        return sum(target is not None for target in self._targets.values())
+
+    @staticmethod
+    def _entries(root: Router):
+        """(состояния или None — любое, обработчик, цель или None — не индексируется) в порядке aiogram"""
+        filtered = set()
+        for router in root.chain_tail:
+            # Фильтры и внешние middleware вложенного роутера индекс обошёл бы;
+            # фильтры к тому же отсекают и его вложенные роутеры
+            parent = router.parent_router
+            observer = router.message
+            if (observer._handler.filters or (router is not root and len(observer.outer_middleware))
+                    or (parent is not None and id(parent) in filtered)):
+                filtered.add(id(router))
+            for handler in router.message.handlers:
+                buttons = [f for f in handler.filters or () if isinstance(f.callback, Button)]
+                states = _states(handler)
+                if id(router) in filtered or states == []:
+                    yield None, handler, None
+                else:
+                    yield states, handler, (router.message, handler) if len(buttons) == 1 else None
+
+    def build(self, root: Router):
+        entries = list(self._entries(root))
+        self._targets.clear()
+        self.handlers = sum(target is not None for _, _, target in entries)
+        texts = {text for _, handler, _ in entries for f in handler.filters or ()
+                 if isinstance(f.callback, Button) for text in f.callback.texts}
+        for text in texts:
+            for states, handler, target in entries:
+                if not _may_match(handler, text):
+                    continue
+                # Первый подходящий обработчик решает за состояние; «любое» — за все оставшиеся
+                for state in states or (ANY_STATE,):
+                    self._targets.setdefault((state, text), target)
+                if states is None or ANY_STATE in states:
+                    break
+        logger.info(f"Button index: {len(self)} buttons from {self.handlers} handlers")
+
+    def find(self, text: str, raw_state: Optional[str]) -> Optional[Target]:
+        """Обработчик кнопки или None — сообщение разбирает aiogram"""
+        key = (raw_state, text)
+        if key not in self._targets:
+            key = (ANY_STATE, text)
+        return self._targets.get(key)
@@ -0,0 +1,96 @@
+import asyncio
+import json
+import logging
+from typing import Any, Dict, Optional
+
+from config.catalog import CHANNEL, DURATION, CatalogSnapshot, catalog
+from config.settings import settings
+from database.crud import (
+    deactivate_catalog_item, get_catalog_items, get_catalog_version, save_catalog_item, seed_catalog,
+)
+from database.session import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+
+class CatalogManager:
+    """Каталог каналов и цен в таблице catalog_items и его снимок в памяти.
+
+    Обработчики читают config.catalog.catalog.snapshot без блокировок.
+    Правка из админ-панели пишет позицию вместе с новой версией каталога и
+    сразу подменяет снимок в своём процессе; остальные воркеры раз в
+    CATALOG_POLL_INTERVAL секунд сверяют версию (один SELECT max) и
+    перечитывают каталог, только если она выросла. Кэши, которые зависят
+    от каталога (клавиатуры), сверяют его версию сами.
+    """
+
+    def __init__(self, interval: float = settings.CATALOG_POLL_INTERVAL):
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+        self.reloads = 0
+
+    async def load(self):
+        """При старте: пустой каталог заполняется из .env, затем читается снимок"""
+        seed = [(CHANNEL, name, json.dumps(data, ensure_ascii=False)) for name, data in settings.CHANNELS.items()]
+        seed += [(DURATION, name, json.dumps(data, ensure_ascii=False)) for name, data in settings.PRICES.items()]
+        async with SessionLocal() as db:
+            await seed_catalog(db, seed)
+            await db.commit()
+        await self.reload()
+
+    async def reload(self) -> CatalogSnapshot:
+        async with SessionLocal() as db:
+            version = await get_catalog_version(db)
+            items = await get_catalog_items(db)
+        channels, prices = {}, {}
+        for kind, name, data in items:
+            (channels if kind == CHANNEL else prices)[name] = json.loads(data)
+        snapshot = CatalogSnapshot(version, channels, prices)
+        if catalog.swap(snapshot):
+            self.reloads += 1
+            logger.info(f"Catalog v{version}: {len(channels)} channels, {len(prices)} durations")
+        return catalog.snapshot
+
+    async def refresh(self):
+        try:
+            async with SessionLocal() as db:
+                version = await get_catalog_version(db)
+            if version > catalog.snapshot.version:
+                await self.reload()
+        except Exception as e:
+            logger.error(f"Catalog refresh failed: {e}")
+
+    async def save(self, kind: str, name: str, data: Dict[str, Any]) -> CatalogSnapshot:
+        async with SessionLocal() as db:
+            version = await save_catalog_item(db, kind, name, json.dumps(data, ensure_ascii=False))
+            await db.commit()
+        logger.info(f"Catalog {kind} {name!r} saved as v{version}")
+        return await self.reload()
+
+    async def remove(self, kind: str, name: str) -> Optional[CatalogSnapshot]:
+        """None — такой позиции в каталоге нет"""
+        async with SessionLocal() as db:
+            version = await deactivate_catalog_item(db, kind, name)
+            await db.commit()
+        if version is None:
+            return None
+        logger.info(f"Catalog {kind} {name!r} removed in v{version}")
+        return await self.reload()
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.refresh()
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+
+catalog_manager = CatalogManager()
@@ -0,0 +1,113 @@
+import logging
+from typing import Iterable, Optional, Set
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramBadRequest, TelegramForbiddenError, TelegramRetryAfter
+from database.crud import get_undeliverable_ids, is_user_deliverable, set_users_deliverable
+from database.session import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+# telegram_id пользователей, которым бот не может писать. Это кэш: отметку мог
+# снять другой воркер, а снятые здесь могли быть поставлены в БД без нас,
+# поэтому отсутствие в нём что-то значит, только если список полный (_complete)
+_undeliverable: Set[int] = set()
+_shared = True      # Несколько воркеров: отметки меняются и в других процессах
+_complete = False   # Список загружен и все изменения идут через этот процесс
+_cleared_while_loading: Optional[Set[int]] = None  # Сняты, пока шла загрузка
+
+# Уведомления, не отправленные недоступным пользователям с момента запуска
+skipped_notifications = 0
+
+
+def set_shared(shared: bool):
+    """Один процесс (polling) может доверять загруженному списку, воркеры — нет"""
+    global _shared, _complete
+    _shared = shared
+    _complete = False
+
+
+async def load_undeliverable():
+    """Загружает недоступных пользователей из БД (при запуске, в фоне — отмеченные
+    за это время не теряются)"""
+    global _complete, _cleared_while_loading
+    _cleared_while_loading = set()
+    try:
+        async with SessionLocal() as db:
+            loaded = await get_undeliverable_ids(db)
+        # Снятые во время загрузки отметки могли попасть в прочитанный список
+        _undeliverable.update(loaded - _cleared_while_loading)
+    finally:
+        _cleared_while_loading = None
+    _complete = not _shared
+    logger.info(f"Loaded {len(_undeliverable)} undeliverable users")
+
+
+async def is_deliverable(telegram_id: int) -> bool:
+    """Отметка из кэша; если список неполный, она сверяется с БД"""
+    if telegram_id not in _undeliverable:
+        return True
+    if _complete:
+        return False
+    async with SessionLocal() as db:
+        deliverable = await is_user_deliverable(db, telegram_id)
+    if deliverable:
+        _undeliverable.discard(telegram_id)
+    return deliverable
+
+
+def is_undeliverable_error(error: Exception) -> bool:
+    """Бот заблокирован, аккаунт удалён или чат не существует"""
+    if isinstance(error, TelegramForbiddenError):
+        return True
+    return isinstance(error, TelegramBadRequest) and "chat not found" in str(error).lower()
+
+
+async def mark_undeliverable(telegram_ids: Iterable[int]):
+    """Отметка пишется в БД всегда: кэш мог устареть после снятия её другим воркером"""
+    telegram_ids = set(telegram_ids)
+    if not telegram_ids:
+        return
+    async with SessionLocal() as db:
+        marked = await set_users_deliverable(db, telegram_ids, False)
+        await db.commit()
+    _undeliverable.update(telegram_ids)
+    if marked:
+        logger.info(f"Marked {marked} users as undeliverable")
+
+
+async def mark_deliverable(telegram_id: int):
+    """Пользователь снова пишет боту — снимаем отметку.
+
+    Без полного списка — условный UPDATE ... WHERE is_deliverable = false:
+    отметку мог поставить другой воркер или она ещё не загружена.
+    """
+    if _complete and telegram_id not in _undeliverable:
+        return
+    async with SessionLocal() as db:
+        cleared = await set_users_deliverable(db, [telegram_id], True)
+        await db.commit()
+    _undeliverable.discard(telegram_id)
+    if _cleared_while_loading is not None:
+        _cleared_while_loading.add(telegram_id)
+    if cleared:
+        logger.info(f"User {telegram_id} is deliverable again")
+
+
+async def notify(bot: Bot, telegram_id: int, text: str) -> bool:
+    """Отправляет уведомление, пропуская недоступных пользователей"""
+    global skipped_notifications
+    if not await is_deliverable(telegram_id):
+        skipped_notifications += 1
+        return False
+
+    try:
+        await bot.send_message(telegram_id, text)
+        return True
+    except TelegramRetryAfter:
+        raise  # Решает вызывающий: ждать или пропустить
+    except Exception as e:
+        if is_undeliverable_error(e):
+            await mark_undeliverable([telegram_id])
+        logger.error(f"Ошибка уведомления: {e}")
+        return False
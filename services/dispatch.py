@@ -0,0 +1,108 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Awaitable, Callable, Deque, Dict, Hashable, Optional, Set, Tuple
+
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+WAIT_SAMPLES = 1000  # Последних ожиданий для перцентилей
+
+Job = Callable[[], Awaitable]
+
+
+class ChatScheduler:
+    """Очереди апдейтов по чатам: внутри чата — по порядку, между чатами — параллельно.
+
+    У каждого чата с апдейтами в очереди есть одна задача-обработчик, поэтому
+    сообщения пользователя и переходы FSM не обгоняют друг друга, а медленный
+    обработчик задерживает только свой чат. Одновременно выполняется не больше
+    concurrency апдейтов. Если принято max_queued апдейтов (ждущих и
+    выполняемых), submit() ждёт освобождения места — это и есть
+    противодавление: polling перестаёт забирать апдейты, webhook медленнее
+    отвечает Telegram.
+    """
+
+    def __init__(self, concurrency: int = settings.DISPATCH_CONCURRENCY,
+                 max_queued: int = settings.DISPATCH_MAX_QUEUED):
+        self.concurrency = concurrency
+        self.max_queued = max_queued
+        self._chats: Dict[Hashable, Deque[Tuple[float, int, Job]]] = {}
+        self._slots = asyncio.Semaphore(concurrency)
+        self._capacity = asyncio.Semaphore(max_queued)
+        self._tasks: Set[asyncio.Task] = set()
+        self._waits: Deque[float] = deque(maxlen=WAIT_SAMPLES)
+        self.queued = 0
+        self.running = 0
+        self.processed = 0
+        self.failed = 0
+        self.peak_queued = 0
+        self.blocked = 0  # Сколько раз submit() ждал места
+
+    def __len__(self) -> int:
+        """Чатов с апдейтами в очереди или в обработке"""
+        return len(self._chats)
+
+    async def submit(self, key: Optional[Hashable], job: Job, update_id: int = 0):
+        """Ставит апдейт в очередь его чата; ждёт, только если очередь заполнена"""
+        if self._capacity.locked():
+            self.blocked += 1
+        await self._capacity.acquire()
+        self.queued += 1
+        self.peak_queued = max(self.peak_queued, self.queued)
+        item = (time.monotonic(), update_id, job)
+
+        if key is None:
+            key = object()  # Апдейт без чата ни с чем не упорядочивается
+        queue = self._chats.get(key)
+        if queue is not None:
+            queue.append(item)
+            return
+        self._chats[key] = deque((item,))
+        task = asyncio.create_task(self._drain(key))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _drain(self, key: Hashable):
+        queue = self._chats[key]
+        while queue:
+            enqueued_at, update_id, job = queue.popleft()
+            async with self._slots:
+                self.queued -= 1
+                self.running += 1
+                self._waits.append(time.monotonic() - enqueued_at)
+                try:
+                    await job()
+                except Exception as e:
+                    # Сюда доходят ошибки, которые не обработали dp.errors (см. ChatSchedulerMiddleware)
+                    self.failed += 1
+                    logger.exception(f"Update {update_id} failed: {e}")
+                finally:
+                    self.running -= 1
+                    self.processed += 1
+                    self._capacity.release()
+        # Между проверкой очереди и удалением нет await — новый апдейт не потеряется
+        del self._chats[key]
+
+    def wait_percentiles(self) -> Tuple[float, float, float]:
+        """p50, p95 и максимум ожидания в очереди (сек) по последним апдейтам"""
+        if not self._waits:
+            return 0.0, 0.0, 0.0
+        waits = sorted(self._waits)
+        return waits[len(waits) // 2], waits[int(len(waits) * 0.95)], waits[-1]
+
+    def report(self) -> str:
+        p50, p95, peak = self.wait_percentiles()
+        return (
+            f"{self.queued} queued, {self.running} running in {len(self)} chats "
+            f"(peak {self.peak_queued}, blocked {self.blocked}); wait p50 {p50 * 1000:.0f} ms, "
+            f"p95 {p95 * 1000:.0f} ms, max {peak * 1000:.0f} ms; {self.processed} processed, {self.failed} failed"
+        )
+
+    async def close(self):
+        """Дожидается уже принятых апдейтов (при остановке бота)"""
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        logger.info(f"Chat scheduler: {self.report()}")
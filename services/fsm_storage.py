@@ -0,0 +1,165 @@
+import asyncio
+import json
+import logging
+from typing import Any, Dict, Optional, Set
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, DefaultKeyBuilder, StateType, StorageKey
+from aiogram.fsm.storage.memory import MemoryStorage
+
+from config.settings import settings
+from database.crud import count_fsm_states, get_fsm_record, save_fsm_records
+from database.session import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+
+class _Record:
+    __slots__ = ("state", "data")
+
+    def __init__(self, state: Optional[str] = None, data: Optional[Dict[str, Any]] = None):
+        self.state = state
+        self.data = data if data is not None else {}
+
+
+class DatabaseStorage(BaseStorage):
+    """FSM в таблице fsm_states с кэшем в памяти и отложенной записью.
+
+    Чтение — из кэша (при промахе одна выборка по ключу). set_state/set_data
+    только меняют кэш; FsmFlushMiddleware в конце апдейта вызывает flush(),
+    и все изменения обработчика уходят в БД одним upsert. Очищенные записи
+    удаляются из таблицы и из кэша.
+
+    При shared=True (несколько воркеров) кэш живёт только до конца апдейта:
+    после flush() записи без несохранённых изменений забываются, и следующий
+    апдейт, в каком бы воркере он ни оказался, читает актуальное состояние.
+    Изменения к тому же сохраняются до любого запроса к Bot API
+    (FsmFlushRequestMiddleware): пользователь не увидит новый экран раньше,
+    чем его состояние станет видно другим воркерам.
+    """
+
+    def __init__(self, cache_size: int = settings.FSM_CACHE_SIZE, shared: bool = False):
+        self.cache_size = cache_size
+        self.shared = shared
+        self.key_builder = DefaultKeyBuilder(with_bot_id=True, with_destiny=True)
+        self._cache: Dict[str, _Record] = {}
+        self._dirty: Set[str] = set()
+        self._writing: Set[str] = set()  # Ключи, запись которых ещё не зафиксирована
+        # flush() по очереди: вызов, пришедший во время записи, возвращается после её commit
+        self._flush_lock = asyncio.Lock()
+        self.reads = 0
+        self.writes = 0
+
+    async def _record(self, key: StorageKey) -> "tuple[str, _Record]":
+        db_key = self.key_builder.build(key)
+        record = self._cache.get(db_key)
+        if record is None:
+            self.reads += 1
+            async with SessionLocal() as db:
+                row = await get_fsm_record(db, db_key)
+            # Пока шла выборка, запись могла появиться в кэше
+            record = self._cache.get(db_key)
+            if record is None:
+                record = _Record(row[0], json.loads(row[1])) if row else _Record()
+                self._cache[db_key] = record
+                self._evict()
+        return db_key, record
+
+    def _evict(self):
+        """Вытесняет самые давние записи без несохранённых изменений"""
+        if len(self._cache) <= self.cache_size:
+            return
+        for db_key in list(self._cache):
+            if len(self._cache) <= self.cache_size:
+                break
+            if db_key not in self._dirty and db_key not in self._writing:
+                del self._cache[db_key]
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        db_key, record = await self._record(key)
+        record.state = state.state if isinstance(state, State) else state
+        self._dirty.add(db_key)
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        return (await self._record(key))[1].state
+
+    async def set_data(self, key: StorageKey, data: Dict[str, Any]) -> None:
+        db_key, record = await self._record(key)
+        record.data = data.copy()
+        self._dirty.add(db_key)
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        return (await self._record(key))[1].data.copy()
+
+    @property
+    def pending(self) -> bool:
+        """Есть изменения, которые ещё не зафиксированы в БД"""
+        return bool(self._dirty or self._writing)
+
+    async def flush(self):
+        """Записывает накопленные изменения одним запросом"""
+        async with self._flush_lock:
+            await self._flush()
+
+    async def _flush(self):
+        if not self._dirty:
+            self._release()
+            return
+        dirty, self._dirty = self._dirty, set()
+        self._writing |= dirty
+        changed, removed = {}, []
+        for db_key in dirty:
+            record = self._cache.get(db_key)
+            if record is None or (record.state is None and not record.data):
+                removed.append(db_key)
+                self._cache.pop(db_key, None)
+            else:
+                changed[db_key] = (record.state, json.dumps(record.data, ensure_ascii=False))
+        try:
+            async with SessionLocal() as db:
+                await save_fsm_records(db, changed, removed)
+                await db.commit()
+            self.writes += 1
+        except Exception as e:
+            self._dirty |= dirty
+            logger.error(f"FSM flush failed ({len(dirty)} keys): {e}")
+        self._writing -= dirty
+        self._release()
+
+    def _release(self):
+        if self.shared:
+            keep = self._dirty | self._writing
+            self._cache = {db_key: record for db_key, record in self._cache.items() if db_key in keep}
+
+    async def close(self) -> None:
+        await self.flush()
+        logger.info(f"FSM storage: {self.reads} reads, {self.writes} writes, {len(self._cache)} cached")
+
+
+async def count_states(storage: BaseStorage) -> Optional[Dict[str, int]]:
+    """Пользователей в каждом состоянии FSM; None — хранилище не умеет считать (redis)"""
+    if isinstance(storage, DatabaseStorage):
+        async with SessionLocal() as db:
+            return await count_fsm_states(db)
+    if isinstance(storage, MemoryStorage):
+        counts: Dict[str, int] = {}
+        for record in storage.storage.values():
+            if record.state is not None:
+                counts[record.state] = counts.get(record.state, 0) + 1
+        return counts
+    return None
+
+
+def create_fsm_storage(backend: str = settings.FSM_STORAGE, shared: bool = False) -> BaseStorage:
+    """FSM-хранилище по настройке FSM_STORAGE; shared — общее для нескольких воркеров"""
+    if backend == "memory":
+        if shared:
+            raise ValueError("FSM_STORAGE=memory cannot be shared between workers")
+        return MemoryStorage()
+    if backend == "redis":
+        # Пакет redis нужен только для этого бэкенда
+        from aiogram.fsm.storage.redis import RedisStorage
+        return RedisStorage.from_url(settings.REDIS_URL, key_builder=DefaultKeyBuilder(with_destiny=True))
+    if backend == "database":
+        return DatabaseStorage(shared=shared)
+    raise ValueError(f"Unknown FSM_STORAGE: {backend}")
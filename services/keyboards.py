@@ -1,46 +1,36 @@
-from aiogram.utils.keyboard import ReplyKeyboardBuilder
-from aiogram import types
-from config.settings import settings
+from aiohttp import FormData
+from aiogram import Bot
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.methods import TelegramMethod
 
-def admin_kb():
-    builder = ReplyKeyboardBuilder()
-    builder.add(
-        types.KeyboardButton(text="📈 Статистика"),
-        types.KeyboardButton(text="📢 Создать рассылку"),
-        types.KeyboardButton(text="✅ Одобрить объявления")
-    )
-    builder.adjust(2)
-    return builder.as_markup(resize_keyboard=True)
+# Клавиатуры живут в одном реестре; здесь — прежние имена для импорта из services
+from config.keyboard_layouts import (
+    admin_kb, generate_channels_kb, generate_durations_kb, get_main_menu, keyboards,
+)
 
-def get_main_menu(is_admin: bool = False):
-    builder = ReplyKeyboardBuilder()
-    builder.row(
-        types.KeyboardButton(text="📢 Разместить рекламу"),
-        types.KeyboardButton(text="📋 Мои объявления")
-    )
-    builder.row(
-        types.KeyboardButton(text="💰 Баланс"),
-        types.KeyboardButton(text="🆘 Помощь")
-    )
-    if is_admin:
-        builder.row(types.KeyboardButton(text="👑 Админ-панель"))
-    return builder.as_markup(resize_keyboard=True)
 
-def generate_channels_kb():
-    builder = ReplyKeyboardBuilder()
-    for channel in settings.CHANNELS:
-        builder.add(types.KeyboardButton(text=channel))
-    builder.add(types.KeyboardButton(text="◀️ Назад"))
-    return builder.as_markup(resize_keyboard=True)
+class KeyboardSession(AiohttpSession):
+    """Сессия Bot API, которая берёт JSON клавиатур реестра из кэша.
 
-def generate_durations_kb():
-    builder = ReplyKeyboardBuilder()
-    for duration in settings.PRICES:
-        builder.add(types.KeyboardButton(text=duration))
-    builder.add(types.KeyboardButton(text="◀️ Назад"))
-    return builder.as_markup(resize_keyboard=True)
-def get_main_kb(user_id: int):
-    builder = ReplyKeyboardBuilder()
-    builder.row(types.KeyboardButton(text="📢 Разместить рекламу"))
-    builder.row(types.KeyboardButton(text="🔙 Назад"))  # Добавили кнопку
-    return builder.as_markup(resize_keyboard=True)
\ No newline at end of file
+    Обычно aiogram на каждый запрос превращает reply_markup в dict и
+    сериализует его заново; для клавиатур из KeyboardRegistry поле
+    подставляется готовой строкой. Остальные поля — как в AiohttpSession.
+    """
+
+    def build_form_data(self, bot: Bot, method: TelegramMethod) -> FormData:
+        markup = getattr(method, "reply_markup", None)
+        cached = keyboards.json(markup) if markup is not None else None
+        if cached is None:
+            return super().build_form_data(bot, method)
+
+        form = FormData(quote_fields=False)
+        files = {}
+        for key, value in method.model_dump(warnings=False, exclude={"reply_markup"}).items():
+            value = self.prepare_value(value, bot=bot, files=files)
+            if not value:
+                continue
+            form.add_field(key, value)
+        form.add_field("reply_markup", cached)
+        for key, value in files.items():
+            form.add_field(key, value.read(bot), filename=value.filename or key)
+        return form
@@ -0,0 +1,92 @@
+import asyncio
+import logging
+import os
+import socket
+from datetime import timedelta
+from typing import Awaitable, Callable, List, Optional
+
+from config.settings import settings
+from database.crud import acquire_leader_lease, release_leader_lease
+from database.session import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+
+class LeaderElection:
+    """Выбор лидера среди процессов бота по аренде в таблице leader_leases.
+
+    Апдейты обрабатывает любой воркер, а одиночные задания (рассылки,
+    установка webhook) — только лидер. Аренда продлевается каждую треть
+    срока; если лидер упал, через lease секунд её забирает другой воркер и
+    запускает задания у себя. Потерявший аренду процесс задания отменяет.
+
+    exclusive — других процессов быть не может (polling под InstanceLock):
+    аренда, оставшаяся от упавшего процесса с другим PID, забирается сразу,
+    а не через lease секунд.
+    """
+
+    def __init__(self, name: str = "bot", lease: float = settings.LEADER_LEASE_SECONDS):
+        self.name = name
+        self.lease = timedelta(seconds=lease)
+        self.holder = f"{socket.gethostname()}:{os.getpid()}"
+        self.is_leader = False
+        self.exclusive = False
+        self._jobs: List[Callable[[], Awaitable]] = []
+        self._running: List[asyncio.Task] = []
+        self._task: Optional[asyncio.Task] = None
+
+    def add_job(self, job: Callable[[], Awaitable]):
+        """Задание, которое выполняется, пока процесс — лидер (отменяется при потере лидерства)"""
+        self._jobs.append(job)
+
+    async def _try_acquire(self) -> bool:
+        try:
+            async with SessionLocal() as db:
+                acquired = await acquire_leader_lease(db, self.name, self.holder, self.lease, take_over=self.exclusive)
+                await db.commit()
+            return acquired
+        except Exception as e:
+            logger.error(f"Leader lease renewal failed: {e}")
+            return False
+
+    async def elect(self):
+        """Одна попытка взять или продлить аренду с запуском/остановкой заданий"""
+        acquired = await self._try_acquire()
+        if acquired and not self.is_leader:
+            self.is_leader = True
+            logger.info(f"{self.holder} became the leader")
+            self._running = [asyncio.create_task(job()) for job in self._jobs]
+        elif not acquired and self.is_leader:
+            logger.warning(f"{self.holder} lost the leadership")
+            await self._stop_jobs()
+
+    async def _stop_jobs(self):
+        self.is_leader = False
+        for task in self._running:
+            task.cancel()
+        await asyncio.gather(*self._running, return_exceptions=True)
+        self._running = []
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.lease.total_seconds() / 3)
+            await self.elect()
+
+    async def start(self):
+        """Первые выборы сразу, чтобы в единственном процессе лидерство было до обработки апдейтов"""
+        await self.elect()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        if self.is_leader:
+            await self._stop_jobs()
+            async with SessionLocal() as db:
+                await release_leader_lease(db, self.name, self.holder)
+                await db.commit()
+
+
+leader = LeaderElection()
@@ -0,0 +1,180 @@
+import atexit
+import gzip
+import json
+import logging
+import logging.handlers
+import multiprocessing
+import os
+import queue
+import shutil
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from config.settings import settings
+
+# Контекст апдейта для записей лога: update_id, chat_id, handler.
+# Заполняется LogContextMiddleware; в потоках вне цикла (aiosqlite) пуст
+log_context: ContextVar[Optional[Dict[str, Any]]] = ContextVar("log_context", default=None)
+
+CONTEXT_FIELDS = ("update_id", "chat_id", "handler")
+TEXT_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+class ContextFilter(logging.Filter):
+    """Переносит контекст апдейта в запись — в потоке, который пишет в лог"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        context = log_context.get()
+        for field in CONTEXT_FIELDS:
+            setattr(record, field, context.get(field) if context else None)
+        return True
+
+
+class DebugSampler(logging.Filter):
+    """Пропускает долю DEBUG-записей болтливых логгеров.
+
+    rates — доля по имени логгера (действует и на дочерние): 0.01 — каждая
+    сотая запись, 0 — ни одной. Отбор детерминированный, по счётчику
+    логгера, поэтому редкие записи не теряются случайно подряд. INFO и
+    выше проходят всегда.
+    """
+
+    def __init__(self, rates: Dict[str, float]):
+        super().__init__()
+        self.rates = rates
+        self.dropped = 0
+        self._resolved: Dict[str, Optional[float]] = {}
+        self._seen: Dict[str, int] = {}
+
+    def _rate(self, name: str) -> Optional[float]:
+        if name not in self._resolved:
+            rate, prefix = None, name
+            while prefix:
+                if prefix in self.rates:
+                    rate = self.rates[prefix]
+                    break
+                prefix = prefix.rpartition(".")[0]
+            self._resolved[name] = rate
+        return self._resolved[name]
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > logging.DEBUG:
+            return True
+        rate = self._rate(record.name)
+        if rate is None or rate >= 1:
+            return True
+        seen = self._seen.get(record.name, 0) + 1
+        self._seen[record.name] = seen
+        if int(seen * rate) != int((seen - 1) * rate):
+            return True
+        self.dropped += 1
+        return False
+
+
+class ContextQueueHandler(logging.handlers.QueueHandler):
+    """Ставит запись в очередь, почти ничего не делая в потоке цикла.
+
+    Стандартный QueueHandler копирует и форматирует запись целиком ещё до
+    очереди; здесь в вызывающем потоке только подставляются аргументы и
+    сериализуется traceback (его кадры дальше могут измениться), а
+    форматирование и запись на диск остаются потоку QueueListener. Запись
+    не копируется: это единственный обработчик корневого логгера.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record.message = record.getMessage()
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        record.msg, record.args, record.exc_info = record.message, None, None
+        return record
+
+
+class JsonFormatter(logging.Formatter):
+    """Одна запись — одна строка JSON; поля контекста — только заполненные"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for field in CONTEXT_FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                entry[field] = value
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+def _gzip_name(name: str) -> str:
+    return name + ".gz"
+
+
+def _gzip_rotate(source: str, dest: str):
+    """Архив прошлого файла сжимается в потоке слушателя, цикл его не ждёт"""
+    with open(source, "rb") as src, gzip.open(dest, "wb") as dst:
+        shutil.copyfileobj(src, dst)
+    os.remove(source)
+
+
+def log_file_path(path: str) -> str:
+    """Воркеры webhook пишут каждый в свой файл: ротация одного файла из
+    нескольких процессов теряет записи"""
+    process = multiprocessing.current_process().name
+    if process == "MainProcess":
+        return path
+    root, ext = os.path.splitext(path)
+    return f"{root}.{process}{ext}"
+
+
+def file_handler(path: str) -> logging.Handler:
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    handler = logging.handlers.RotatingFileHandler(
+        path, maxBytes=settings.LOG_MAX_BYTES, backupCount=settings.LOG_BACKUP_COUNT, encoding="utf-8"
+    )
+    handler.namer = _gzip_name
+    handler.rotator = _gzip_rotate
+    handler.setFormatter(JsonFormatter())
+    return handler
+
+
+def setup_logging() -> DebugSampler:
+    """Корневой логгер пишет в очередь; файл (JSON, ротация) и консоль — в потоке слушателя"""
+    global _listener
+    if _listener is not None:
+        raise RuntimeError("Logging is already set up")
+
+    console = logging.StreamHandler()
+    console.setFormatter(logging.Formatter(TEXT_FORMAT))
+    handlers: List[logging.Handler] = [file_handler(log_file_path(settings.LOG_FILE)), console]
+
+    sampler = DebugSampler(settings.LOG_DEBUG_SAMPLING)
+    queue_handler = ContextQueueHandler(queue.SimpleQueue())
+    queue_handler.addFilter(sampler)
+    queue_handler.addFilter(ContextFilter())
+
+    root = logging.getLogger()
+    root.setLevel(settings.LOG_LEVEL)
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+
+    _listener = logging.handlers.QueueListener(queue_handler.queue, *handlers)
+    _listener.start()
+    atexit.register(stop_logging)
+    return sampler
+
+
+def stop_logging():
+    """Дописывает очередь и останавливает поток слушателя"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
@@ -1,23 +1,261 @@
+import asyncio
+import logging
+import sys
+import time
+from array import array
+from datetime import datetime, timedelta
 from aiogram import Bot
-from typing import Dict, List
+from typing import Dict, List, Optional, Set
+
+from config.settings import settings
+from database.crud import (append_cleaner_messages, count_cleaner_chats, delete_stale_cleaner_chats,
+                           get_cleaner_chats, save_cleaner_chats, take_cleaner_chat)
+from database.session import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+DELETE_BATCH = 100             # Лимит deleteMessages на один вызов
+DELETE_WINDOW = 48 * 3600 - 60  # Telegram не удаляет сообщения старше 48 часов (с запасом)
+
 
 class MessageCleaner:
-    def __init__(self):
-        self.user_messages: Dict[int, List[int]] = {}
-        self.bot_messages: Dict[int, List[int]] = {}
+    """Удаляет служебные сообщения чата пачками через deleteMessages в фоне.
+
+    Сообщения чата хранятся одним array('q') пар (message_id, unix-время
+    добавления) — без объекта int на каждое значение. Состояние ограничено:
+    не больше max_per_chat сообщений на чат, чаты без новых сообщений дольше
+    окна удаления вытесняются. Изменения пишутся в
+    cleaner_chats фоновым flush, поэтому после рестарта меню из прошлой
+    сессии тоже удаляются.
+    """
+
+    def __init__(self, max_per_chat: int = settings.CLEANER_MAX_PER_CHAT,
+                 flush_interval: float = settings.CLEANER_FLUSH_INTERVAL):
+        self.max_per_chat = max_per_chat
+        self.flush_interval = flush_interval
+        # Порядок вставки = порядок последней активности: вытеснение идёт с начала
+        self._chats: Dict[int, array] = {}
+        self._dirty: Set[int] = set()
+        self._tasks: Set[asyncio.Task] = set()
+        self._flusher: Optional[asyncio.Task] = None
+        self.api_calls = 0
+        self.attempted = 0
+        self.deleted = 0
+        self.expired = 0
+
+    def __len__(self) -> int:
+        return len(self._chats)
+
+    @property
+    def calls_saved(self) -> int:
+        """Сколько вызовов deleteMessage не понадобилось благодаря пачкам.
+
+        Считается от отправленных в пачках сообщений, а не от удалённых:
+        неудачная пачка — всё равно один вызов вместо len(chunk).
+        """
+        return self.attempted - self.api_calls
+
+    def memory_usage(self) -> int:
+        """Примерный объём состояния в байтах (без учёта ключей словаря)"""
+        return sys.getsizeof(self._chats) + sum(sys.getsizeof(chat) for chat in self._chats.values())
 
     async def add_message(self, chat_id: int, message_id: int, is_bot: bool = False):
-        target = self.bot_messages if is_bot else self.user_messages
-        if chat_id not in target:
-            target[chat_id] = []
-        target[chat_id].append(message_id)
+        entry = array("q", (message_id, int(time.time())))
+        chat = self._chats.pop(chat_id, None)
+        # Конкатенация даёт массив точного размера, без запаса на рост как у append
+        chat = chat + entry if chat is not None else entry
+        if len(chat) > 2 * self.max_per_chat:
+            # Самые старые удалять уже, скорее всего, поздно
+            del chat[:-2 * self.max_per_chat]
+        self._chats[chat_id] = chat
+        self._dirty.add(chat_id)
 
     async def clean_chat(self, bot: Bot, chat_id: int):
-        for messages in [self.user_messages, self.bot_messages]:
-            if chat_id in messages:
-                for msg_id in messages[chat_id]:
-                    try:
-                        await bot.delete_message(chat_id, msg_id)
-                    except Exception:
-                        pass
-                messages[chat_id] = []
\ No newline at end of file
+        """Забирает сообщения чата и удаляет их в фоне, не задерживая ответ обработчика"""
+        chat = self._chats.pop(chat_id, None)
+        if chat is None:
+            return
+        self._dirty.add(chat_id)
+        self._schedule_delete(bot, chat_id, chat)
+
+    def _schedule_delete(self, bot: Bot, chat_id: int, chat: array):
+        deadline = time.time() - DELETE_WINDOW
+        message_ids = [msg_id for msg_id, added_at in zip(chat[::2], chat[1::2]) if added_at >= deadline]
+        self.expired += len(chat) // 2 - len(message_ids)
+        if not message_ids:
+            return
+
+        task = asyncio.create_task(self._delete(bot, chat_id, message_ids))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _delete(self, bot: Bot, chat_id: int, message_ids: List[int]):
+        for start in range(0, len(message_ids), DELETE_BATCH):
+            chunk = message_ids[start:start + DELETE_BATCH]
+            self.api_calls += 1
+            self.attempted += len(chunk)
+            try:
+                # Уже удалённые сообщения Telegram просто пропускает
+                await bot.delete_messages(chat_id, chunk)
+                self.deleted += len(chunk)
+            except Exception as e:
+                logger.warning(f"Failed to delete {len(chunk)} messages in chat {chat_id}: {e}")
+
+    def evict_idle(self) -> int:
+        """Вытесняет чаты, все сообщения которых уже вышли из окна удаления"""
+        deadline = time.time() - DELETE_WINDOW
+        evicted = []
+        for chat_id, chat in self._chats.items():
+            if chat[-1] >= deadline:
+                break
+            evicted.append(chat_id)
+        for chat_id in evicted:
+            self.expired += len(self._chats.pop(chat_id)) // 2
+        self._dirty.update(evicted)
+        return len(evicted)
+
+    async def load(self):
+        """Восстанавливает состояние из БД (при запуске).
+
+        Загрузка идёт в фоне, пока апдейты уже обрабатываются: восстановленные
+        сообщения ставятся перед записанными за это время, а не затирают их.
+        Затем чаты упорядочиваются по последнему сообщению — на этом порядке
+        держится evict_idle.
+        """
+        since = datetime.utcnow() - timedelta(seconds=DELETE_WINDOW)
+        async with SessionLocal() as db:
+            await delete_stale_cleaner_chats(db, since)
+            rows = await get_cleaner_chats(db, since)
+            await db.commit()
+        for chat_id, messages in rows:
+            restored = array("q", messages)
+            current = self._chats.get(chat_id)
+            if current is not None:
+                restored.extend(current)
+                del restored[:-2 * self.max_per_chat]
+                self._dirty.add(chat_id)
+            self._chats[chat_id] = restored
+        self._chats = dict(sorted(self._chats.items(), key=lambda item: item[1][-1]))
+        logger.info(f"Message cleaner: restored {len(rows)} chats ({self.memory_usage()} bytes)")
+
+    async def flush(self):
+        """Сохраняет изменённые чаты одним upsert и удаляет опустевшие"""
+        if not self._dirty:
+            return
+        dirty, self._dirty = self._dirty, set()
+        changed = {chat_id: self._chats[chat_id].tobytes() for chat_id in dirty if chat_id in self._chats}
+        try:
+            async with SessionLocal() as db:
+                await save_cleaner_chats(db, changed, dirty - changed.keys())
+                await db.commit()
+        except Exception as e:
+            self._dirty |= dirty
+            logger.error(f"Message cleaner flush failed ({len(dirty)} chats): {e}")
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            self.evict_idle()
+            await self.flush()
+
+    def start(self):
+        if self._flusher is None or self._flusher.done():
+            self._flusher = asyncio.create_task(self._run())
+
+    async def close(self):
+        """Дожидается фоновых удалений и сохраняет состояние (при остановке бота)"""
+        if self._flusher:
+            self._flusher.cancel()
+            await asyncio.gather(self._flusher, return_exceptions=True)
+            self._flusher = None
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        await self.flush()
+        logger.info(
+            f"Message cleaner: {self.deleted} deleted in {self.api_calls} calls "
+            f"({self.calls_saved} saved), {self.expired} skipped as too old, "
+            f"{len(self._chats)} chats tracked ({self.memory_usage()} bytes)"
+        )
+
+
+class SharedMessageCleaner(MessageCleaner):
+    """MessageCleaner для нескольких воркеров: состояние только в cleaner_chats.
+
+    Сообщение дописывается в строку чата одним upsert, а очистка забирает
+    строку через DELETE ... RETURNING, поэтому сообщение, отправленное одним
+    воркером, удалит любой другой и ровно один раз. Операции выполняет по
+    порядку фоновый писатель, накопившиеся — одной транзакцией: обработчик
+    не ждёт БД (в SQLite он и не смог бы — его сессия держит блокировку
+    записи до конца апдейта). Лимит max_per_chat применяется при очистке.
+    Число чатов для /metrics — COUNT(*) таблицы, обновляемый при каждом flush.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # (chat_id, запись для добавления или None, bot для очистки или None)
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._writer: Optional[asyncio.Task] = None
+        self._chat_count = 0
+
+    def __len__(self) -> int:
+        return self._chat_count
+
+    async def add_message(self, chat_id: int, message_id: int, is_bot: bool = False):
+        self._queue.put_nowait((chat_id, array("q", (message_id, int(time.time()))).tobytes(), None))
+
+    async def clean_chat(self, bot: Bot, chat_id: int):
+        self._queue.put_nowait((chat_id, None, bot))
+
+    async def _write(self):
+        while True:
+            ops = [await self._queue.get()]
+            while not self._queue.empty():
+                ops.append(self._queue.get_nowait())
+            taken = []
+            try:
+                async with SessionLocal() as db:
+                    for chat_id, entry, bot in ops:
+                        if entry is not None:
+                            await append_cleaner_messages(db, chat_id, entry)
+                        else:
+                            messages = await take_cleaner_chat(db, chat_id)
+                            if messages:
+                                taken.append((bot, chat_id, messages))
+                    await db.commit()
+            except Exception as e:
+                logger.error(f"Message cleaner write failed ({len(ops)} operations): {e}")
+                taken = []
+            for bot, chat_id, messages in taken:
+                self._schedule_delete(bot, chat_id, array("q", messages)[-2 * self.max_per_chat:])
+            for _ in ops:
+                self._queue.task_done()
+
+    def evict_idle(self) -> int:
+        return 0
+
+    async def load(self):
+        pass
+
+    async def flush(self):
+        """Удаляет из таблицы чаты, сообщения которых уже не удалить, и пересчитывает оставшиеся"""
+        before = datetime.utcnow() - timedelta(seconds=DELETE_WINDOW)
+        try:
+            async with SessionLocal() as db:
+                await delete_stale_cleaner_chats(db, before)
+                await db.commit()
+                self._chat_count = await count_cleaner_chats(db)
+        except Exception as e:
+            logger.error(f"Message cleaner sweep failed: {e}")
+
+    def start(self):
+        super().start()
+        if self._writer is None or self._writer.done():
+            self._writer = asyncio.create_task(self._write())
+
+    async def close(self):
+        if self._writer:
+            await self._queue.join()
+            self._writer.cancel()
+            await asyncio.gather(self._writer, return_exceptions=True)
+            self._writer = None
+        await super().close()
@@ -0,0 +1,229 @@
+import inspect
+import logging
+import time
+from bisect import bisect_left
+from functools import wraps
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple, Union
+
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+# Границы корзин гистограмм, сек: от быстрых обработчиков до долгих запросов к API
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+Labels = Tuple[str, ...]
+GaugeValue = Union[float, Dict[Labels, float], None]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Labels, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        self.name, self.help, self.label_names = name, help, tuple(labels)
+        self._values: Dict[Labels, float] = {}
+
+    def inc(self, *labels: str, amount: float = 1):
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels: str) -> float:
+        return self._values.get(labels, 0)
+
+    async def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for labels, value in self._values.items():
+            lines.append(f"{self.name}{_labels(self.label_names, labels)} {_number(value)}")
+        return lines
+
+
+class Histogram:
+    """Гистограмма с фиксированными корзинами.
+
+    Наблюдение — bisect по корзинам и три сложения в списке серии;
+    накопительные суммы считаются только при выдаче /metrics.
+    """
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (), buckets: Sequence[float] = BUCKETS):
+        self.name, self.help, self.label_names = name, help, tuple(labels)
+        self.buckets = tuple(buckets)
+        # labels -> [счётчики корзин..., +Inf, сумма, количество]
+        self._series: Dict[Labels, List[float]] = {}
+
+    def observe(self, value: float, *labels: str):
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [0] * (len(self.buckets) + 3)
+        series[bisect_left(self.buckets, value)] += 1
+        series[-2] += value
+        series[-1] += 1
+
+    def count(self, *labels: str) -> int:
+        series = self._series.get(labels)
+        return int(series[-1]) if series else 0
+
+    async def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        bounds = [_number(bound) for bound in self.buckets] + ["+Inf"]
+        for labels, series in self._series.items():
+            cumulative = 0
+            for bound, count in zip(bounds, series):
+                cumulative += count
+                le = _labels(self.label_names, labels, f'le="{bound}"')
+                lines.append(f"{self.name}_bucket{le} {cumulative}")
+            suffix = _labels(self.label_names, labels)
+            lines.append(f"{self.name}_sum{suffix} {_number(series[-2])}")
+            lines.append(f"{self.name}_count{suffix} {int(series[-1])}")
+        return lines
+
+
+class Gauge:
+    """Значение читается при выдаче /metrics, на горячем пути ничего не делается.
+
+    read возвращает число, словарь {метки: число} или None (метрики сейчас
+    нет); может быть корутиной — например, для подсчёта в БД. Ключ словаря
+    для одной метки может быть строкой.
+    """
+
+    def __init__(self, name: str, help: str, read: Callable[[], Union[GaugeValue, Awaitable[GaugeValue]]],
+                 labels: Sequence[str] = ()):
+        self.name, self.help, self.label_names = name, help, tuple(labels)
+        self.read = read
+
+    async def render(self) -> List[str]:
+        value = self.read()
+        if inspect.isawaitable(value):
+            value = await value
+        if value is None:
+            return []
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge"]
+        values = value if isinstance(value, dict) else {(): value}
+        for labels, number in values.items():
+            if not isinstance(labels, tuple):
+                labels = (labels,)
+            lines.append(f"{self.name}{_labels(self.label_names, labels)} {_number(number)}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, Any] = {}
+
+    def _add(self, metric):
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help: str, labels: Sequence[str] = ()) -> Counter:
+        return self._add(Counter(name, help, labels))
+
+    def histogram(self, name: str, help: str, labels: Sequence[str] = ()) -> Histogram:
+        return self._add(Histogram(name, help, labels))
+
+    def gauge(self, name: str, help: str, read, labels: Sequence[str] = ()) -> Gauge:
+        """Повторная регистрация заменяет функцию чтения (новый диспетчер в том же процессе)"""
+        self._metrics.pop(name, None)
+        return self._add(Gauge(name, help, read, labels))
+
+    async def render(self) -> str:
+        lines: List[str] = []
+        for metric in list(self._metrics.values()):
+            try:
+                lines += await metric.render()
+            except Exception as e:
+                logger.error(f"Metric {metric.name} failed: {e}")
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+handler_seconds = registry.histogram(
+    "bot_handler_seconds", "Handler execution time", ("router", "handler"))
+handler_errors = registry.counter(
+    "bot_handler_errors_total", "Handlers that raised", ("router", "handler"))
+api_seconds = registry.histogram(
+    "bot_api_request_seconds", "Bot API request time", ("method",))
+api_errors = registry.counter(
+    "bot_api_errors_total", "Failed Bot API requests", ("method", "error"))
+api_retry_after = registry.counter(
+    "bot_api_retry_after_total", "Bot API requests answered with 429 Too Many Requests", ("method",))
+db_seconds = registry.histogram(
+    "bot_db_query_seconds", "Time spent in database.crud functions", ("function",))
+
+
+def db_timed(func: Callable[..., Awaitable]) -> Callable[..., Awaitable]:
+    """Время CRUD-функции — в bot_db_query_seconds{function=...}"""
+    name = func.__name__
+
+    @wraps(func)
+    async def timed(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return await func(*args, **kwargs)
+        finally:
+            db_seconds.observe(time.perf_counter() - started, name)
+
+    return timed
+
+
+def metrics_port() -> int:
+    """Воркеры webhook слушают METRICS_PORT + 1 + номер воркера, основной процесс — METRICS_PORT"""
+    import multiprocessing
+    process = multiprocessing.current_process().name
+    if not settings.METRICS_PORT or process == "MainProcess":
+        return settings.METRICS_PORT
+    return settings.METRICS_PORT + 1 + int(process.rpartition("-")[2])
+
+
+class MetricsServer:
+    """Локальный HTTP-сервер с GET /metrics в текстовом формате Prometheus"""
+
+    def __init__(self, host: str = settings.METRICS_HOST, port: Optional[int] = None):
+        self.host = host
+        self.port = port
+        self._runner = None
+
+    async def handle(self, request):
+        from aiohttp import web
+        return web.Response(text=await registry.render(), content_type="text/plain", charset="utf-8",
+                            headers={"X-Content-Type-Options": "nosniff"})
+
+    async def start(self):
+        if self.port is None:
+            self.port = metrics_port()
+        if not self.port or self._runner is not None:
+            return
+        from aiohttp import web
+        app = web.Application()
+        app.router.add_get("/metrics", self.handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        try:
+            await web.TCPSite(self._runner, self.host, self.port).start()
+        except OSError as e:
+            # Занятый порт не должен останавливать бота
+            logger.error(f"Metrics server on {self.host}:{self.port} failed: {e}")
+            await self.stop()
+            return
+        logger.info(f"Metrics on http://{self.host}:{self.port}/metrics")
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+
+metrics_server = MetricsServer()
@@ -0,0 +1,148 @@
+import html
+import logging
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import AbstractSet, Iterable, Optional, Tuple
+
+from aiogram import Bot, types
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.utils.keyboard import InlineKeyboardBuilder
+from config.settings import settings
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database.crud import (
+    ads_status_key, claim_pending_ads, get_counters, has_claimable_ads, set_pending_ads_status,
+)
+from database.models import Ad
+from services.broadcast import notify_many
+
+logger = logging.getLogger(__name__)
+
+PAGE_SIZE = 5
+LEASE = timedelta(seconds=settings.MODERATION_LEASE_SECONDS)
+_EPOCH = datetime(1970, 1, 1)
+
+
+def encode_cursor(ad: Ad) -> str:
+    """Keyset-курсор (created_at, id) для callback_data: «<микросекунды>-<id>»"""
+    return f"{(ad.created_at - _EPOCH) // timedelta(microseconds=1)}-{ad.id}"
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    micros, ad_id = cursor.split("-")
+    return _EPOCH + timedelta(microseconds=int(micros)), int(ad_id)
+
+
+async def render_queue(db: AsyncSession, admin_id: int, cursor: Optional[str] = None, direction: str = "from",
+                       selected: AbstractSet[int] = frozenset()) -> Tuple[str, types.InlineKeyboardMarkup]:
+    """Берёт в аренду и показывает страницу очереди относительно cursor; selected — отмеченные id"""
+    anchor = decode_cursor(cursor) if cursor else None
+    ads = await claim_pending_ads(db, admin_id, PAGE_SIZE, LEASE, anchor, direction)
+    # У начала очереди или страница опустела — показываем первую
+    if anchor and (not ads or (direction == "before" and len(ads) < PAGE_SIZE)):
+        ads = await claim_pending_ads(db, admin_id, PAGE_SIZE, LEASE)
+
+    pending = (await get_counters(db, [ads_status_key("pending")])).get(ads_status_key("pending"), 0)
+    if not ads:
+        return "ℹ️ Нет объявлений для модерации", InlineKeyboardBuilder().as_markup()
+
+    page = encode_cursor(ads[0])
+    lines = [
+        f"⏳ <b>Очередь модерации</b>\nОжидают: {pending}\n"
+        "✅👤 — одобрить все от автора, ✅📢 — все в этот канал\n"
+    ]
+    builder = InlineKeyboardBuilder()
+    for ad in ads:
+        lines.append(
+            f"<b>#{ad.id}</b> · {html.escape(ad.channel)} · {ad.price}₽ · {html.escape(ad.duration or '')} · "
+            f"{ad.created_at:%d.%m %H:%M}\n{html.escape((ad.text or '')[:200])}\n"
+        )
+        builder.row(
+            types.InlineKeyboardButton(text=f"{'☑' if ad.id in selected else '☐'} #{ad.id}",
+                                       callback_data=f"modsel_{ad.id}_{page}"),
+            types.InlineKeyboardButton(text="✅", callback_data=f"approve_{ad.id}_{page}"),
+            types.InlineKeyboardButton(text="❌", callback_data=f"reject_{ad.id}_{page}"),
+            types.InlineKeyboardButton(text="✅👤", callback_data=f"modall_user_{ad.id}_{page}"),
+            types.InlineKeyboardButton(text="✅📢", callback_data=f"modall_chan_{ad.id}_{page}")
+        )
+
+    if selected:
+        builder.row(
+            types.InlineKeyboardButton(text=f"✅ Выбранные ({len(selected)})", callback_data=f"modbulk_approve_{page}"),
+            types.InlineKeyboardButton(text=f"❌ Выбранные ({len(selected)})", callback_data=f"modbulk_reject_{page}"),
+            types.InlineKeyboardButton(text="✖", callback_data=f"modbulk_clear_{page}")
+        )
+
+    nav = []
+    if await has_claimable_ads(db, admin_id, (ads[0].created_at, ads[0].id), "before"):
+        nav.append(types.InlineKeyboardButton(text="◀️", callback_data=f"modq_b_{page}"))
+    nav.append(types.InlineKeyboardButton(text="🔄", callback_data=f"modq_f_{page}"))
+    if await has_claimable_ads(db, admin_id, (ads[-1].created_at, ads[-1].id), "after"):
+        nav.append(types.InlineKeyboardButton(text="▶️", callback_data=f"modq_n_{encode_cursor(ads[-1])}"))
+    builder.row(*nav)
+    return "\n".join(lines), builder.as_markup()
+
+
+async def show_queue(message: types.Message, db: AsyncSession, admin_id: int, cursor: Optional[str] = None,
+                     direction: str = "from", selected: AbstractSet[int] = frozenset()):
+    """Перерисовывает очередь в том же сообщении"""
+    text, markup = await render_queue(db, admin_id, cursor, direction, selected)
+    try:
+        await message.edit_text(text, reply_markup=markup)
+    except TelegramBadRequest as e:
+        if "message is not modified" not in str(e):
+            raise
+
+
+@dataclass
+class ModerationResult:
+    status: str
+    changed: int
+    notified: int
+    db_seconds: float
+    total_seconds: float
+
+    def report(self) -> str:
+        action = "Одобрено" if self.status == "approved" else "Отклонено"
+        return (
+            f"{'✅' if self.status == 'approved' else '❌'} {action} объявлений: <b>{self.changed}</b>\n"
+            f"📨 Уведомлено: {self.notified}\n"
+            f"⏱ {self.total_seconds:.2f} с (БД {self.db_seconds * 1000:.0f} мс)"
+        )
+
+
+def _notification(status: str, ad_id: int, channel: str, duration: str, text: str) -> str:
+    if status == "approved":
+        return (
+            f"✅ Ваше объявление #{ad_id} одобрено!\n"
+            f"Канал: {channel}\n"
+            f"Срок: {duration}\n\n"
+            f"Текст: {(text or '')[:200]}..."
+        )
+    return (
+        f"❌ Ваше объявление #{ad_id} отклонено\n"
+        f"Причина: не соответствует правилам\n\n"
+        f"Текст: {(text or '')[:200]}..."
+    )
+
+
+async def moderate(bot: Bot, db: AsyncSession, admin_id: int, status: str, ids: Iterable[int] = None,
+                   user_id: int = None, channel: str = None) -> ModerationResult:
+    """Меняет статус пачки объявлений одним UPDATE, фиксирует и рассылает уведомления"""
+    started = time.monotonic()
+    rows = await set_pending_ads_status(db, admin_id, status, ids=ids, user_id=user_id, channel=channel)
+    # Уведомляем только о зафиксированном решении
+    await db.commit()
+    db_seconds = time.monotonic() - started
+
+    notified = await notify_many(bot, [
+        (ad_user_id, _notification(status, ad_id, ad_channel, duration, text))
+        for ad_id, ad_user_id, ad_channel, duration, text in rows
+    ])
+    result = ModerationResult(status, len(rows), notified, db_seconds, time.monotonic() - started)
+    logger.info(
+        f"Moderation {status}: {result.changed} ads, {result.notified} notified in {result.total_seconds:.2f}s "
+        f"(db {result.db_seconds * 1000:.0f} ms)"
+    )
+    return result
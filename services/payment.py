@@ -1,6 +1,5 @@
 import logging
 from typing import Optional
-from database.session import get_db
 from database.models import Ad, User
 from sqlalchemy.exc import SQLAlchemyError
 from config.settings import settings
@@ -8,7 +7,6 @@ from config.settings import settings
 logger = logging.getLogger(__name__)
 
 async def process_payment(user_id: int, channel: str, duration: str) -> bool:
-    db = next(get_db())
     try:
         # В реальном проекте здесь должна быть интеграция с платежной системой
         logger.info(f"Processing payment for user {user_id}, channel {channel}, duration {duration}")
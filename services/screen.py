@@ -0,0 +1,121 @@
+import logging
+import zlib
+from typing import Dict, Optional, Tuple
+
+from aiogram import Bot, types
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.fsm.storage.base import BaseStorage, StorageKey
+from config.keyboard_layouts import keyboards
+from services.message_cleaner import MessageCleaner
+
+logger = logging.getLogger(__name__)
+
+MAX_SCREENS = 100_000  # Живых экранов в памяти; самые давние забываются
+
+
+def _digest(text: str) -> int:
+    """Контрольная сумма, одинаковая во всех процессах (в отличие от hash())"""
+    return zlib.crc32(text.encode())
+
+
+class ScreenRenderer:
+    """Один «живой» экран бота на чат, переходы — редактированием.
+
+    Шаг, который вызван нажатием inline-кнопки, редактирует текущий экран
+    (текст или только клавиатуру); если содержимое не изменилось, запрос не
+    отправляется вовсе. Новый экран отправляется, только если прежнего нет,
+    его нельзя отредактировать или пользователь написал сообщение — тогда
+    старый экран уходит в MessageCleaner и удаляется в фоне.
+    """
+
+    def __init__(self, cleaner: MessageCleaner, max_screens: int = MAX_SCREENS):
+        self.cleaner = cleaner
+        self.max_screens = max_screens
+        # chat_id -> (message_id, hash текста, hash клавиатуры)
+        self._screens: Dict[int, Tuple[int, int, int]] = {}
+        self.sent = 0
+        self.edited = 0
+        self.unchanged = 0
+
+    def __len__(self) -> int:
+        return len(self._screens)
+
+    async def dismiss(self, chat_id: int):
+        """Экран больше не нужен (его заменяет меню с reply-клавиатурой): удалит cleaner"""
+        screen = await self._take(chat_id)
+        if screen:
+            await self.cleaner.add_message(chat_id, screen[0])
+
+    async def show(self, bot: Bot, chat_id: int, text: str,
+                   reply_markup: Optional[types.InlineKeyboardMarkup] = None, resend: bool = False):
+        """Показывает экран за один вызов Bot API (или ни одного, если ничего не изменилось)"""
+        text_hash = _digest(text)
+        markup_hash = keyboards.digest(reply_markup) if reply_markup else 0
+        screen = await self._take(chat_id)
+
+        if screen and not resend:
+            message_id, old_text, old_markup = screen
+            if (old_text, old_markup) == (text_hash, markup_hash):
+                self.unchanged += 1
+                await self._remember(chat_id, screen)
+                return
+            try:
+                if old_text == text_hash:
+                    await bot.edit_message_reply_markup(chat_id=chat_id, message_id=message_id,
+                                                        reply_markup=reply_markup)
+                else:
+                    await bot.edit_message_text(text, chat_id=chat_id, message_id=message_id,
+                                                reply_markup=reply_markup)
+                self.edited += 1
+                await self._remember(chat_id, (message_id, text_hash, markup_hash))
+                return
+            except TelegramBadRequest as e:
+                if "message is not modified" in str(e):
+                    await self._remember(chat_id, (message_id, text_hash, markup_hash))
+                    return
+                # Сообщение удалено или слишком старое — отправляем новое
+                logger.debug(f"Screen {message_id} in chat {chat_id} is not editable: {e}")
+
+        if screen:
+            await self.cleaner.add_message(chat_id, screen[0])
+        await self.cleaner.clean_chat(bot, chat_id)
+        msg = await bot.send_message(chat_id, text, reply_markup=reply_markup)
+        self.sent += 1
+        await self._remember(chat_id, (msg.message_id, text_hash, markup_hash))
+
+    async def _take(self, chat_id: int) -> Optional[Tuple[int, int, int]]:
+        return self._screens.pop(chat_id, None)
+
+    async def _remember(self, chat_id: int, screen: Tuple[int, int, int]):
+        self._screens[chat_id] = screen
+        if len(self._screens) > self.max_screens:
+            del self._screens[next(iter(self._screens))]
+
+
+class SharedScreenRenderer(ScreenRenderer):
+    """ScreenRenderer для нескольких воркеров: экран чата хранится в FSM-хранилище.
+
+    Запись лежит под отдельным destiny, поэтому не пересекается с состоянием
+    пользователя, а с DatabaseStorage уходит в БД тем же upsert в конце апдейта.
+    """
+
+    def __init__(self, cleaner: MessageCleaner, storage: BaseStorage, bot_id: int):
+        super().__init__(cleaner)
+        self.storage = storage
+        self.bot_id = bot_id
+
+    def __len__(self) -> int:
+        return 0
+
+    def _key(self, chat_id: int) -> StorageKey:
+        return StorageKey(bot_id=self.bot_id, chat_id=chat_id, user_id=chat_id, destiny="screen")
+
+    async def _take(self, chat_id: int) -> Optional[Tuple[int, int, int]]:
+        key = self._key(chat_id)
+        screen = (await self.storage.get_data(key)).get("screen")
+        if screen:
+            await self.storage.set_data(key, {})
+        return tuple(screen) if screen else None
+
+    async def _remember(self, chat_id: int, screen: Tuple[int, int, int]):
+        await self.storage.set_data(self._key(chat_id), {"screen": list(screen)})
@@ -0,0 +1,92 @@
+import asyncio
+import logging
+import os
+import socket
+import time
+from typing import Awaitable, Callable, List, Optional, Tuple
+
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+
+def _sd_notify(state: str):
+    """Сообщение systemd (Type=notify); без NOTIFY_SOCKET ничего не делает"""
+    address = os.environ.get("NOTIFY_SOCKET")
+    if not address:
+        return
+    if address.startswith("@"):
+        address = "\0" + address[1:]  # Абстрактный сокет
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM) as sock:
+            sock.sendto(state.encode(), address)
+    except OSError as e:
+        logger.warning(f"sd_notify failed: {e}")
+
+
+class Startup:
+    """Замер фаз запуска и сигнал готовности процесса.
+
+    Фазы отмечаются подряд: каждая длится от конца предыдущей, первая —
+    от started (до импортов bot.py). Готовность — момент, когда процесс
+    начинает принимать апдейты: пишется READY_FILE, systemd получает
+    READY=1, в webhook-режиме /healthz начинает отвечать 200. Прогрев
+    необязательных подсистем (warm_up) выполняется уже после этого.
+    """
+
+    def __init__(self, started: Optional[float] = None):
+        self.started = started if started is not None else time.perf_counter()
+        self.phases: List[Tuple[str, float]] = []
+        self.ready = False
+        self._last = self.started
+        self._warmups: List[asyncio.Task] = []
+
+    def mark(self, name: str):
+        """Конец фазы name"""
+        now = time.perf_counter()
+        self.phases.append((name, now - self._last))
+        self._last = now
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    def report(self) -> str:
+        phases = ", ".join(f"{name} {duration * 1000:.0f} ms" for name, duration in self.phases)
+        return f"{phases}; total {self.elapsed() * 1000:.0f} ms"
+
+    def set_ready(self):
+        self.ready = True
+        if settings.READY_FILE:
+            with open(settings.READY_FILE, "w") as ready_file:
+                ready_file.write(str(os.getpid()))
+        _sd_notify("READY=1")
+        logger.info(f"Ready to serve updates: {self.report()}")
+
+    def set_stopping(self):
+        self.ready = False
+        _sd_notify("STOPPING=1")
+        if settings.READY_FILE:
+            try:
+                os.remove(settings.READY_FILE)
+            except FileNotFoundError:
+                pass
+
+    def warm_up(self, name: str, job: Callable[[], Awaitable]):
+        """Необязательная загрузка в фоне: апдейты обрабатываются, пока она идёт"""
+        async def run():
+            started = time.perf_counter()
+            try:
+                await job()
+            except Exception as e:
+                logger.error(f"Warm-up {name} failed: {e}")
+                return
+            logger.info(f"Warm-up {name}: {(time.perf_counter() - started) * 1000:.0f} ms")
+
+        self._warmups.append(asyncio.create_task(run()))
+
+    async def stop(self):
+        self.set_stopping()
+        for task in self._warmups:
+            task.cancel()
+        await asyncio.gather(*self._warmups, return_exceptions=True)
+        self._warmups = []
@@ -0,0 +1,120 @@
+import asyncio
+import logging
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Dict, Tuple
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database.crud import (
+    ADS_TOTAL, STATS_RECONCILED, USERS_NEW_PREFIX, USERS_TOTAL, ads_status_key, delete_counters_before,
+    get_all_counters, get_counters, replace_counters, users_new_key,
+)
+from database.models import Ad, User
+from database.session import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+AD_STATUSES = ("pending", "approved", "rejected")
+NEW_USERS_HOURS = 24  # Окно «новых за сутки», с точностью до часа
+PRUNE_INTERVAL = 3600  # Как часто лидер удаляет часовые корзины старше окна
+
+
+def _new_user_keys(now: datetime):
+    return [users_new_key(now - timedelta(hours=h)) for h in range(NEW_USERS_HOURS)]
+
+
+def _window_start(now: datetime) -> datetime:
+    """Начало самой старой часовой корзины окна"""
+    return (now - timedelta(hours=NEW_USERS_HOURS - 1)).replace(minute=0, second=0, microsecond=0)
+
+
+def _expired(key: str, oldest: str) -> bool:
+    return key.startswith(USERS_NEW_PREFIX) and key < oldest
+
+
+async def read_stats(db: AsyncSession) -> Dict[str, int]:
+    """Статистика из stats_counters одним запросом по первичному ключу"""
+    new_keys = _new_user_keys(datetime.utcnow())
+    status_keys = {status: ads_status_key(status) for status in AD_STATUSES}
+    counters = await get_counters(db, [USERS_TOTAL, ADS_TOTAL, *status_keys.values(), *new_keys])
+    stats = {
+        "total_users": counters.get(USERS_TOTAL, 0),
+        "total_ads": counters.get(ADS_TOTAL, 0),
+        "new_users": sum(counters.get(key, 0) for key in new_keys),
+    }
+    for status, key in status_keys.items():
+        stats[f"{status}_ads"] = counters.get(key, 0)
+    return stats
+
+
+async def compute_counters(db: AsyncSession, now: datetime) -> Dict[str, int]:
+    """Полный пересчёт счётчиков по таблицам users и ads; корзины регистраций — только в окне"""
+    counters = {
+        USERS_TOTAL: await db.scalar(select(func.count(User.id))),
+        ADS_TOTAL: await db.scalar(select(func.count(Ad.id))),
+    }
+    for status, count in (await db.execute(select(Ad.status, func.count(Ad.id)).group_by(Ad.status))).all():
+        counters[ads_status_key(status)] = count
+
+    # Корзины по часам считаем в Python: группировка по часу в SQL зависит от диалекта
+    buckets = Counter()
+    recent = select(User.created_at).where(User.created_at >= _window_start(now))
+    async for created_at in await db.stream_scalars(recent):
+        buckets[users_new_key(created_at)] += 1
+    counters.update(buckets)
+    return counters
+
+
+async def reconcile_stats(db: AsyncSession) -> Dict[str, Tuple[int, int]]:
+    """Пересчитывает счётчики с нуля и перезаписывает таблицу; возвращает расхождения {ключ: (было, стало)}.
+
+    Корзины регистраций старше окна при этом удаляются и расхождением не считаются.
+    """
+    now = datetime.utcnow()
+    oldest = users_new_key(_window_start(now))
+    stored = {key: value for key, value in (await get_all_counters(db)).items()
+              if key != STATS_RECONCILED and not _expired(key, oldest)}
+    actual = await compute_counters(db, now)
+    diff = {
+        key: (stored.get(key, 0), actual.get(key, 0))
+        for key in stored.keys() | actual.keys()
+        if stored.get(key, 0) != actual.get(key, 0)
+    }
+    await replace_counters(db, {**actual, STATS_RECONCILED: int(time.time())})
+    if diff:
+        logger.warning(f"Stats counters reconciled, {len(diff)} keys differed: {diff}")
+    return diff
+
+
+async def prune_stats(db: AsyncSession) -> int:
+    """Удаляет часовые корзины регистраций, вышедшие из окна отчёта"""
+    return await delete_counters_before(db, USERS_NEW_PREFIX, users_new_key(_window_start(datetime.utcnow())))
+
+
+async def ensure_stats(db: AsyncSession):
+    """Заполняет stats_counters по существующим данным, если сверки ещё не было.
+
+    Признак — ключ STATS_RECONCILED, а не USERS_TOTAL: счётчики мог создать
+    первый апдейт или другой воркер до того, как лидер дошёл до сверки.
+    """
+    if not await get_counters(db, [STATS_RECONCILED]):
+        await reconcile_stats(db)
+        logger.info("Stats counters initialised from existing data")
+    await prune_stats(db)
+
+
+async def run_stats_maintenance():
+    """Задание лидера: раз в PRUNE_INTERVAL удаляет устаревшие корзины регистраций"""
+    while True:
+        await asyncio.sleep(PRUNE_INTERVAL)
+        try:
+            async with SessionLocal() as db:
+                removed = await prune_stats(db)
+                await db.commit()
+            if removed:
+                logger.info(f"Stats: pruned {removed} hourly counters")
+        except Exception as e:
+            logger.error(f"Stats pruning failed: {e}")
@@ -0,0 +1,74 @@
+import logging
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from aiogram import types
+from sqlalchemy.ext.asyncio import AsyncSession
+from config.settings import settings
+from database.crud import upsert_user
+
+logger = logging.getLogger(__name__)
+
+STATS_LOG_EVERY = 10_000  # Писать hit/miss в лог каждые N обращений
+
+
+class UserRegistry:
+    """LRU-кэш известных пользователей telegram_id -> User.id.
+
+    Для известных пользователей регистрация не обращается к БД; новые
+    добавляются одним INSERT ... ON CONFLICT DO NOTHING.
+    """
+
+    def __init__(self, max_size: int = settings.USER_CACHE_SIZE):
+        self.max_size = max_size
+        self._cache: "OrderedDict[int, int]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.created = 0
+
+    def __len__(self) -> int:
+        return len(self._cache)
+
+    @property
+    def hit_ratio(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def get(self, telegram_id: int) -> Optional[int]:
+        user_id = self._cache.get(telegram_id)
+        if user_id is not None:
+            self._cache.move_to_end(telegram_id)
+        return user_id
+
+    def remember(self, telegram_id: int, user_id: int):
+        self._cache[telegram_id] = user_id
+        self._cache.move_to_end(telegram_id)
+        if len(self._cache) > self.max_size:
+            self._cache.popitem(last=False)
+
+    async def resolve(self, db: AsyncSession, user: types.User) -> Tuple[int, bool]:
+        """(User.id, создан ли сейчас); в кэш попадает после фиксации регистрации (remember)"""
+        user_id = self.get(user.id)
+        if user_id is not None:
+            self._count(hit=True)
+            return user_id, False
+
+        self._count(hit=False)
+        user_id, created = await upsert_user(db, user.id, user.username, user.full_name)
+        if created:
+            self.created += 1
+        return user_id, created
+
+    def _count(self, hit: bool):
+        if hit:
+            self.hits += 1
+        else:
+            self.misses += 1
+        if (self.hits + self.misses) % STATS_LOG_EVERY == 0:
+            logger.info(
+                f"User registry: {len(self._cache)} cached, hit ratio {self.hit_ratio:.1%} "
+                f"({self.hits} hits, {self.misses} misses, {self.created} created)"
+            )
+
+
+user_registry = UserRegistry()
@@ -1,6 +1,7 @@
+import asyncio
 from config.settings import settings
 from database.session import init_db
 
 print("DATABASE_URL:", settings.DATABASE_URL)
-init_db()
+asyncio.run(init_db())
 print("Database initialized successfully!")
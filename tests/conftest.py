@@ -0,0 +1,12 @@
+import os
+import sys
+import tempfile
+
+# Настройки читаются при импорте config.settings: тесты работают с отдельной
+# временной БД и без сервера метрик, .env разработчика им не нужен
+_db_dir = tempfile.mkdtemp()
+os.environ.setdefault("BOT_TOKEN", "123456:TEST-token")
+os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{_db_dir}/test.db"
+os.environ["METRICS_PORT"] = "0"
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,101 @@
+import asyncio
+
+from sqlalchemy import delete
+
+from database.crud import get_broadcast_recipients
+from database.models import BroadcastJob, User
+from database.session import SessionLocal, engine, init_db
+from services import broadcast
+from services.broadcast import Broadcast, TokenBucket
+
+
+class RecordingBot:
+    """copy_message только записывает получателя; Bot API не нужен"""
+
+    def __init__(self):
+        self.sent = []
+
+    async def copy_message(self, chat_id, from_chat_id, message_id):
+        await asyncio.sleep(0.001)
+        self.sent.append(chat_id)
+
+
+async def reset_users(count: int):
+    await init_db()
+    async with SessionLocal() as db:
+        await db.execute(delete(User))
+        await db.execute(delete(BroadcastJob))
+        db.add_all(User(id=user_id, telegram_id=1000 + user_id) for user_id in range(1, count + 1))
+        job = BroadcastJob(admin_id=1, from_chat_id=1, message_id=1, total=count)
+        db.add(job)
+        await db.commit()
+        return job.id
+
+
+async def load_job(job_id: int) -> BroadcastJob:
+    async with SessionLocal() as db:
+        return await db.get(BroadcastJob, job_id)
+
+
+def test_recipient_pages_cover_every_deliverable_user_once():
+    async def scenario():
+        await init_db()
+        async with SessionLocal() as db:
+            await db.execute(delete(User))
+            db.add_all(User(id=user_id, telegram_id=1000 + user_id, is_deliverable=user_id % 5 != 0)
+                       for user_id in range(1, 24))
+            await db.commit()
+
+        pages, after_id = [], 0
+        async with SessionLocal() as db:
+            while page := await get_broadcast_recipients(db, after_id, 4):
+                pages.append(page)
+                after_id = page[-1][0]  # Курсор, который сохраняет рассылка
+            # Возобновление с сохранённого курсора продолжает со следующего
+            resumed = await get_broadcast_recipients(db, pages[1][-1][0], 2)
+        await engine.dispose()
+        return pages, resumed
+
+    pages, resumed = asyncio.run(scenario())
+    recipients = [recipient for page in pages for recipient in page]
+    expected = [user_id for user_id in range(1, 24) if user_id % 5]
+    assert [user_id for user_id, _ in recipients] == expected
+    assert all(telegram_id == 1000 + user_id for user_id, telegram_id in recipients)
+    assert [len(page) for page in pages] == [4, 4, 4, 4, 3]
+    assert resumed == pages[2][:2]
+
+
+def test_failed_page_fetch_stops_all_senders_and_saves_checkpoint(monkeypatch):
+    monkeypatch.setattr(broadcast, "PAGE_SIZE", 10)
+
+    async def scenario():
+        job_id = await reset_users(35)
+        bot = RecordingBot()
+        crashing = Broadcast(bot, await load_job(job_id), limiter=TokenBucket(10_000), workers=4)
+        fetch_page = crashing._fetch_page
+
+        async def flaky_fetch(after_id):
+            if after_id >= 10:
+                raise RuntimeError("database is locked")
+            return await fetch_page(after_id)
+
+        crashing._fetch_page = flaky_fetch
+        try:
+            await crashing.run()
+        except RuntimeError as e:
+            error = str(e)
+        sent_at_crash = list(bot.sent)
+        await asyncio.sleep(0.05)  # Оставшиеся отправители больше ничего не шлют
+        job = await load_job(job_id)
+        # Лидер продолжает задачу со статусом running с сохранённой точки
+        await Broadcast(bot, job, limiter=TokenBucket(10_000), workers=4).run()
+        finished = await load_job(job_id)
+        await engine.dispose()
+        return error, sent_at_crash, job, bot.sent, finished
+
+    error, sent_at_crash, job, sent, finished = asyncio.run(scenario())
+    assert error == "database is locked"
+    assert sorted(sent_at_crash) == [1000 + user_id for user_id in range(1, 11)]
+    assert (job.status, job.cursor, job.delivered) == ("running", 10, 10)
+    assert sorted(sent) == [1000 + user_id for user_id in range(1, 36)]  # Без дублей
+    assert (finished.status, finished.delivered) == ("done", 35)
@@ -0,0 +1,145 @@
+import asyncio
+import itertools
+
+import aiogram
+from aiogram import Bot, Dispatcher, Router
+from aiogram.filters import CommandStart, StateFilter
+from aiogram.fsm.state import State, StatesGroup
+from aiogram.types import Update
+
+from middlewares.button_router import ButtonRouterMiddleware
+from services.buttons import Button
+
+TOKEN = "123456:TEST-token"
+MENU, HELP, BACK = "📢 Разместить рекламу", "🆘 Помощь", "◀️ На главную"
+
+
+class Form(StatesGroup):
+    select_duration = State()
+    enter_text = State()
+
+
+def message(update_id: int, text: str) -> Update:
+    return Update.model_validate({"update_id": update_id, "message": {
+        "message_id": update_id, "date": 0, "text": text,
+        "chat": {"id": 1, "type": "private"},
+        "from": {"id": 1, "is_bot": False, "first_name": "u"},
+    }})
+
+
+def build(calls, indexed: bool):
+    """Порядок как в bot.py: кнопка, ловушки состояний, снова кнопки, вложенный роутер"""
+    dp = Dispatcher()
+    if indexed:
+        dp["buttons"] = buttons = ButtonRouterMiddleware(dp)
+        dp.message.outer_middleware(buttons)
+
+    def handler(name):
+        async def record(msg):
+            calls.append(name)
+        return record
+
+    dp.message.register(handler("start"), CommandStart())
+    dp.message.register(handler("advert"), Button(MENU))
+    dp.message.register(handler("repeat_durations"), Form.select_duration)
+    dp.message.register(handler("enter_text"), Form.enter_text)
+    dp.message.register(handler("menu"), Button(HELP))
+
+    admin = Router()
+    admin.message.register(handler("admin_back_in_state"), StateFilter(Form), Button(BACK))
+    admin.message.register(handler("admin_back"), Button(BACK))
+    admin.message.register(handler("admin_help_in_state"), Form.select_duration, Button(HELP))
+    dp.include_router(admin)
+    return dp
+
+
+async def dispatch(indexed: bool, state, text: str):
+    calls = []
+    dp = build(calls, indexed)
+    bot = Bot(TOKEN)
+    await dp.fsm.get_context(bot, chat_id=1, user_id=1).set_state(state)
+    await dp.feed_update(bot, message(1, text))
+    await bot.session.close()
+    return calls
+
+
+def test_index_picks_the_same_handler_as_aiogram():
+    states = (None, Form.select_duration, Form.enter_text, "other")
+    texts = (MENU, HELP, BACK, "/start", "free text")
+
+    async def scenario():
+        return [(state, text, await dispatch(False, state, text), await dispatch(True, state, text))
+                for state, text in itertools.product(states, texts)]
+
+    for state, text, expected, got in asyncio.run(scenario()):
+        assert got == expected, (state, text)
+
+
+def test_catch_all_state_handler_registered_earlier_wins():
+    calls = []
+    dp = build(calls, indexed=True)
+    index = dp["buttons"].index
+    index.build(dp)
+    # В состоянии ввода текста кнопку меню разбирает enter_text, как и при переборе
+    assert index.find(HELP, Form.enter_text.state) is None
+    assert index.find(HELP, Form.select_duration.state) is None
+    assert index.find(HELP, None)[1].callback is dp.message.handlers[4].callback
+    # Кнопка без состояния зарегистрирована раньше ловушек и побеждает их
+    assert index.find(MENU, Form.enter_text.state)[1].callback is dp.message.handlers[1].callback
+
+
+def test_state_key_does_not_override_earlier_any_state_handler():
+    async def scenario():
+        calls = []
+        dp = Dispatcher()
+        dp.message.outer_middleware(ButtonRouterMiddleware(dp))
+
+        async def anywhere(msg):
+            calls.append("anywhere")
+
+        async def in_state(msg):
+            calls.append("in_state")
+
+        dp.message.register(anywhere, Button(BACK))
+        dp.message.register(in_state, Form.enter_text, Button(BACK))
+        bot = Bot(TOKEN)
+        await dp.fsm.get_context(bot, chat_id=1, user_id=1).set_state(Form.enter_text)
+        await dp.feed_update(bot, message(1, BACK))
+        await bot.session.close()
+        return calls
+
+    assert asyncio.run(scenario()) == ["anywhere"]
+
+
+def test_inner_middlewares_resolved_like_aiogram():
+    # ButtonRouterMiddleware вызывает приватный _resolve_middlewares(), как trigger() в aiogram 3.13.1
+    assert aiogram.__version__ == "3.13.1"
+
+    async def scenario():
+        calls = []
+        dp = Dispatcher()
+        dp.message.outer_middleware(ButtonRouterMiddleware(dp))
+        child = Router()
+        dp.include_router(child)
+
+        def middleware(name):
+            async def record(handler, event, data):
+                calls.append(name)
+                return await handler(event, data)
+            return record
+
+        root_mw, child_mw = middleware("root"), middleware("child")
+        dp.message.middleware(root_mw)
+        child.message.middleware(child_mw)
+        assert child.message._resolve_middlewares() == [root_mw, child_mw]
+
+        async def pressed(msg):
+            calls.append("handler")
+
+        child.message.register(pressed, Button(BACK))
+        bot = Bot(TOKEN)
+        await dp.feed_update(bot, message(1, BACK))
+        await bot.session.close()
+        return calls
+
+    assert asyncio.run(scenario()) == ["root", "child", "handler"]
@@ -0,0 +1,50 @@
+import asyncio
+
+from sqlalchemy import delete
+
+from config.catalog import CatalogSnapshot
+from config.keyboard_layouts import choice_callback, parse_choice
+from database.crud import deactivate_catalog_item, get_catalog_version, save_catalog_item, seed_catalog
+from database.models import CatalogItem, CatalogVersion
+from database.session import SessionLocal, engine, init_db
+
+SNAPSHOT = CatalogSnapshot(3, {"A": {}, "B": {}}, {"1 день": {"price": 1000}})
+
+
+def test_parse_choice_accepts_only_current_version():
+    assert parse_choice(choice_callback("ad_ch", 3, 1), SNAPSHOT) == 1
+    assert parse_choice(choice_callback("ad_dur", 3, 0), SNAPSHOT) == 0
+    assert parse_choice(choice_callback("ad_ch", 2, 1), SNAPSHOT) is None  # Кнопка до правки каталога
+    assert parse_choice("ad_ch_1", SNAPSHOT) is None  # Старый формат без версии
+    assert parse_choice("ad_ch_3_x", SNAPSHOT) is None
+    assert parse_choice("ad_ch_3_-1", SNAPSHOT) is None
+
+
+def test_catalog_versions_are_unique_and_continue_existing_numbering():
+    async def scenario():
+        await init_db()
+        async with SessionLocal() as db:
+            await db.execute(delete(CatalogItem))
+            await db.execute(delete(CatalogVersion))
+            await seed_catalog(db, [("channel", "A", "{}"), ("duration", "1 день", "{}")])
+            await db.commit()
+
+        async def edit(name):
+            async with SessionLocal() as db:
+                version = await save_catalog_item(db, "channel", name, "{}")
+                await db.commit()
+                return version
+
+        versions = list(await asyncio.gather(*(edit(f"C{i}") for i in range(5))))
+        async with SessionLocal() as db:
+            versions.append(await deactivate_catalog_item(db, "channel", "A"))
+            missing = await deactivate_catalog_item(db, "channel", "нет такого")
+            await db.commit()
+            current = await get_catalog_version(db)
+        await engine.dispose()
+        return versions, missing, current
+
+    versions, missing, current = asyncio.run(scenario())
+    assert sorted(versions[:5]) == [2, 3, 4, 5, 6]  # После версии 1 из seed
+    assert versions[5] == 7 and missing is None
+    assert current == 7
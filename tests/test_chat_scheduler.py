@@ -0,0 +1,108 @@
+import asyncio
+
+from aiogram import Bot, Dispatcher, F
+from aiogram.filters import StateFilter
+from aiogram.fsm.context import FSMContext
+from aiogram.fsm.state import State, StatesGroup
+from aiogram.types import ErrorEvent, Update
+
+from middlewares.chat_scheduler import ChatSchedulerMiddleware
+from services.dispatch import ChatScheduler
+
+TOKEN = "123456:TEST-token"
+
+
+class Form(StatesGroup):
+    step = State()
+
+
+def message(update_id: int, text: str, chat_id: int = 1) -> Update:
+    return Update.model_validate({"update_id": update_id, "message": {
+        "message_id": update_id, "date": 0, "text": text,
+        "chat": {"id": chat_id, "type": "private"},
+        "from": {"id": chat_id, "is_bot": False, "first_name": "u"},
+    }})
+
+
+def build(calls):
+    dp = Dispatcher()
+    scheduler = ChatScheduler(concurrency=4, max_queued=10)
+    dp.update.outer_middleware(ChatSchedulerMiddleware(scheduler, dp))
+
+    @dp.message(F.text == "a")
+    async def first(msg, state: FSMContext):
+        await asyncio.sleep(0.01)  # Второй апдейт успевает встать в очередь
+        await state.set_state(Form.step)
+        calls.append("a")
+
+    @dp.message(Form.step)
+    async def in_state(msg, raw_state):
+        calls.append(f"step {msg.text}")
+
+    @dp.message(F.text == "boom")
+    async def boom(msg):
+        raise ValueError("boom")
+
+    @dp.message(StateFilter(None))
+    async def fallback(msg, raw_state):
+        calls.append(f"fallback raw_state={raw_state}")
+
+    @dp.error()
+    async def on_error(event: ErrorEvent):
+        calls.append(f"error {event.exception}")
+        return True
+
+    return dp, scheduler
+
+
+def test_second_update_sees_state_set_by_first():
+    async def run():
+        calls = []
+        dp, scheduler = build(calls)
+        bot = Bot(TOKEN)
+        await dp.feed_update(bot, message(1, "a"))
+        await dp.feed_update(bot, message(2, "b"))  # Встал в очередь до того, как первый сменил состояние
+        await scheduler.close()
+        await bot.session.close()
+        return calls
+
+    assert asyncio.run(run()) == ["a", "step b"]
+
+
+def test_handler_errors_reach_dispatcher_error_handlers():
+    async def run():
+        calls = []
+        dp, scheduler = build(calls)
+        bot = Bot(TOKEN)
+        await dp.feed_update(bot, message(1, "boom"))
+        await dp.feed_update(bot, message(2, "x"))
+        await scheduler.close()
+        await bot.session.close()
+        return calls, scheduler.failed
+
+    calls, failed = asyncio.run(run())
+    assert calls == ["error boom", "fallback raw_state=None"]
+    assert failed == 0
+
+
+def test_chats_are_ordered_inside_and_parallel_between():
+    async def run():
+        scheduler = ChatScheduler(concurrency=4, max_queued=10)
+        events = []
+
+        def job(name, delay):
+            async def run_job():
+                events.append(f"start {name}")
+                await asyncio.sleep(delay)
+                events.append(f"end {name}")
+            return run_job
+
+        await scheduler.submit(1, job("1a", 0.02))
+        await scheduler.submit(1, job("1b", 0))
+        await scheduler.submit(2, job("2a", 0))
+        await scheduler.close()
+        return events
+
+    events = asyncio.run(run())
+    assert events.index("end 1a") < events.index("start 1b")
+    assert events.index("end 2a") < events.index("end 1a")
@@ -0,0 +1,10 @@
+import inspect
+
+from database import crud
+
+
+def test_every_crud_coroutine_is_timed():
+    untimed = [name for name, function in vars(crud).items()
+               if inspect.iscoroutinefunction(function) and not name.startswith("_")
+               and getattr(function, "__module__", None) == crud.__name__ and not hasattr(function, "__wrapped__")]
+    assert untimed == [], "CRUD-функции без @db_timed"
@@ -0,0 +1,63 @@
+import asyncio
+
+from sqlalchemy import delete, select
+
+from database.crud import set_users_deliverable
+from database.models import User
+from database.session import SessionLocal, engine, init_db
+from services import deliverability
+
+
+async def reset(shared: bool):
+    await init_db()
+    async with SessionLocal() as db:
+        await db.execute(delete(User))
+        db.add_all(User(telegram_id=telegram_id) for telegram_id in (100, 200))
+        await db.commit()
+    deliverability.set_shared(shared)
+    deliverability._undeliverable.clear()
+
+
+async def stored(telegram_id: int) -> bool:
+    async with SessionLocal() as db:
+        return await db.scalar(select(User.is_deliverable).where(User.telegram_id == telegram_id))
+
+
+async def mark_elsewhere(telegram_id: int, deliverable: bool):
+    """Отметку меняет другой воркер — кэш этого процесса о ней не знает"""
+    async with SessionLocal() as db:
+        await set_users_deliverable(db, [telegram_id], deliverable)
+        await db.commit()
+
+
+def test_worker_clears_mark_set_by_another_worker():
+    async def scenario():
+        await reset(shared=True)
+        await deliverability.load_undeliverable()
+        await mark_elsewhere(100, False)
+        await deliverability.mark_deliverable(100)
+        cleared = await stored(100)
+        # Кэш устарел в обратную сторону: отметку снял другой воркер
+        await deliverability.mark_undeliverable([200])
+        await mark_elsewhere(200, True)
+        cached_but_deliverable = await deliverability.is_deliverable(200)
+        await deliverability.mark_undeliverable([200])
+        marked_again = await stored(200)
+        await engine.dispose()
+        return cleared, cached_but_deliverable, marked_again
+
+    assert asyncio.run(scenario()) == (True, True, False)
+
+
+def test_single_process_clears_mark_before_list_is_loaded():
+    async def scenario():
+        await reset(shared=False)
+        await mark_elsewhere(100, False)  # Отмечен до рестарта
+        await deliverability.mark_deliverable(100)  # Пишет раньше, чем загрузился список
+        cleared = await stored(100)
+        await deliverability.load_undeliverable()
+        deliverable = await deliverability.is_deliverable(100)
+        await engine.dispose()
+        return cleared, deliverable
+
+    assert asyncio.run(scenario()) == (True, True)
@@ -0,0 +1,121 @@
+import asyncio
+
+import pytest
+from aiogram import Bot
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.fsm.storage.base import StorageKey
+from aiogram.methods import SendMessage
+
+from config.settings import settings
+from database.crud import bump_counters, get_fsm_record
+from database.session import SessionLocal, engine, init_db
+from middlewares.database import current_session
+from middlewares.fsm_flush import FsmFlushRequestMiddleware
+from services.fsm_storage import DatabaseStorage, create_fsm_storage
+
+TOKEN = "123456:TEST-token"
+
+
+async def stored_state(storage: DatabaseStorage, key: StorageKey):
+    async with SessionLocal() as db:
+        row = await get_fsm_record(db, storage.key_builder.build(key))
+    return row[0] if row else None
+
+
+def test_shared_state_is_committed_before_bot_api_request():
+    async def scenario():
+        await init_db()
+        storage = DatabaseStorage(shared=True)
+        key = StorageKey(bot_id=123456, chat_id=7, user_id=7)
+        seen = []
+
+        session = AiohttpSession()
+
+        async def make_request(bot, method, timeout=None):
+            # Другой воркер в момент ответа бота читает состояние из БД
+            seen.append(await stored_state(storage, key))
+            return True
+
+        session.make_request = make_request
+        session.middleware(FsmFlushRequestMiddleware(storage))
+        bot = Bot(TOKEN, session=session)
+
+        await storage.set_state(key, "Form:step")
+        await bot(SendMessage(chat_id=7, text="screen"))
+        await bot(SendMessage(chat_id=7, text="again"))
+        writes = storage.writes
+        await storage.flush()  # Конец апдейта: записывать уже нечего
+        await session.close()
+        await engine.dispose()  # Иначе поток aiosqlite не даёт процессу завершиться
+        return seen, writes, storage.writes
+
+    seen, writes_before_end, writes = asyncio.run(scenario())
+    assert seen == ["Form:step", "Form:step"]
+    assert writes_before_end == writes == 1
+
+
+def test_flush_does_not_wait_for_handler_write_lock_on_sqlite():
+    async def scenario():
+        await init_db()
+        storage = DatabaseStorage(shared=True)
+        key = StorageKey(bot_id=123456, chat_id=8, user_id=8)
+        seen = []
+
+        session = AiohttpSession()
+
+        async def make_request(bot, method, timeout=None):
+            seen.append(await stored_state(storage, key))
+            return True
+
+        session.make_request = make_request
+        session.middleware(FsmFlushRequestMiddleware(storage, commit_session=True))
+        bot = Bot(TOKEN, session=session)
+
+        async with SessionLocal() as db:
+            # Обработчик уже писал в свою сессию (как рассылка или модерация)
+            current_session.set(db)
+            await bump_counters(db, {"test_flush_lock": 1})
+            await storage.set_state(key, "Form:step")
+            started = asyncio.get_running_loop().time()
+            await bot(SendMessage(chat_id=8, text="screen"))
+            elapsed = asyncio.get_running_loop().time() - started
+            await db.commit()
+        await session.close()
+        await engine.dispose()
+        return seen, elapsed, storage.writes
+
+    seen, elapsed, writes = asyncio.run(scenario())
+    assert seen == ["Form:step"] and writes == 1
+    assert elapsed < 1  # Без commit сессии обработчика — ожидание busy_timeout (5 с)
+
+
+def test_redis_backend_is_shared_between_workers(monkeypatch):
+    fakeredis = pytest.importorskip("fakeredis")
+    from aiogram.fsm.storage import redis as aiogram_redis
+
+    # Подменяется только соединение: create_fsm_storage идёт своим путём через REDIS_URL
+    server = fakeredis.FakeServer()
+    connection = getattr(fakeredis.aioredis, "FakeAsyncRedisConnection", None) or fakeredis.aioredis.FakeConnection
+    urls = []
+
+    def from_url(url, **kwargs):
+        urls.append(url)
+        return aiogram_redis.ConnectionPool(connection_class=connection, server=server)
+
+    monkeypatch.setattr(aiogram_redis.ConnectionPool, "from_url", staticmethod(from_url))
+
+    async def scenario():
+        first, second = create_fsm_storage("redis"), create_fsm_storage("redis", shared=True)
+        key = StorageKey(bot_id=123456, chat_id=7, user_id=7)
+        await first.set_state(key, "Form:step")
+        await first.set_data(key, {"channel": "Explore China"})
+        result = (await second.get_state(key), await second.get_data(key),
+                  await second.redis.get("fsm:7:7:default:state"))
+        await first.close()
+        await second.close()
+        return result
+
+    state, data, raw = asyncio.run(scenario())
+    assert urls == [settings.REDIS_URL] * 2
+    assert (state, data) == ("Form:step", {"channel": "Explore China"})
+    assert raw == b"Form:step"  # Ключ с destiny
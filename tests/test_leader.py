@@ -0,0 +1,34 @@
+import asyncio
+
+from sqlalchemy import delete
+
+from database.models import LeaderLease
+from database.session import SessionLocal, engine, init_db
+from services.leader import LeaderElection
+
+
+def test_exclusive_process_takes_over_stale_lease_at_once():
+    async def scenario():
+        await init_db()
+        async with SessionLocal() as db:
+            await db.execute(delete(LeaderLease))
+            await db.commit()
+
+        crashed = LeaderElection(name="test", lease=60)
+        crashed.holder = "host:100"
+        await crashed.elect()  # Процесс упал, не сняв аренду
+
+        restarted = LeaderElection(name="test", lease=60)
+        restarted.holder = "host:200"  # Тот же хост, новый PID
+        await restarted.elect()
+        waited = restarted.is_leader
+        restarted.exclusive = True
+        await restarted.elect()
+        took_over = restarted.is_leader
+        await crashed.elect()
+        crashed_lost = not crashed.is_leader
+        await restarted.stop()
+        await engine.dispose()
+        return waited, took_over, crashed_lost
+
+    assert asyncio.run(scenario()) == (False, True, True)
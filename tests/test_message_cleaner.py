@@ -0,0 +1,80 @@
+import asyncio
+import time
+from array import array
+
+from sqlalchemy import delete
+
+from database.crud import save_cleaner_chats
+from database.models import CleanerChat
+from database.session import SessionLocal, engine, init_db
+from services.message_cleaner import DELETE_BATCH, DELETE_WINDOW, MessageCleaner, SharedMessageCleaner
+
+
+class FailingBot:
+    """deleteMessages всегда падает: например, бота удалили из чата"""
+
+    async def delete_messages(self, chat_id, message_ids):
+        raise RuntimeError("Forbidden: bot was kicked from the group chat")
+
+
+def test_calls_saved_counts_failed_batches_too():
+    async def scenario():
+        cleaner = MessageCleaner(max_per_chat=1000)
+        for message_id in range(DELETE_BATCH * 2 + 50):
+            await cleaner.add_message(1, message_id)
+        await cleaner.clean_chat(FailingBot(), 1)
+        await asyncio.gather(*cleaner._tasks)
+        return cleaner
+
+    cleaner = asyncio.run(scenario())
+    assert (cleaner.api_calls, cleaner.attempted, cleaner.deleted) == (3, 250, 0)
+    # От удалённых вышло бы -3
+    assert cleaner.calls_saved == 247
+
+
+def test_restored_chats_are_evicted_before_fresh_ones():
+    async def scenario():
+        await init_db()
+        old = int(time.time()) - DELETE_WINDOW - 60
+        async with SessionLocal() as db:
+            # Строка свежая (updated_at), но её сообщения удалять уже поздно
+            await save_cleaner_chats(db, {100: array("q", (1, old)).tobytes()}, ())
+            await db.commit()
+
+        cleaner = MessageCleaner()
+        await cleaner.add_message(200, 1)  # Записано после запуска, до окончания загрузки
+        await cleaner.load()
+        evicted = cleaner.evict_idle()
+        chats = list(cleaner._chats)
+        await engine.dispose()
+        return evicted, chats
+
+    evicted, chats = asyncio.run(scenario())
+    assert evicted == 1
+    assert chats == [200]
+
+
+def test_shared_cleaner_reports_chats_from_table():
+    async def scenario():
+        await init_db()
+        async with SessionLocal() as db:
+            await db.execute(delete(CleanerChat))
+            await db.commit()
+
+        cleaner = SharedMessageCleaner()
+        other = SharedMessageCleaner()  # Второй воркер
+        cleaner.start()
+        other.start()
+        await cleaner.add_message(1, 10)
+        await other.add_message(2, 20)
+        await other.add_message(3, 30)
+        await cleaner._queue.join()
+        await other._queue.join()
+        await cleaner.flush()
+        counted = len(cleaner)
+        await cleaner.close()
+        await other.close()
+        await engine.dispose()
+        return counted
+
+    assert asyncio.run(scenario()) == 3
@@ -0,0 +1,83 @@
+import asyncio
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete
+
+from database.crud import claim_pending_ads, has_claimable_ads
+from database.models import Ad, User
+from database.session import SessionLocal, engine, init_db
+from services.moderation import LEASE, decode_cursor, encode_cursor
+
+ADMIN, OTHER_ADMIN = 1, 2
+BASE = datetime(2024, 5, 1, 12, 0, 0, 123456)
+
+
+async def reset(created):
+    """Ожидающие объявления с заданными created_at; возвращает id в порядке очереди"""
+    await init_db()
+    async with SessionLocal() as db:
+        await db.execute(delete(Ad))
+        await db.execute(delete(User))
+        db.add(User(id=1, telegram_id=1))
+        ads = [Ad(user_id=1, channel="A", text=str(i), price=1, status="pending", created_at=at)
+               for i, at in enumerate(created)]
+        db.add_all(ads)
+        await db.commit()
+        return [ad.id for ad in sorted(ads, key=lambda ad: (ad.created_at, ad.id))]
+
+
+def key(ad: Ad):
+    return ad.created_at, ad.id
+
+
+def test_cursor_round_trip_keeps_microseconds():
+    ad = Ad(id=42, created_at=BASE)
+    assert encode_cursor(ad) == "1714564800123456-42"
+    assert decode_cursor(encode_cursor(ad)) == (BASE, 42)
+
+
+def test_keyset_pages_have_no_gaps_or_duplicates_on_equal_timestamps():
+    async def scenario():
+        # Объявления пачками с одинаковым created_at, вставлены не по порядку
+        created = [BASE + timedelta(seconds=i // 4) for i in reversed(range(11))]
+        order = await reset(created)
+        async with SessionLocal() as db:
+            forward = [await claim_pending_ads(db, ADMIN, 3, LEASE)]
+            while await has_claimable_ads(db, ADMIN, key(forward[-1][-1]), "after"):
+                forward.append(await claim_pending_ads(db, ADMIN, 3, LEASE, key(forward[-1][-1]), "after"))
+            backward = [forward[-1]]
+            while await has_claimable_ads(db, ADMIN, key(backward[-1][0]), "before"):
+                backward.append(await claim_pending_ads(db, ADMIN, 3, LEASE, key(backward[-1][0]), "before"))
+            # Обновление страницы с курсора включительно возвращает её же
+            anchor = decode_cursor(encode_cursor(forward[1][0]))
+            refreshed = await claim_pending_ads(db, ADMIN, 3, LEASE, anchor, "from")
+            await db.commit()
+        await engine.dispose()
+        ids = lambda pages: [[ad.id for ad in page] for page in pages]
+        return order, ids(forward), ids(backward), ids([refreshed])[0]
+
+    order, forward, backward, refreshed = asyncio.run(scenario())
+    assert [ad_id for page in forward for ad_id in page] == order
+    assert [len(page) for page in forward] == [3, 3, 3, 2]
+    # Назад — страницы по 3, упирающиеся в предыдущую; внутри страницы порядок очереди
+    assert backward == [order[9:], order[6:9], order[3:6], order[0:3]]
+    assert refreshed == forward[1]
+
+
+def test_page_leases_split_the_queue_between_moderators():
+    async def scenario():
+        order = await reset([BASE] * 6)
+        async with SessionLocal() as db:
+            first = await claim_pending_ads(db, ADMIN, 4, LEASE)
+            second = await claim_pending_ads(db, OTHER_ADMIN, 4, LEASE)
+            # Листая дальше, модератор возвращает прежнюю страницу в очередь
+            moved = await claim_pending_ads(db, ADMIN, 4, LEASE, key(first[1]), "after")
+            third = await claim_pending_ads(db, OTHER_ADMIN, 4, LEASE)
+            await db.commit()
+        await engine.dispose()
+        return order, [[ad.id for ad in page] for page in (first, second, moved, third)]
+
+    order, (first, second, moved, third) = asyncio.run(scenario())
+    assert first == order[:4] and second == order[4:]
+    assert moved == order[2:4]  # После курсора свободны только собственные
+    assert third == order[:2] + order[4:]
@@ -0,0 +1,35 @@
+from sqlalchemy import create_engine, inspect, text
+
+from database.models import Base
+from database.session import missing_columns, upgrade_schema
+
+# users и ads в том виде, в каком они создавались до трекинга активности,
+# недоставляемых пользователей и аренды модераторами
+BASELINE = (
+    "CREATE TABLE users (id INTEGER PRIMARY KEY, telegram_id INTEGER NOT NULL UNIQUE, "
+    "username VARCHAR(50), full_name VARCHAR(100), created_at DATETIME)",
+    "CREATE TABLE ads (id INTEGER PRIMARY KEY, user_id INTEGER NOT NULL REFERENCES users (id), "
+    "channel VARCHAR(100) NOT NULL, text VARCHAR(4000), price INTEGER, duration VARCHAR(50), "
+    "status VARCHAR(20), created_at DATETIME)",
+    "INSERT INTO users (id, telegram_id) VALUES (1, 100)",
+)
+
+
+def test_existing_tables_are_upgraded_in_place():
+    engine = create_engine("sqlite://")
+    with engine.begin() as connection:
+        for statement in BASELINE:
+            connection.execute(text(statement))
+        Base.metadata.create_all(connection)
+        added = upgrade_schema(connection)
+        again = upgrade_schema(connection)
+        missing = missing_columns(connection)
+        indexes = {index["name"] for table in ("users", "ads") for index in inspect(connection).get_indexes(table)}
+        deliverable = connection.scalar(text("SELECT is_deliverable FROM users WHERE id = 1"))
+
+    assert sorted(added) == ["ads.claim_expires_at", "ads.claimed_by", "users.is_deliverable",
+                             "users.last_activity", "users.undeliverable_since"]
+    assert again == [] and missing == []
+    assert {"ix_users_deliverable_id", "ix_users_last_activity", "ix_ads_status_created",
+            "ix_ads_claimed_by"} <= indexes
+    assert deliverable == 1  # Существующие пользователи остаются получателями рассылок
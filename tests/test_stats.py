@@ -0,0 +1,61 @@
+import asyncio
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete
+
+from database.crud import STATS_RECONCILED, USERS_TOTAL, bump_counters, get_all_counters, users_new_key
+from database.models import StatsCounter, User
+from database.session import SessionLocal, engine, init_db
+from services.stats import ensure_stats, read_stats
+
+
+async def reset(users):
+    await init_db()
+    async with SessionLocal() as db:
+        await db.execute(delete(User))
+        await db.execute(delete(StatsCounter))
+        db.add_all(users)
+        await db.commit()
+
+
+def test_counters_bumped_before_first_reconcile_are_recounted():
+    async def scenario():
+        now = datetime.utcnow()
+        await reset([User(telegram_id=i, created_at=now) for i in range(3)])
+        async with SessionLocal() as db:
+            # Первый апдейт другого воркера успел раньше лидера
+            await bump_counters(db, {USERS_TOTAL: 1})
+            await ensure_stats(db)
+            await db.commit()
+        async with SessionLocal() as db:
+            counters, stats = await get_all_counters(db), await read_stats(db)
+            await ensure_stats(db)  # Повторная сверка не нужна: есть отметка
+            again = await get_all_counters(db)
+        await engine.dispose()
+        return counters, stats, again
+
+    counters, stats, again = asyncio.run(scenario())
+    assert counters[USERS_TOTAL] == 3 and STATS_RECONCILED in counters
+    assert stats["new_users"] == 3
+    assert again == counters
+
+
+def test_hourly_counters_outside_the_window_are_pruned():
+    async def scenario():
+        now = datetime.utcnow()
+        old = now - timedelta(days=3)
+        await reset([User(telegram_id=1, created_at=old), User(telegram_id=2, created_at=now)])
+        async with SessionLocal() as db:
+            await ensure_stats(db)
+            await bump_counters(db, {users_new_key(old - timedelta(hours=1)): 5})
+            await db.commit()
+        async with SessionLocal() as db:
+            await ensure_stats(db)
+            await db.commit()
+            counters = await get_all_counters(db)
+        await engine.dispose()
+        return counters, users_new_key(now)
+
+    counters, current = asyncio.run(scenario())
+    assert counters[USERS_TOTAL] == 2
+    assert [key for key in counters if key.startswith("users_new:")] == [current]
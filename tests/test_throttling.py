@@ -0,0 +1,159 @@
+import asyncio
+
+from aiogram import Bot, Dispatcher
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.types import Update
+from sqlalchemy import delete, func, select
+
+from database.models import ThrottleState
+from database.session import SessionLocal, engine, init_db
+from middlewares.throttling import SWEEP_INTERVAL, Limit, SharedThrottlingMiddleware, ThrottlingMiddleware
+
+TOKEN = "123456:TEST-token"
+NOW = [1000.0]  # Подменённые часы: тесты двигают время сами
+
+
+class FakeClockThrottling(ThrottlingMiddleware):
+    clock = staticmethod(lambda: NOW[0])
+
+
+class FakeClockSharedThrottling(SharedThrottlingMiddleware):
+    clock = staticmethod(lambda: NOW[0])
+
+
+def message(update_id: int, user_id: int = 1) -> Update:
+    return Update.model_validate({"update_id": update_id, "message": {
+        "message_id": update_id, "date": 0, "text": "привет",
+        "chat": {"id": user_id, "type": "private"},
+        "from": {"id": user_id, "is_bot": False, "first_name": "u"},
+    }})
+
+
+def callback(update_id: int, user_id: int = 1) -> Update:
+    return Update.model_validate({"update_id": update_id, "callback_query": {
+        "id": str(update_id), "chat_instance": "1", "data": "menu",
+        "from": {"id": user_id, "is_bot": False, "first_name": "u"},
+    }})
+
+
+class Harness:
+    """Диспетчер с антифлудом; запросы к Bot API не уходят в сеть, а записываются"""
+
+    def __init__(self, throttling: ThrottlingMiddleware):
+        self.handled, self.requests = [], []
+        self.throttling = throttling
+        self.dp = Dispatcher()
+        self.dp.update.outer_middleware(throttling)
+        self.dp.message.register(self._record)
+        self.dp.callback_query.register(self._record)
+        session = AiohttpSession()
+
+        async def make_request(bot, method, timeout=None):
+            self.requests.append(type(method).__name__)
+            return True
+
+        session.make_request = make_request
+        self.bot = Bot(TOKEN, session=session)
+        self._update_id = 0
+
+    async def _record(self, event):
+        self.handled.append(event.from_user.id)
+
+    async def feed(self, make_update, user_id: int = 1) -> bool:
+        """True, если апдейт дошёл до хендлера"""
+        self._update_id += 1
+        before = len(self.handled)
+        await self.dp.feed_update(self.bot, make_update(self._update_id, user_id))
+        return len(self.handled) > before
+
+    async def close(self):
+        await self.bot.session.close()
+
+
+def test_burst_is_allowed_then_rejected_until_interval_passes():
+    async def scenario():
+        NOW[0] = 1000.0
+        harness = Harness(FakeClockThrottling(Limit(3, 6.0), Limit(10, 1.0)))
+        burst = [await harness.feed(message) for _ in range(5)]
+        warnings = list(harness.requests)
+        NOW[0] += 1.9  # Интервал эмиссии 2 с ещё не прошёл
+        early = await harness.feed(message)
+        NOW[0] += 0.1
+        recovered = [await harness.feed(message), await harness.feed(message)]
+        await harness.close()
+        return burst, warnings, early, recovered, harness.throttling.throttled
+
+    burst, warnings, early, recovered, throttled = asyncio.run(scenario())
+    assert burst == [True, True, True, False, False]
+    assert warnings == ["SendMessage"]  # Предупреждение одно на окно, а не на каждое сообщение
+    assert early is False
+    assert recovered == [True, False]  # Восстановился ровно один запрос, не весь всплеск
+    assert throttled == 4
+
+
+def test_message_and_callback_limits_are_separate():
+    async def scenario():
+        NOW[0] = 1000.0
+        harness = Harness(FakeClockThrottling(Limit(2, 10.0), Limit(3, 1.0)))
+        messages = [await harness.feed(message) for _ in range(3)]
+        callbacks = [await harness.feed(callback) for _ in range(4)]
+        other_user = await harness.feed(message, user_id=2)
+        await harness.close()
+        return messages, callbacks, other_user, harness.requests
+
+    messages, callbacks, other_user, requests = asyncio.run(scenario())
+    assert messages == [True, True, False]
+    assert callbacks == [True, True, True, False]  # Флуд сообщениями не мешает кнопкам
+    assert other_user is True
+    # Отклонённый callback всё равно получает ответ, иначе кнопка «висит»
+    assert requests == ["SendMessage", "AnswerCallbackQuery"]
+
+
+def test_sweep_evicts_only_recovered_users():
+    async def scenario():
+        NOW[0] = 1000.0
+        throttling = FakeClockThrottling(Limit(3, 6.0), Limit(10, 1.0))
+        harness = Harness(throttling)
+        for user_id in range(1, 101):
+            await harness.feed(message, user_id)
+        tracked = len(throttling)
+        NOW[0] += 5.0
+        await harness.feed(message, user_id=7)  # Активен: TAT снова в будущем
+        NOW[0] = 1000.0 + SWEEP_INTERVAL  # Следующий апдейт запускает вытеснение
+        await harness.feed(message, user_id=8)
+        remaining = sorted(throttling._users)
+        await harness.close()
+        return tracked, remaining
+
+    tracked, remaining = asyncio.run(scenario())
+    assert tracked == 100
+    # Остаются только те, чей лимит ещё не восстановился; порядок — по последнему запросу
+    assert remaining == [8]
+
+
+def test_shared_limit_is_common_to_all_workers():
+    async def scenario():
+        NOW[0] = 1000.0
+        await init_db()
+        async with SessionLocal() as db:
+            await db.execute(delete(ThrottleState))
+            await db.commit()
+        workers = [Harness(FakeClockSharedThrottling(Limit(3, 6.0), Limit(10, 1.0))) for _ in range(2)]
+        # Апдейты одного пользователя попадают на разные воркеры по очереди
+        allowed = [await workers[i % 2].feed(message) for i in range(5)]
+        NOW[0] += 2.0
+        recovered = await workers[1].feed(message)
+        NOW[0] += SWEEP_INTERVAL
+        swept_by = await workers[0].feed(message, user_id=2)
+        async with SessionLocal() as db:
+            rows = await db.scalar(select(func.count()).select_from(ThrottleState))
+        for worker in workers:
+            await worker.close()
+        await engine.dispose()
+        return allowed, recovered, swept_by, rows
+
+    allowed, recovered, swept_by, rows = asyncio.run(scenario())
+    assert allowed == [True, True, True, False, False]
+    assert recovered is True
+    assert swept_by is True
+    assert rows == 1  # Восстановившийся пользователь 1 удалён, остался только 2